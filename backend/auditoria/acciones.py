@@ -0,0 +1,96 @@
+# auditoria/acciones.py
+"""
+Qué requests se auditan y con qué etiqueta.
+
+Cada app lo declara en su AppConfig:
+
+    class ClientesConfig(AppConfig):
+        acciones_auditoria = {
+            'cliente': {                                    # basename del ViewSet
+                'create': 'CLIENTE_CREATE',
+                ('update', 'partial_update'): 'CLIENTE_UPDATE',
+                'importar': Regla('CLIENTE_IMPORT', payload=0),
+            },
+            'facturacion.views_email.enviar_factura_email': {   # vista función
+                'POST': 'FACTURA_ENVIO',
+            },
+        }
+
+La primera vez se recorre el árbol de URLs y se arma una tabla
+(vista resuelta, método HTTP) → Regla. Por request: un get() con
+request.resolver_match.func; sin comparar strings de rutas.
+
+Regla.payload: 1 = se guarda siempre el body, 0 = nunca, entre 0 y 1 = esa
+fracción de los requests. Bodies de más de max_bytes (por defecto
+AUDITORIA_PAYLOAD_MAX_BYTES) no se guardan: queda {'_omitido': ..., 'bytes': n}.
+"""
+import threading
+from typing import NamedTuple
+
+
+class Regla(NamedTuple):
+    accion: str
+    payload: float = 1.0
+    max_bytes: int | None = None
+
+
+def _reglas_declaradas() -> dict:
+    """{(basename o ruta de la vista, acción o método): Regla} de todas las apps."""
+    from django.apps import apps
+    reglas = {}
+    for app in apps.get_app_configs():
+        for vista, acciones in getattr(app, 'acciones_auditoria', {}).items():
+            for claves, regla in acciones.items():
+                regla = regla if isinstance(regla, Regla) else Regla(regla)
+                for clave in (claves if isinstance(claves, tuple) else (claves,)):
+                    reglas[(vista, clave)] = regla
+    return reglas
+
+
+def _patrones(resolver):
+    for p in resolver.url_patterns:
+        if hasattr(p, 'url_patterns'):
+            yield from _patrones(p)
+        else:
+            yield p
+
+
+def compilar(urlconf=None) -> dict:
+    """Tabla {(callback, MÉTODO): Regla} para todas las rutas de `urlconf`."""
+    from django.urls import get_resolver
+    reglas = _reglas_declaradas()
+    tabla = {}
+    for patron in _patrones(get_resolver(urlconf)):
+        vista = patron.callback
+        acciones = getattr(vista, 'actions', None)
+        if acciones:  # ViewSet: {'post': 'create', ...}
+            basename = vista.initkwargs.get('basename')
+            for metodo, accion in acciones.items():
+                regla = reglas.get((basename, accion))
+                if regla:
+                    tabla[(vista, metodo.upper())] = regla
+        else:
+            nombre = f'{vista.__module__}.{vista.__name__}'
+            for (v, metodo), regla in reglas.items():
+                if v == nombre:
+                    tabla[(vista, metodo.upper())] = regla
+    return tabla
+
+
+_tabla = None
+_tabla_lock = threading.Lock()
+
+
+def tabla() -> dict:
+    global _tabla
+    if _tabla is None:
+        with _tabla_lock:
+            if _tabla is None:
+                _tabla = compilar()
+    return _tabla
+
+
+def reiniciar():
+    """Descarta la tabla (tests que cambian ROOT_URLCONF o las declaraciones)."""
+    global _tabla
+    _tabla = None
@@ -0,0 +1,30 @@
+# auditoria/management/commands/archivar.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.retencion import politicas
+
+
+class Command(BaseCommand):
+    help = ('Retención (settings.RETENCION): pasa a la tabla de archivo los meses viejos de la tabla '
+            'caliente y a ARCHIVO_DIR (.ndjson.gz) los más viejos del archivo. De a lotes, '
+            'una transacción por lote. Pensado para correr todos los días (cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('politica', nargs='*', help='Nombres en RETENCION (default: todas).')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción.')
+        parser.add_argument('--pausa-ms', type=int, default=0, help='Pausa entre lotes.')
+        parser.add_argument('--hoy', help='Fecha de referencia AAAA-MM-DD (default: hoy).')
+
+    def handle(self, *args, **opts):
+        todas = politicas()
+        desconocidas = set(opts['politica']) - set(todas)
+        if desconocidas:
+            raise CommandError(f'Políticas desconocidas: {", ".join(sorted(desconocidas))}')
+        hoy = parse_date(opts['hoy']) if opts['hoy'] else None
+        for nombre in opts['politica'] or todas:
+            p = todas[nombre]
+            movidas = p.archivar(hoy=hoy, lote=opts['lote'], pausa=opts['pausa_ms'] / 1000)
+            rutas = p.exportar(hoy=hoy, lote=opts['lote'])
+            self.stdout.write(f'{nombre}: {movidas} filas → {p.archivo._meta.db_table} '
+                              f'(antes de {p.corte(hoy):%Y-%m}); {len(rutas)} meses → {p.directorio}')
@@ -0,0 +1,62 @@
+# auditoria/management/commands/bench_auditoria.py
+from statistics import quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.test import modify_settings
+from rest_framework.test import APIClient
+
+from auditoria import writer
+from auditoria.models import UserActionLog
+from clientes.models import Cliente, HistorialCliente
+from facturacion.models import Factura
+
+
+class Command(BaseCommand):
+    help = ('Benchmark: latencia (p50/p99) de POST /api/facturas/ sin auditoría, con auditoría '
+            'sincrónica (INSERT en el request) y con el writer en lote. Borra lo que crea.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=2000)
+
+    def _medir(self, api, cliente, etiqueta, n):
+        tiempos = []
+        for i in range(n):
+            datos = {'cliente': cliente.pk, 'nro': f'BAUD-{etiqueta}-{i}',
+                     'items': [{'descripcion': 'servicio', 'qty': 1, 'precio_unit': '100.00', 'impuesto': '21'}]}
+            t0 = perf_counter()
+            resp = api.post('/api/facturas/', datos, format='json')
+            tiempos.append((perf_counter() - t0) * 1000)
+            assert resp.status_code == 201, resp.content
+        q = quantiles(tiempos, n=100)
+        return q[49], q[98]
+
+    def handle(self, *args, **opts):
+        n = opts['n']
+        api = APIClient(SERVER_NAME='localhost')
+        cliente = Cliente.objects.create(razon_social='BENCH AUDITORIA')
+        desde = UserActionLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        anterior = writer._writer
+        try:
+            res = {}
+            self._medir(api, cliente, 'calentar', 50)
+            with modify_settings(MIDDLEWARE={'remove': 'auditoria.middleware.UserActionLogMiddleware'}):
+                res['sin auditoría'] = self._medir(api, cliente, 'sin', n)
+            writer._writer = writer.AuditWriter(sincronico=True)
+            res['sincrónica'] = self._medir(api, cliente, 'sync', n)
+            writer._writer = lote = writer.AuditWriter()
+            res['en lote (thread)'] = self._medir(api, cliente, 'async', n)
+            lote.flush()
+            m = lote.metricas()
+            lote.cerrar()
+        finally:
+            writer._writer = anterior
+            Factura.objects.filter(cliente=cliente).delete()
+            HistorialCliente.objects.filter(cliente=cliente).delete()
+            cliente.delete()
+            UserActionLog.objects.filter(id__gt=desde, path='/api/facturas/').delete()
+
+        self.stdout.write(f'{"POST /api/facturas/":22} {"p50":>8} {"p99":>8}   (n={n})')
+        for nombre, (p50, p99) in res.items():
+            self.stdout.write(f'{nombre:22} {p50:6.2f}ms {p99:6.2f}ms')
+        self.stdout.write(f'writer: {m}')
@@ -1,53 +1,49 @@
-import json
+import random
+
+from django.conf import settings
+from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
-from .models import UserActionLog
+from .acciones import tabla
+from .writer import get_writer
 
-MAP = {
-  ('POST', '/api/clientes/'): 'CLIENTE_CREATE',
-  ('PUT',  '/api/clientes/'): 'CLIENTE_UPDATE',
-  ('POST', '/api/clientes/', 'desactivar'): 'CLIENTE_DEACTIVATE',
-  ('POST', '/api/facturas/'): 'FACTURA_CREATE',
-  ('POST', '/api/pagos/'): 'PAGO_CREATE',
-}
 
 class UserActionLogMiddleware(MiddlewareMixin):
+    # qué se audita: acciones_auditoria de cada AppConfig (ver acciones.py)
     def process_view(self, request, view_func, view_args, view_kwargs):
         request._log_candidate = None
-        path = request.path
-        method = request.method
-        action = None
-
-        # Detectar acciones por ruta
-        if path.startswith('/api/clientes/') and path.endswith('/desactivar/') and method=='POST':
-            action = 'CLIENTE_DEACTIVATE'
-        elif path == '/api/clientes/' and method=='POST':
-            action = 'CLIENTE_CREATE'
-        elif path.startswith('/api/clientes/') and method in ['PUT', 'PATCH']:
-            action = 'CLIENTE_UPDATE'
-        elif path == '/api/facturas/' and method=='POST':
-            action = 'FACTURA_CREATE'
-        elif path == '/api/pagos/' and method=='POST':
-            action = 'PAGO_CREATE'
-
-        if action:
-            request._log_candidate = {'action': action}
+        match = request.resolver_match
+        regla = tabla().get((match.func, request.method)) if match else None
+        if regla:
+            request._log_candidate = {'action': regla.accion, 'body': self._body(request, regla)}
         return None
 
+    @staticmethod
+    def _body(request, regla):
+        # el body se guarda crudo antes de la vista (DRF lo consume del stream);
+        # se parsea en el thread del writer, no en la respuesta
+        if regla.payload <= 0 or (regla.payload < 1 and random.random() >= regla.payload):
+            return None  # no se captura: payload queda NULL
+        if 'json' not in request.content_type:
+            return b''
+        maximo = regla.max_bytes or settings.AUDITORIA_PAYLOAD_MAX_BYTES
+        largo = int(request.META.get('CONTENT_LENGTH') or 0)
+        if largo > maximo:  # ni se lee: la vista lo consume en streaming
+            return {'_omitido': 'tamaño', 'bytes': largo}
+        body = request.body
+        return body if len(body) <= maximo else {'_omitido': 'tamaño', 'bytes': len(body)}
+
     def process_response(self, request, response):
         if getattr(request, '_log_candidate', None):
-            try:
-                body = {}
-                if request.body:
-                    body = json.loads(request.body.decode('utf-8'))
-            except Exception:
-                body = {}
-            UserActionLog.objects.create(
-                user=getattr(request, 'user', None) if request.user.is_authenticated else None,
-                method=request.method,
-                path=request.path,
-                action=request._log_candidate['action'],
-                ip=(request.META.get('REMOTE_ADDR') or request.META.get('HTTP_X_FORWARDED_FOR','').split(',')[0] or None),
-                payload=body
-            )
+            user = getattr(request, 'user', None)
+            get_writer().registrar({
+                'user_id': user.pk if user is not None and user.is_authenticated else None,
+                'method': request.method,
+                'path': request.path,
+                'action': request._log_candidate['action'],
+                'ip': (request.META.get('REMOTE_ADDR') or request.META.get('HTTP_X_FORWARDED_FOR','').split(',')[0] or None),
+                'ts': timezone.now(),
+                'body': request._log_candidate['body'],
+                'content_type': request.content_type,
+            })
         return response
 
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.retencion import CrearTablaArchivo
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditoria', '0002_ts_hora_del_request'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        CrearTablaArchivo(
+            fecha='ts',
+            name='UserActionLogArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('method', models.CharField(max_length=8)),
+                ('path', models.CharField(max_length=255)),
+                ('action', models.CharField(max_length=50)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('ts', models.DateTimeField()),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'auditoria_useractionlog_archivo',
+                'indexes': [models.Index(fields=['ts'], name='auditoria_arch_ts_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 class UserActionLog(models.Model):
@@ -7,8 +8,25 @@ class UserActionLog(models.Model):
     path = models.CharField(max_length=255)
     action = models.CharField(max_length=50)      # etiqueta derivada: CLIENTE_CREATE, FACTURA_CREATE, etc.
     ip = models.GenericIPAddressField(null=True, blank=True)
-    ts = models.DateTimeField(auto_now_add=True)
+    ts = models.DateTimeField(default=timezone.now)  # hora del request (se escribe después, en lote)
     payload = models.JSONField(null=True, blank=True)
 
     class Meta:
         indexes = [models.Index(fields=['ts']), models.Index(fields=['action'])]
+
+
+class UserActionLogArchivo(models.Model):
+    """UserActionLog de meses viejos (core/retencion.py). Mismos ids; sin FK reales."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(get_user_model(), null=True, blank=True, on_delete=models.DO_NOTHING,
+                             db_constraint=False, related_name='+')
+    method = models.CharField(max_length=8)
+    path = models.CharField(max_length=255)
+    action = models.CharField(max_length=50)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+    ts = models.DateTimeField()
+    payload = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'auditoria_useractionlog_archivo'
+        indexes = [models.Index(fields=['ts'], name='auditoria_arch_ts_idx')]
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from .acciones import Regla, tabla
+from .models import UserActionLog
+from .writer import AuditWriter
+
+
+def _registro(i=0, **extra):
+    return {'user_id': None, 'method': 'POST', 'path': '/api/pagos/', 'action': 'PAGO_CREATE',
+            'ip': '127.0.0.1', 'ts': timezone.now(), 'body': b'{"monto": %d}' % i,
+            'content_type': 'application/json', **extra}
+
+
+class MiddlewareTest(TestCase):
+    def test_registra_con_payload(self):
+        # en los tests el writer es sincrónico (AUDITORIA_MODO)
+        resp = APIClient().post('/api/clientes/', {'razon_social': 'ACME'}, format='json')
+        self.assertEqual(resp.status_code, 201)
+        log = UserActionLog.objects.get()
+        self.assertEqual((log.action, log.method, log.path), ('CLIENTE_CREATE', 'POST', '/api/clientes/'))
+        self.assertEqual(log.payload, {'razon_social': 'ACME'})
+
+    def test_get_no_registra(self):
+        APIClient().get('/api/clientes/')
+        APIClient().get('/api/clientes/buscar/', {'q': 'x'})
+        self.assertFalse(UserActionLog.objects.exists())
+
+
+class AccionesTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.cli = Cliente.objects.create(razon_social='ACME')
+
+    def _acciones(self):
+        return list(UserActionLog.objects.order_by('id').values_list('method', 'action'))
+
+    def test_clasifica_por_vista_y_accion(self):
+        self.api.patch(f'/api/clientes/{self.cli.id}/', {'telefono': '1'}, format='json')
+        self.api.put(f'/api/clientes/{self.cli.id}/', {'razon_social': 'ACME SA'}, format='json')
+        self.api.post(f'/api/clientes/{self.cli.id}/desactivar/')
+        self.api.post(f'/api/clientes/{self.cli.id}/activar/')
+        self.api.delete(f'/api/clientes/{self.cli.id}/')
+        self.assertEqual(self._acciones(), [('PATCH', 'CLIENTE_UPDATE'), ('PUT', 'CLIENTE_UPDATE'),
+                                            ('POST', 'CLIENTE_DEACTIVATE'), ('POST', 'CLIENTE_ACTIVATE'),
+                                            ('DELETE', 'CLIENTE_DELETE')])
+
+    def test_tabla_compilada_una_vez(self):
+        self.assertIs(tabla(), tabla())
+        self.assertIn(Regla('PAGO_UPDATE'), tabla().values())
+
+    def test_payload_no_capturado(self):
+        self.api.post('/api/clientes/importar/', b'razon_social,cuit\nX,30-1\n', content_type='text/csv')
+        log = UserActionLog.objects.get()
+        self.assertEqual((log.action, log.payload), ('CLIENTE_IMPORT', None))
+
+    @override_settings(AUDITORIA_PAYLOAD_MAX_BYTES=64)
+    def test_payload_con_tope_de_tamano(self):
+        self.api.post('/api/clientes/', {'razon_social': 'X' * 100}, format='json')
+        payload = UserActionLog.objects.get().payload
+        self.assertEqual(payload['_omitido'], 'tamaño')
+        self.assertGreater(payload['bytes'], 64)
+
+    def test_muestreo(self):
+        from .middleware import UserActionLogMiddleware
+        req = mock.Mock(content_type='application/json', META={}, body=b'{}')
+        with mock.patch('auditoria.middleware.random.random', return_value=0.7):
+            self.assertIsNone(UserActionLogMiddleware._body(req, Regla('X', payload=0.5)))
+            self.assertEqual(UserActionLogMiddleware._body(req, Regla('X', payload=0.8)), b'{}')
+
+
+class AuditWriterTest(TransactionTestCase):
+    def test_escribe_en_lotes_y_flush(self):
+        w = AuditWriter(lote=200, intervalo_ms=1000)
+        hora = timezone.now()
+        for i in range(450):
+            w.registrar(_registro(i, ts=hora))
+        self.assertTrue(w.flush())
+        self.assertEqual(UserActionLog.objects.count(), 450)
+        m = w.metricas()
+        self.assertEqual((m['encolados'], m['escritos'], m['pendientes'], m['errores']), (450, 450, 0, 0))
+        self.assertGreaterEqual(m['lotes'], 3)
+        log = UserActionLog.objects.get(payload={'monto': 7})
+        self.assertEqual(log.ts, hora)  # hora del request, no la de la escritura
+        w.cerrar()
+
+    def test_lote_incompleto_sale_por_tiempo(self):
+        w = AuditWriter(lote=1000, intervalo_ms=20)
+        for i in range(3):
+            w.registrar(_registro(i))
+        for _ in range(100):  # se mira la métrica: consultar la tabla mientras el thread escribe la bloquea
+            if w.metricas()['escritos'] == 3:
+                break
+            time.sleep(0.02)
+        self.assertEqual(UserActionLog.objects.count(), 3)
+        w.cerrar()
+
+    def test_cerrar_escribe_lo_pendiente(self):
+        w = AuditWriter(lote=1000, intervalo_ms=60_000)
+        w.registrar(_registro(1))
+        w.registrar(_registro(2, body=b'no es json'))
+        w.cerrar()
+        payloads = list(UserActionLog.objects.order_by('id').values_list('payload', flat=True))
+        self.assertEqual(payloads, [{'monto': 1}, {}])
+
+    def test_modo_sincronico(self):
+        w = AuditWriter(sincronico=True)
+        w.registrar(_registro(5))
+        self.assertEqual(UserActionLog.objects.get().payload, {'monto': 5})
+        self.assertIsNone(w._thread)
+
+    def test_saturado_escribe_en_el_request_sin_cerrar_su_conexion(self):
+        w = AuditWriter(max_pendientes=1)
+        with mock.patch.object(w, '_arrancar'), \
+                mock.patch('auditoria.writer.close_old_connections') as cerrar:
+            w.registrar(_registro(1))  # queda en la cola (no hay thread que la vacíe)
+            w.registrar(_registro(2))
+        self.assertEqual(UserActionLog.objects.get().payload, {'monto': 2})
+        self.assertEqual(w.metricas()['saturaciones'], 1)
+        cerrar.assert_not_called()
+
+
+class AccionesEndpointTest(TestCase):
+    def test_lee_tabla_caliente_y_archivo(self):
+        from datetime import timedelta
+        from .models import UserActionLogArchivo
+        viejo = timezone.now() - timedelta(days=400)
+        UserActionLog.objects.create(method='POST', path='/api/clientes/', action='CLIENTE_CREATE')
+        UserActionLogArchivo.objects.create(id=10**6, method='POST', path='/api/facturas/',
+                                            action='FACTURA_CREATE', ts=viejo)
+        api = APIClient()
+        url = '/api/auditoria/acciones/'
+        self.assertEqual([a['action'] for a in api.get(url).json()], ['CLIENTE_CREATE'])
+        desde = f'{viejo:%Y-%m-%d}'
+        self.assertEqual([a['action'] for a in api.get(url, {'desde': desde}).json()],
+                         ['CLIENTE_CREATE', 'FACTURA_CREATE'])
+        self.assertEqual([a['action'] for a in api.get(url, {'desde': desde, 'action': 'FACTURA_CREATE'}).json()],
+                         ['FACTURA_CREATE'])
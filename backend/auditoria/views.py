@@ -1,3 +1,34 @@
-from django.shortcuts import render
+# auditoria/views.py
+from rest_framework import serializers
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
 
-# Create your views here.
+from core.retencion import politicas, rango_de_params
+from .models import UserActionLog
+
+LIMIT_MAX = 500
+
+
+class UserActionLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserActionLog
+        fields = ['id', 'ts', 'action', 'method', 'path', 'user', 'ip', 'payload']
+
+
+# GET /api/auditoria/acciones/?action=A,B&user=&desde=&hasta=&limit=
+# Más recientes primero. Con ?desde= anterior al corte de retención también lee lo archivado.
+@api_view(['GET'])
+def acciones(request):
+    params = request.query_params
+    filtro = {}
+    if params.get('action'):
+        filtro['action__in'] = [a.strip() for a in params['action'].split(',') if a.strip()]
+    if params.get('user'):
+        filtro['user_id'] = params['user']
+    try:
+        limit = min(max(int(params.get('limit', 50)), 1), LIMIT_MAX)
+    except ValueError:
+        limit = 50
+    desde, hasta = rango_de_params(params)
+    filas = politicas()['auditoria'].consultar(desde, hasta, filtro=filtro, limite=limit)
+    return Response(UserActionLogSerializer(filas, many=True).data)
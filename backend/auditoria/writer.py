@@ -0,0 +1,164 @@
+# auditoria/writer.py
+"""
+Escritura de UserActionLog fuera del camino de la respuesta.
+
+El middleware arma el registro (dict con los campos + el body crudo) y lo
+encola en un buffer acotado. Un thread de fondo lo vacía con bulk_create cada
+`lote` registros o cada `intervalo_ms`, lo que llegue primero. El body se
+parsea (json.loads) en ese thread, no en el request.
+
+- Buffer lleno (la base no da abasto): el registro se escribe en el request,
+  como antes. No se pierde nada; se cuenta en `saturaciones`.
+- Al terminar el proceso (atexit) se escribe lo pendiente.
+- Modo 'sincronico' (tests, scripts): cada registro se escribe al momento.
+- metricas(): encolados, escritos, lotes, saturaciones, errores, pendientes
+  y el máximo de pendientes visto.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()  # marca en la cola: avisar cuando se escribió todo lo anterior
+
+
+def _payload(body, content_type: str):
+    if body is None or isinstance(body, dict):
+        return body  # no capturado / ya resuelto en el middleware (p. ej. muy grande)
+    if not body or 'json' not in (content_type or ''):
+        return {}
+    try:
+        return json.loads(body.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+
+def _instancia(registro: dict):
+    from .models import UserActionLog
+    datos = dict(registro)
+    datos['payload'] = _payload(datos.pop('body', b''), datos.pop('content_type', ''))
+    return UserActionLog(**datos)
+
+
+class AuditWriter:
+    def __init__(self, max_pendientes: int = 10_000, lote: int = 200, intervalo_ms: float = 200,
+                 sincronico: bool = False):
+        self.lote, self.intervalo = lote, intervalo_ms / 1000
+        self.sincronico = sincronico
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._m_lock = threading.Lock()  # las métricas se tocan desde los requests y desde el thread
+        self._m = dict(encolados=0, escritos=0, lotes=0, saturaciones=0, errores=0, max_pendientes=0)
+
+    # ───────────────────────── lado request ─────────────────────────
+    def registrar(self, registro: dict):
+        if self.sincronico:
+            self._escribir([registro])
+            return
+        self._arrancar()
+        try:
+            self._cola.put_nowait(registro)
+        except queue.Full:
+            self._sumar(saturaciones=1)
+            self._escribir([registro])
+            return
+        pendientes = self._cola.qsize()
+        with self._m_lock:
+            self._m['encolados'] += 1
+            self._m['max_pendientes'] = max(self._m['max_pendientes'], pendientes)
+
+    def flush(self, timeout: float | None = 10) -> bool:
+        """Espera a que se escriba todo lo encolado hasta ahora."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._cola.empty()
+        listo = threading.Event()
+        self._cola.put((_FLUSH, listo))
+        return listo.wait(timeout)
+
+    def cerrar(self, timeout: float = 10):
+        if self._thread is not None and self._thread.is_alive():
+            self._cola.put(None)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def metricas(self) -> dict:
+        with self._m_lock:
+            return {**self._m, 'pendientes': self._cola.qsize()}
+
+    def _sumar(self, **cuentas):
+        with self._m_lock:
+            for k, n in cuentas.items():
+                self._m[k] += n
+
+    # ───────────────────────── thread de fondo ─────────────────────────
+    def _arrancar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                t = threading.Thread(target=self._loop, name='auditoria-writer', daemon=True)
+                t.start()
+                self._thread = t
+
+    def _loop(self):
+        terminar = False
+        while not terminar:
+            tanda, avisos = [], []
+            item = self._cola.get()  # bloquea hasta que haya algo
+            limite = time.monotonic() + self.intervalo
+            while True:
+                if item is None:
+                    terminar = True
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    avisos.append(item[1])
+                else:
+                    tanda.append(item)
+                if terminar or avisos or len(tanda) >= self.lote:
+                    break
+                try:
+                    item = self._cola.get(timeout=max(limite - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if tanda:
+                close_old_connections()  # solo acá: en el request cerraría la conexión del propio request
+                self._escribir(tanda)
+            for ev in avisos:
+                ev.set()
+        connection.close()
+
+    def _escribir(self, registros):
+        from .models import UserActionLog
+        try:
+            UserActionLog.objects.bulk_create([_instancia(r) for r in registros])
+        except Exception:
+            self._sumar(errores=1)
+            logger.exception('No se pudieron guardar %d registros de auditoría', len(registros))
+            return
+        self._sumar(escritos=len(registros), lotes=1)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> AuditWriter:
+    """Writer único del proceso, configurado desde settings."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from django.conf import settings
+            _writer = AuditWriter(
+                max_pendientes=getattr(settings, 'AUDITORIA_MAX_PENDIENTES', 10_000),
+                lote=getattr(settings, 'AUDITORIA_LOTE', 200),
+                intervalo_ms=getattr(settings, 'AUDITORIA_INTERVALO_MS', 200),
+                sincronico=getattr(settings, 'AUDITORIA_MODO', 'async') == 'sincronico',
+            )
+            atexit.register(_writer.cerrar)
+        return _writer
@@ -1,10 +1,24 @@
 # clientes/apps.py
 from django.apps import  AppConfig
 
+from auditoria.acciones import Regla
+
 class ClientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clientes'
 
+    # requests que registra auditoria.middleware (ver auditoria/acciones.py)
+    acciones_auditoria = {
+        'cliente': {
+            'create': 'CLIENTE_CREATE',
+            ('update', 'partial_update'): 'CLIENTE_UPDATE',
+            'destroy': 'CLIENTE_DELETE',
+            'desactivar': 'CLIENTE_DEACTIVATE',
+            'activar': 'CLIENTE_ACTIVATE',
+            'importar': Regla('CLIENTE_IMPORT', payload=0),  # el CSV ya queda en HistorialCliente
+        },
+    }
+
     def ready(self):
         from . import signals  # importa señales
 
@@ -0,0 +1,178 @@
+# clientes/busqueda.py
+"""
+Índice de búsqueda de clientes.
+
+Cliente.busqueda guarda el texto normalizado (razón social + CUIT solo dígitos +
+email): minúsculas, sin acentos ni signos. Lo mantiene Cliente.save() y la
+importación CSV. Sobre esa columna:
+
+- SQLite: tabla FTS5 `clientes_cliente_fts` (external content) sincronizada
+  por triggers, con índice de prefijos (2 a 6 letras).
+- PostgreSQL: índice GIN pg_trgm sobre `busqueda`. Orden por similarity().
+- Otro motor / SQLite sin FTS5: LIKE sobre `busqueda` (sigue siendo
+  insensible a acentos, pero sin índice).
+
+Semántica (typeahead): las palabras completas de la consulta tienen que
+estar y la última puede ser un prefijo ("acme serv" → "ACME Servicios SA").
+Un CUIT con o sin guiones se busca por prefijo de dígitos ("20-123" ≡ "20123").
+Los tipos societarios y conectores ("sa", "srl", "y", "de"...) no filtran si
+hay otras palabras: solo suben en el orden a los que los tienen.
+
+Orden: se toman hasta VENTANA coincidencias del índice y se ordenan acá
+(primero las que tienen las palabras opcionales, después las que empiezan
+antes por la palabra buscada, después los nombres más cortos). Con más de
+VENTANA coincidencias el orden es sobre esa muestra: la consulta es demasiado
+amplia y el usuario sigue tipeando. bm25 ordenando *todas* las coincidencias
+de un prefijo común cuesta cientos de ms a 1M de clientes.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+FTS_TABLE = 'clientes_cliente_fts'
+CAMPOS_BUSQUEDA = ('razon_social', 'cuit', 'email')
+VENTANA = 500
+OPCIONALES = {'s', 'a', 'sa', 'srl', 'sas', 'sh', 'sc', 'cia', 'y', 'e', 'de', 'del', 'la', 'las', 'los', 'el'}
+_CUIT = re.compile(r'^[\d\s.\-]+$')
+
+
+def normalizar(texto: str | None) -> str:
+    """'Ñandú S.A.' → 'nandu s a'."""
+    if not texto:
+        return ''
+    s = unicodedata.normalize('NFKD', texto)
+    s = ''.join(c for c in s if not unicodedata.combining(c)).casefold()
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', s).split())
+
+
+def texto_busqueda(razon_social, cuit, email) -> str:
+    digitos = re.sub(r'\D', '', cuit or '')
+    return ' '.join(p for p in (normalizar(razon_social), digitos, normalizar(email)) if p)
+
+
+def es_cuit(q: str) -> bool:
+    """Solo dígitos, guiones, puntos y espacios: se busca como prefijo de CUIT."""
+    return bool(_CUIT.match(q)) and any(c.isdigit() for c in q)
+
+
+def terminos(q: str) -> tuple[list[str], list[str]]:
+    """
+    (obligatorios, opcionales) de la consulta, normalizados. El último
+    obligatorio se busca como prefijo. Un CUIT con guiones es un solo término.
+    """
+    q = (q or '').strip()
+    if es_cuit(q):
+        return [re.sub(r'\D', '', q)], []
+    palabras = normalizar(q).split()
+    obligatorios = [p for p in palabras if p not in OPCIONALES]
+    if not obligatorios:
+        return palabras, []
+    return obligatorios, [p for p in palabras if p in OPCIONALES]
+
+
+# ─────────────────────────────── motor ───────────────────────────────────
+_fts_disponible = {}
+
+
+def _motor() -> str:
+    if connection.vendor == 'sqlite':
+        alias = connection.alias
+        if alias not in _fts_disponible:
+            with connection.cursor() as c:
+                c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=%s", [FTS_TABLE])
+                _fts_disponible[alias] = c.fetchone() is not None
+        return 'fts5' if _fts_disponible[alias] else 'like'
+    if connection.vendor == 'postgresql':
+        return 'trgm'
+    return 'like'
+
+
+def _match_fts(ts: list[str]) -> str:
+    # términos entre comillas (sin sintaxis FTS del usuario); AND implícito.
+    # Solo el último es prefijo: los prefijos largos (más que el índice de
+    # prefijos) obligan a FTS5 a armar la lista entera de coincidencias.
+    return ' '.join(['"%s"' % t for t in ts[:-1]] + ['"%s"*' % ts[-1]])
+
+
+def filtrar(qs, q: str):
+    """Aplica la búsqueda como filtro (sin orden). Para SearchFilter / listados."""
+    ts, _ = terminos(q)
+    if not ts:
+        return qs
+    if _motor() == 'fts5':
+        return qs.filter(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                                       [_match_fts(ts)]))
+    # trgm / like: "empieza palabra" = al inicio o después de un espacio
+    cond = Q()
+    for t in ts:
+        cond &= Q(busqueda__startswith=t) | Q(busqueda__contains=' ' + t)
+    return qs.filter(cond)
+
+
+def coincide(texto: str, ts: list[str]) -> bool:
+    """Lo mismo que el MATCH del índice, sobre un `busqueda` ya leído."""
+    palabras = texto.split()
+    return (all(t in palabras for t in ts[:-1])
+            and any(p.startswith(ts[-1]) for p in palabras))
+
+
+def _orden(texto: str, ts: list[str], opcionales: list[str]):
+    palabras = texto.split()
+    inicio = next((i for i, p in enumerate(palabras) if p.startswith(ts[0])), len(palabras))
+    return (-sum(o in palabras for o in opcionales), inicio, len(texto))
+
+
+def ordenar(filas, ts: list[str], opcionales: list[str]) -> list:
+    """Ordena filas (id, busqueda, ...) por relevancia para la consulta."""
+    return sorted(filas, key=lambda f: (*_orden(f[1], ts, opcionales), f[0]))
+
+
+def candidatos(q: str, columnas=()) -> list[tuple]:
+    """
+    Hasta VENTANA filas (id, busqueda, *columnas) que coinciden con `q`, sin
+    ordenar. Si vuelven menos de VENTANA, son todas las coincidencias.
+    """
+    ts, opcionales = terminos(q)
+    if not ts:
+        return []
+    motor = _motor()
+    if motor == 'fts5':
+        extra = ''.join(f', c.{connection.ops.quote_name(col)}' for col in columnas)
+        sql = (f'SELECT c.id, c.busqueda{extra} FROM clientes_cliente c WHERE c.id IN '
+               f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)')
+        with connection.cursor() as c:
+            c.execute(sql, [_match_fts(ts), VENTANA])
+            return c.fetchall()
+    from .models import Cliente
+    qs = filtrar(Cliente.objects.all(), q)
+    if motor == 'trgm':
+        # la ventana son los más parecidos; después se ordena igual que en SQLite
+        qs = (qs.annotate(_rank=RawSQL('similarity(busqueda, %s)', [' '.join(ts + opcionales)]))
+              .order_by('-_rank'))
+    return list(qs.values_list('id', 'busqueda', *columnas)[:VENTANA])
+
+
+def buscar_ids(q: str, limite: int = 50) -> list[int]:
+    """Ids de clientes que coinciden con `q`, los más relevantes primero."""
+    ts, opcionales = terminos(q)
+    if not ts:
+        return []
+    return [f[0] for f in ordenar(candidatos(q), ts, opcionales)[:limite]]
+
+
+def buscar(qs, q: str, limite: int = 50):
+    """Queryset de `qs` con los resultados de `q` ordenados por relevancia."""
+    ids = buscar_ids(q, limite)
+    orden = Case(*[When(pk=pk, then=i) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return qs.filter(pk__in=ids).order_by(orden) if ids else qs.none()
+
+
+class BusquedaFilter(SearchFilter):
+    """SearchFilter de DRF (?search=) resuelto con el índice en vez de icontains."""
+
+    def filter_queryset(self, request, queryset, view):
+        return filtrar(queryset, request.query_params.get(self.search_param, ''))
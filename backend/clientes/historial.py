@@ -0,0 +1,175 @@
+# clientes/historial.py
+"""
+Registro de eventos en HistorialCliente (la única vía: señales, vistas,
+importación CSV y alta masiva de facturas pasan por registrar()).
+
+- Los eventos se juntan durante la transacción y se escriben al commit con
+  un solo bulk_create (transaction.on_commit). Si la transacción (o el
+  savepoint donde se registraron) se revierte, no se escriben.
+- Sin transacción abierta (autocommit) se escriben en el momento.
+- Deduplicación por transacción: varias ediciones de un cliente quedan en
+  un EDIT_CLIENTE (con la última nota) y no hay EDIT_CLIENTE si el cliente
+  se dio de alta en la misma. El resto solo se deduplica si repite el mismo
+  evento de la misma instancia (`origen`): dos pagos iguales son dos filas.
+- usuario: el del request en curso (UsuarioActualMiddleware), salvo que se
+  pase explícito.
+- Para saber qué buffers siguen agendados se leen dos internos de Django
+  (connection.run_on_commit y connection.savepoint_ids; ver _internos).
+  HistorialTest.test_internos_de_django fija su forma; si una versión de
+  Django la cambia, registrar() no adivina: agenda un callback por evento
+  (correcto ante rollbacks, sin deduplicar).
+- suspendido(): para operaciones masivas. Mientras dura, los eventos solo se
+  cuentan; al salir queda una fila resumen por cliente tocado.
+
+    with historial.suspendido('AJUSTE_MASIVO', 'Recálculo de saldos'):
+        for f in facturas:
+            ...
+"""
+import contextvars
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import HistorialCliente
+
+AGRUPABLES = {'EDIT_CLIENTE'}  # una fila por cliente y transacción, aunque se edite varias veces
+
+_request = contextvars.ContextVar('historial_request', default=None)
+_suspension = contextvars.ContextVar('historial_suspension', default=None)
+
+
+class UsuarioActualMiddleware:
+    """Deja el request a mano para saber quién hizo el cambio. Va después de AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+
+def usuario_actual_id():
+    # DRF autentica en la vista (JWT) y deja el usuario también en el HttpRequest
+    user = getattr(_request.get(), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class _Pendientes:
+    """Eventos de una transacción (de un nivel de savepoint); se llama al commit."""
+
+    def __init__(self, using):
+        self.using = using
+        self.eventos = {}  # clave de deduplicación → HistorialCliente
+        self.escrito = False
+
+    def agregar(self, evento: HistorialCliente, origen=None):
+        cid = evento.cliente_id
+        if evento.tipo in AGRUPABLES:
+            if (cid, 'ALTA_CLIENTE', None) in self.eventos:
+                return
+            clave = (cid, evento.tipo, None)
+            self.eventos.pop(clave, None)  # la última edición queda al final
+        elif evento.tipo == 'ALTA_CLIENTE':
+            self.eventos.pop((cid, 'EDIT_CLIENTE', None), None)
+            clave = (cid, evento.tipo, None)
+        else:
+            # sin origen no hay forma de saber si es el mismo hecho: siempre se escribe
+            clave = (cid, evento.tipo, origen if origen is not None else object())
+        self.eventos.setdefault(clave, evento)
+
+    def __call__(self):
+        self.escrito = True
+        if self.eventos:
+            HistorialCliente.objects.using(self.using).bulk_create(self.eventos.values())
+        self.eventos = {}
+
+
+def _internos(conn):
+    """
+    (lista de on_commit, ids de sus callables, savepoints abiertos) de `conn`,
+    o None si no tienen la forma conocida: run_on_commit = [(sids, func, robust)].
+    """
+    agendados, savepoints = getattr(conn, 'run_on_commit', None), getattr(conn, 'savepoint_ids', None)
+    if not isinstance(agendados, list) or not isinstance(savepoints, list):
+        return None
+    if not all(isinstance(a, tuple) and len(a) == 3 and callable(a[1]) for a in agendados):
+        return None
+    return agendados, {id(a[1]) for a in agendados}, tuple(savepoints)
+
+
+def _pendientes(using) -> _Pendientes:
+    conn = transaction.get_connection(using)
+    internos = _internos(conn)
+    if internos is None:  # Django cambió: un buffer (y un on_commit) por evento
+        p = _Pendientes(using)
+        transaction.on_commit(p, using=using)
+        if not hasattr(conn, '_historial_sueltos'):
+            conn._historial_sueltos = weakref.WeakSet()  # para descartar(); se van con su on_commit
+        conn._historial_sueltos.add(p)
+        return p
+    agendados, vivos, nivel = internos
+    estado = getattr(conn, '_historial_pendientes', None)
+    if estado is None or estado[0] is not agendados:
+        # Django reemplaza la lista de on_commit al commit, al rollback y al
+        # revertir un savepoint: siguen valiendo los buffers que quedaron agendados
+        buffers = {n: p for n, p in estado[1].items() if id(p) in vivos} if estado else {}
+        estado = conn._historial_pendientes = (agendados, buffers)
+    # un buffer por nivel de savepoint: si el savepoint se revierte, Django
+    # descarta su on_commit y los eventos de ese nivel no se escriben
+    p = estado[1].get(nivel)
+    if p is None or p.escrito:
+        p = estado[1][nivel] = _Pendientes(using)
+        transaction.on_commit(p, using=using)
+    return p
+
+
+def registrar(cliente_id, tipo: str, nota: str | None = None, usuario=None, using=None, origen=None):
+    """
+    Agenda un evento del historial de `cliente_id` (se escribe al commit).
+    `origen`: la instancia que lo produjo (Factura, Pago, ...); el mismo
+    evento de la misma instancia en la transacción se escribe una vez.
+    """
+    suspension = _suspension.get()
+    if suspension is not None:
+        suspension.setdefault(cliente_id, Counter())[tipo] += 1
+        return
+    evento = HistorialCliente(cliente_id=cliente_id, tipo=tipo, nota=nota,
+                              usuario_id=getattr(usuario, 'pk', usuario) or usuario_actual_id())
+    if not transaction.get_connection(using).in_atomic_block:
+        HistorialCliente.objects.using(using).bulk_create([evento])
+        return
+    if origen is not None:
+        origen = (origen._meta.label, origen.pk)
+    _pendientes(using).agregar(evento, origen)
+
+
+def descartar(cliente_id, using=None):
+    """El cliente se borró en esta transacción: lo agendado para él ya no se escribe."""
+    conn = transaction.get_connection(using)
+    estado = getattr(conn, '_historial_pendientes', None)
+    for p in [*(estado[1].values() if estado else ()), *getattr(conn, '_historial_sueltos', ())]:
+        p.eventos = {k: e for k, e in p.eventos.items() if k[0] != cliente_id}
+
+
+@contextmanager
+def suspendido(tipo: str, nota: str, usuario=None):
+    """
+    Suspende el registro evento a evento. Al salir (sin excepción), una fila
+    `tipo` por cliente afectado, con `nota` y el conteo de eventos:
+    "Recálculo de saldos: EDIT_CLIENTE×3, PAGO_REGISTRADO×1".
+    """
+    conteos = {}
+    token = _suspension.set(conteos)
+    try:
+        yield conteos
+    finally:
+        _suspension.reset(token)
+    for cid, c in conteos.items():
+        detalle = ', '.join(f'{t}×{n}' for t, n in sorted(c.items()))
+        registrar(cid, tipo, f'{nota}: {detalle}', usuario=usuario)
@@ -0,0 +1,177 @@
+# clientes/importacion.py
+"""
+Importación masiva de clientes desde CSV, con upsert por CUIT.
+
+- Lee el CSV en streaming y procesa de a tandas (`chunk` filas).
+- Valida cada fila con las mismas reglas que ClienteSerializer, sin
+  instanciar el serializer por fila.
+- Por tanda: 1 SELECT de los CUIT existentes, 1 INSERT ... ON CONFLICT(cuit)
+  DO UPDATE (bulk_create con update_conflicts) y el historial, que se
+  escribe al commit de la tanda en 1 INSERT (clientes/historial.py).
+  Las filas idénticas a lo que ya está en la base no se tocan.
+- No dispara señales post_save (bulk_create): el historial, el texto de
+  búsqueda (Cliente.busqueda) y la invalidación del typeahead y del cache
+  de reportes se hacen acá.
+
+Columnas: razon_social y cuit obligatorias; email, telefono, estado y activo
+opcionales (si la columna no está, no se pisa ese dato en los existentes).
+"""
+import codecs
+import csv
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from facturacion import cache_reportes
+
+from . import historial, typeahead
+from .busqueda import CAMPOS_BUSQUEDA, texto_busqueda
+from .models import Cliente
+
+COLUMNAS = ['razon_social', 'cuit', 'email', 'telefono', 'estado', 'activo']
+OBLIGATORIAS = ['razon_social', 'cuit']
+VERDADERO = {'1', 'true', 'si', 'sí', 's', 'yes', 'y', 'x', ''}  # vacío = default (activo)
+FALSO = {'0', 'false', 'no', 'n'}
+
+
+class ImportacionError(Exception):
+    """El archivo no se puede procesar (p. ej. faltan columnas)."""
+
+
+def _largo(campo):
+    return Cliente._meta.get_field(campo).max_length
+
+
+def validar_fila(fila: dict) -> tuple[dict, dict]:
+    """(datos limpios, errores {campo: mensaje}). Reglas de ClienteSerializer."""
+    datos, errores = {}, {}
+    for campo in COLUMNAS:
+        if campo not in fila:
+            continue
+        v = (fila[campo] or '').strip()
+        if campo == 'activo':
+            if v.lower() in VERDADERO:
+                datos[campo] = True
+            elif v.lower() in FALSO:
+                datos[campo] = False
+            else:
+                errores[campo] = 'Valor booleano inválido.'
+            continue
+        if campo == 'estado':
+            v = v.upper() or Cliente.ACTIVO
+            if v not in dict(Cliente.ESTADOS):
+                errores[campo] = f'Estado inválido: {v}.'
+        elif campo == 'email' and v:
+            try:
+                validate_email(v)
+            except ValidationError:
+                errores[campo] = 'Email inválido.'
+        if len(v) > _largo(campo):
+            errores[campo] = f'Máximo {_largo(campo)} caracteres.'
+        datos[campo] = v or None
+
+    if not datos.get('razon_social'):
+        errores.setdefault('razon_social', 'La razón social es obligatoria.')
+    cuit = datos.get('cuit')
+    if not cuit:
+        errores.setdefault('cuit', 'El CUIT es obligatorio para importar.')
+    elif len(cuit) < 8:
+        errores.setdefault('cuit', 'CUIT inválido.')
+    return datos, errores
+
+
+def leer_csv(lineas):
+    """
+    Iterable de líneas (str o bytes UTF-8, con o sin BOM) → (encabezado, filas dict).
+    Separador ',' o ';' (se detecta del encabezado).
+    """
+    lineas = iter(lineas)
+    primera = next(lineas, None)
+    if primera is None:
+        raise ImportacionError('El archivo está vacío.')
+    if isinstance(primera, bytes):
+        dec = codecs.getincrementaldecoder('utf-8-sig')()
+        primera = dec.decode(primera)
+        lineas = (dec.decode(l) for l in lineas)
+    primera = primera.lstrip('\ufeff')
+    sep = ';' if primera.count(';') > primera.count(',') else ','
+    encabezado = [c.strip().lower() for c in next(csv.reader([primera], delimiter=sep))]
+    faltan = [c for c in OBLIGATORIAS if c not in encabezado]
+    if faltan:
+        raise ImportacionError(f'Faltan columnas: {", ".join(faltan)}.')
+    return encabezado, csv.DictReader(lineas, fieldnames=encabezado, delimiter=sep)
+
+
+def importar_clientes(lineas, chunk: int = 2000, dry_run: bool = False, usuario=None) -> dict:
+    """
+    Importa/actualiza clientes. Devuelve el reporte:
+    {procesadas, creados, actualizados, sin_cambios, errores: [{fila, cuit, errores}]}
+    (`fila` = número de línea del archivo, el encabezado es la 1).
+    """
+    encabezado, filas = leer_csv(lineas)
+    campos = [c for c in COLUMNAS if c in encabezado]
+    reporte = {'procesadas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'errores': []}
+    vistos = {}  # cuit → fila donde apareció primero
+
+    tanda = []
+    for fila in filas:
+        n = filas.line_num + 1  # +1: el encabezado se leyó aparte
+        if not any((v or '').strip() for k, v in fila.items() if k):
+            continue  # línea vacía
+        reporte['procesadas'] += 1
+        datos, errores = validar_fila(fila)
+        cuit = datos.get('cuit')
+        if not errores and cuit in vistos:
+            errores = {'cuit': f'CUIT repetido en el archivo (fila {vistos[cuit]}).'}
+        if errores:
+            reporte['errores'].append({'fila': n, 'cuit': cuit, 'errores': errores})
+            continue
+        vistos[cuit] = n
+        tanda.append(datos)
+        if len(tanda) == chunk:
+            _guardar(tanda, campos, reporte, dry_run, usuario)
+            tanda = []
+    if tanda:
+        _guardar(tanda, campos, reporte, dry_run, usuario)
+    return reporte
+
+
+def _guardar(tanda, campos, reporte, dry_run, usuario):
+    leer = dict.fromkeys(['id', *campos, *CAMPOS_BUSQUEDA])
+    existentes = {c['cuit']: c for c in
+                  Cliente.objects.filter(cuit__in=[d['cuit'] for d in tanda]).values(*leer)}
+    nuevos, cambiados = [], []
+    for d in tanda:
+        actual = existentes.get(d['cuit'])
+        if actual is None:
+            nuevos.append(d)
+        elif any(actual[c] != d[c] for c in campos):
+            cambiados.append(d)
+    reporte['creados'] += len(nuevos)
+    reporte['actualizados'] += len(cambiados)
+    reporte['sin_cambios'] += len(tanda) - len(nuevos) - len(cambiados)
+    if dry_run or not (nuevos or cambiados):
+        return
+
+    def cliente(d):
+        # el texto de búsqueda usa los datos completos (las columnas que no vienen, de la base)
+        completo = {**existentes.get(d['cuit'], {}), **d}
+        return Cliente(**d, busqueda=texto_busqueda(*(completo.get(c) for c in CAMPOS_BUSQUEDA)))
+
+    with transaction.atomic():
+        objs = Cliente.objects.bulk_create(
+            [cliente(d) for d in nuevos + cambiados],
+            update_conflicts=True, unique_fields=['cuit'],
+            update_fields=[c for c in campos if c != 'cuit'] + ['busqueda'],
+        )
+        # si el motor no devuelve los ids del upsert, se buscan por CUIT
+        ids = {o.cuit: o.pk for o in objs if o.pk is not None}
+        if len(ids) < len(objs):
+            ids = dict(Cliente.objects.filter(cuit__in=[o.cuit for o in objs]).values_list('cuit', 'id'))
+        es_nuevo = {d['cuit'] for d in nuevos}
+        for o in objs:
+            historial.registrar(ids[o.cuit], 'ALTA_CLIENTE' if o.cuit in es_nuevo else 'EDIT_CLIENTE',
+                                f'{o.razon_social} (importación CSV)', usuario=usuario)
+        typeahead.invalidar()
+        cache_reportes.invalidar('clientes')  # pagos-tiempo muestra la razón social
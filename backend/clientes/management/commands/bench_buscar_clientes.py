@@ -0,0 +1,67 @@
+# clientes/management/commands/bench_buscar_clientes.py
+import random
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from clientes.busqueda import buscar_ids, texto_busqueda
+from clientes.models import Cliente
+
+PALABRAS = ['Servicios', 'Construcciones', 'Logística', 'Ñandú', 'Agropecuaria', 'Córdoba', 'Patagonia',
+            'Distribuidora', 'Metalúrgica', 'Transporte', 'Informática', 'Pingüino', 'Andina', 'Del Sur',
+            'Comercial', 'Industrias', 'Alimentos', 'Estudio', 'Consultora', 'Mendoza', 'Rosario', 'Norte']
+SOCIEDAD = ['S.A.', 'SRL', 'S.A.S.', 'y Cía.', '']
+SILABAS = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ru', 'sa', 'te', 'vi', 'zo', 'qui', 'tra',
+           'bre', 'cla', 'dor', 'man']
+
+
+class Command(BaseCommand):
+    help = ('Benchmark: GET buscar (índice FTS) vs icontains sobre N clientes. '
+            'Corre en una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=1_000_000)
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def handle(self, *args, **opts):
+        n, rep = opts['n'], opts['repeticiones']
+        rnd = random.Random(1)
+        # nombres: una palabra inventada + 0-2 palabras comunes (cada una en ~5% de los clientes) + tipo
+        consultas = ['nandu', 'serv', 'ba', 'manqui', 'Pingüino Córdoba', 'LOGISTICA del sur',
+                     'transporte mendoza srl', 'constru', '27', '30-4000', '33-40001234', 'zzz']
+
+        with transaction.atomic():
+            t0 = perf_counter()
+            filas = []
+            for i in range(n):
+                fantasia = ''.join(rnd.choice(SILABAS) for _ in range(rnd.randint(2, 4))).capitalize()
+                nombre = ' '.join([fantasia, *rnd.sample(PALABRAS, rnd.randint(0, 2)), rnd.choice(SOCIEDAD)]).strip()
+                cuit = f'{(20, 23, 27, 30, 33)[i % 5]}-{40_000_000 + i:08d}-{i % 10}'
+                email = f'admin{i}@ejemplo.com'
+                filas.append((nombre, cuit, email, 'ACTIVO', True, texto_busqueda(nombre, cuit, email)))
+                if len(filas) == 20_000 or i == n - 1:
+                    with connection.cursor() as c:
+                        c.executemany('INSERT INTO clientes_cliente (razon_social, cuit, email, estado, activo, '
+                                      "busqueda, fecha_alta) VALUES (%s, %s, %s, %s, %s, %s, date('now'))", filas)
+                    filas = []
+            self.stdout.write(f'{n} clientes cargados (con índice) en {perf_counter() - t0:.1f}s\n')
+
+            def medir(fn, veces):
+                tiempos = []
+                for _ in range(veces):
+                    t0 = perf_counter()
+                    res = fn()
+                    tiempos.append((perf_counter() - t0) * 1000)
+                return median(tiempos), max(tiempos), len(res)
+
+            self.stdout.write(f'{"consulta":28} {"índice p50":>11} {"máx":>8} {"hits":>5}   {"icontains p50":>13}')
+            for q in consultas:
+                p50, mx, hits = medir(lambda: buscar_ids(q, 50), rep)
+                viejo = lambda: list(Cliente.objects.filter(Q(razon_social__icontains=q) | Q(cuit__icontains=q))
+                                     .order_by('razon_social').values_list('id', flat=True)[:50])
+                v50, _, _ = medir(viejo, 3)
+                self.stdout.write(f'{q!r:28} {p50:9.2f}ms {mx:6.2f}ms {hits:5}   {v50:11.1f}ms')
+            transaction.set_rollback(True)
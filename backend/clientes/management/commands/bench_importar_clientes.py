@@ -0,0 +1,51 @@
+# clientes/management/commands/bench_importar_clientes.py
+from io import StringIO
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from clientes.importacion import importar_clientes
+
+
+class Command(BaseCommand):
+    help = ('Benchmark: importación CSV de N clientes (alta y re-importación con cambios) vs '
+            'un POST /api/clientes/ por fila (sobre una muestra). Corre en una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=100_000)
+        parser.add_argument('--muestra', type=int, default=500, help='Filas para medir el camino de a un POST.')
+
+    def handle(self, *args, **opts):
+        n, muestra = opts['n'], opts['muestra']
+
+        def csv_clientes(cambio=''):
+            filas = ''.join(f'Cliente {i}{cambio if i % 10 == 0 else ""},30-{i:08d}-1,c{i}@ejemplo.com,,ACTIVO,1\n'
+                            for i in range(n))
+            return StringIO('razon_social,cuit,email,telefono,estado,activo\n' + filas)
+
+        api = APIClient(SERVER_NAME='localhost')
+        with transaction.atomic():
+            t0 = perf_counter()
+            for i in range(muestra):
+                r = api.post('/api/clientes/', {'razon_social': f'Post {i}', 'cuit': f'33-{i:08d}-9'}, format='json')
+                assert r.status_code == 201, r.content
+            t_post = perf_counter() - t0
+
+            archivo = csv_clientes()
+            t0 = perf_counter()
+            alta = importar_clientes(archivo)
+            t_alta = perf_counter() - t0
+
+            archivo = csv_clientes(cambio=' (mod)')
+            t0 = perf_counter()
+            reimp = importar_clientes(archivo)
+            t_reimp = perf_counter() - t0
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'POST por fila ({muestra}) : {muestra / t_post:10.0f} filas/s  '
+                          f'(→ {n / (muestra / t_post):7.1f}s estimados para {n})')
+        self.stdout.write(f'importación alta       : {n / t_alta:10.0f} filas/s  {t_alta:7.2f}s  creados={alta["creados"]}')
+        self.stdout.write(f're-importación         : {n / t_reimp:10.0f} filas/s  {t_reimp:7.2f}s  '
+                          f'actualizados={reimp["actualizados"]} sin_cambios={reimp["sin_cambios"]}')
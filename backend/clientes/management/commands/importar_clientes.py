@@ -0,0 +1,40 @@
+# clientes/management/commands/importar_clientes.py
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.importacion import ImportacionError, importar_clientes
+
+
+class Command(BaseCommand):
+    help = ('Importa clientes desde un CSV (UTF-8, separador , o ;) con upsert por CUIT. '
+            'Columnas: razon_social, cuit [, email, telefono, estado, activo].')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--chunk', type=int, default=2000, help='Filas por tanda (una transacción por tanda).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo valida y cuenta; no escribe.')
+        parser.add_argument('--errores', help='Guarda el detalle de filas con error en este CSV.')
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts['archivo'], encoding='utf-8-sig', newline='') as fh:
+                rep = importar_clientes(fh, chunk=opts['chunk'], dry_run=opts['dry_run'])
+        except (OSError, UnicodeDecodeError, ImportacionError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"procesadas={rep['procesadas']} creados={rep['creados']} "
+                          f"actualizados={rep['actualizados']} sin_cambios={rep['sin_cambios']} "
+                          f"errores={len(rep['errores'])}" + (' (dry-run)' if opts['dry_run'] else ''))
+        if opts['errores'] and rep['errores']:
+            with open(opts['errores'], 'w', encoding='utf-8', newline='') as fh:
+                w = csv.writer(fh)
+                w.writerow(['fila', 'cuit', 'errores'])
+                for e in rep['errores']:
+                    w.writerow([e['fila'], e['cuit'] or '', json.dumps(e['errores'], ensure_ascii=False)])
+        else:
+            for e in rep['errores'][:20]:
+                self.stdout.write(f"  fila {e['fila']}: {e['errores']}")
+            if len(rep['errores']) > 20:
+                self.stdout.write(f"  ... y {len(rep['errores']) - 20} más (usar --errores archivo.csv)")
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_cliente_activo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['razon_social'], name='clientes_cl_razon_s_eb90c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialcliente',
+            index=models.Index(fields=['cliente', '-fecha'], name='clientes_hi_cliente_23eec3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialcliente',
+            index=models.Index(fields=['-fecha'], name='clientes_hi_fecha_058b72_idx'),
+        ),
+    ]
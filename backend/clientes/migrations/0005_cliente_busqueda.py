@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:09
+
+from django.db import OperationalError, migrations, models, transaction
+
+from clientes.busqueda import FTS_TABLE, texto_busqueda
+
+SQLITE_FTS = [
+    # external content: el texto vive en clientes_cliente.busqueda, FTS5 guarda solo el índice
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        busqueda, content='clientes_cliente', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6')""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON clientes_cliente BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON clientes_cliente BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF busqueda ON clientes_cliente BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda);
+        INSERT INTO {FTS_TABLE}(rowid, busqueda) VALUES (new.id, new.busqueda);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_FTS_DROP = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+PG_TRGM = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS clientes_cliente_busqueda_trgm '
+    'ON clientes_cliente USING gin (busqueda gin_trgm_ops)',
+]
+PG_TRGM_DROP = ['DROP INDEX IF EXISTS clientes_cliente_busqueda_trgm']
+
+
+def completar_busqueda(apps, schema_editor):
+    Cliente = apps.get_model('clientes', 'Cliente')
+    db = schema_editor.connection.alias
+    tanda = []
+    for c in Cliente.objects.using(db).only('razon_social', 'cuit', 'email').iterator(chunk_size=2000):
+        c.busqueda = texto_busqueda(c.razon_social, c.cuit, c.email)
+        tanda.append(c)
+        if len(tanda) == 2000:
+            Cliente.objects.using(db).bulk_update(tanda, ['busqueda'])
+            tanda = []
+    if tanda:
+        Cliente.objects.using(db).bulk_update(tanda, ['busqueda'])
+
+
+def _ejecutar(schema_editor, sentencias):
+    with schema_editor.connection.cursor() as c:
+        for sql in sentencias:
+            c.execute(sql)
+
+
+def crear_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                _ejecutar(schema_editor, SQLITE_FTS)
+        except OperationalError:
+            pass  # SQLite sin FTS5: la búsqueda cae a LIKE sobre `busqueda`
+    elif vendor == 'postgresql':
+        _ejecutar(schema_editor, PG_TRGM)
+
+
+def borrar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _ejecutar(schema_editor, SQLITE_FTS_DROP)
+    elif vendor == 'postgresql':
+        _ejecutar(schema_editor, PG_TRGM_DROP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_indices_historial_y_razon_social'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(completar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
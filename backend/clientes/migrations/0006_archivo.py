@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from core.retencion import CrearTablaArchivo
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0005_cliente_busqueda'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        CrearTablaArchivo(
+            fecha='fecha',
+            name='HistorialClienteArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('tipo', models.CharField(max_length=30)),
+                ('nota', models.TextField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='clientes.cliente')),
+                ('usuario', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'clientes_historialcliente_archivo',
+                'indexes': [models.Index(fields=['cliente', '-fecha'], name='clientes_harch_cli_fecha_idx'), models.Index(fields=['-fecha'], name='clientes_harch_fecha_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .busqueda import CAMPOS_BUSQUEDA, texto_busqueda
+
 class Cliente(models.Model):
     ACTIVO = 'ACTIVO'
     INACTIVO = 'INACTIVO'
@@ -12,9 +14,22 @@ class Cliente(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADOS, default=ACTIVO)
     fecha_alta = models.DateField(auto_now_add=True)
     activo       = models.BooleanField(default=True)  # <— NUEVO
+    # texto normalizado para el índice de búsqueda (ver clientes/busqueda.py)
+    busqueda = models.TextField(default='', blank=True, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['razon_social'])]  # orden del listado / cursor
+
     def __str__(self):
         return self.razon_social
 
+    def save(self, *args, **kwargs):
+        self.busqueda = texto_busqueda(self.razon_social, self.cuit, self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(CAMPOS_BUSQUEDA):
+            kwargs['update_fields'] = {*update_fields, 'busqueda'}
+        super().save(*args, **kwargs)
+
 # clientes/models.py
 class HistorialCliente(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='historial')
@@ -22,3 +37,25 @@ class HistorialCliente(models.Model):
     tipo = models.CharField(max_length=30)  # ALTA_CLIENTE, EDIT_CLIENTE, FACTURA_CREADA, PAGO_REGISTRADO, etc.
     nota = models.TextField(null=True, blank=True)
     usuario = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['cliente', '-fecha']),  # /api/clientes/ID/historial/
+            models.Index(fields=['-fecha']),             # historial-global
+        ]
+
+
+class HistorialClienteArchivo(models.Model):
+    """HistorialCliente de meses viejos (core/retencion.py). Mismos ids; sin FK reales."""
+    id = models.BigIntegerField(primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    fecha = models.DateTimeField()
+    tipo = models.CharField(max_length=30)
+    nota = models.TextField(null=True, blank=True)
+    usuario = models.ForeignKey('auth.User', null=True, blank=True, on_delete=models.DO_NOTHING,
+                                db_constraint=False, related_name='+')
+
+    class Meta:
+        db_table = 'clientes_historialcliente_archivo'
+        indexes = [models.Index(fields=['cliente', '-fecha'], name='clientes_harch_cli_fecha_idx'),
+                   models.Index(fields=['-fecha'], name='clientes_harch_fecha_idx')]
@@ -11,7 +11,7 @@ def _blank_to_none(d: dict, keys: list[str]):
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cliente
-        fields = '__all__'
+        exclude = ['busqueda']  # texto interno del índice de búsqueda
         extra_kwargs = {
             'cuit':     {'allow_null': True, 'required': False, 'allow_blank': True},
             'email':    {'allow_null': True, 'required': False, 'allow_blank': True},
@@ -1,37 +1,46 @@
 # clientes/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Cliente, HistorialCliente
+from . import historial, typeahead
+from .busqueda import CAMPOS_BUSQUEDA
+from .models import Cliente, HistorialClienteArchivo
 from facturacion.models import Factura, Pago
 
+# historial: todo pasa por historial.registrar() (se escribe al commit, en un bulk_create)
 @receiver(post_save, sender=Cliente)
-def log_cliente(sender, instance, created, **kwargs):
-    HistorialCliente.objects.create(
-        cliente=instance,
-        tipo='ALTA_CLIENTE' if created else 'EDIT_CLIENTE',
-        nota=f'Cliente {instance.razon_social} {"creado" if created else "editado"}'
-    )
+def log_cliente(sender, instance: Cliente, created: bool, update_fields=None, **kwargs):
+    if created:
+        tipo, nota = 'ALTA_CLIENTE', f'Cliente {instance.razon_social} creado'
+    elif update_fields is not None and set(update_fields) == {'estado'}:
+        activo = instance.estado == Cliente.ACTIVO
+        tipo = 'ACTIVACION_CLIENTE' if activo else 'DESACTIVACION_CLIENTE'
+        nota = f'{instance.razon_social} {"activado" if activo else "desactivado"}'
+    else:
+        tipo, nota = 'EDIT_CLIENTE', f'Cliente {instance.razon_social} editado'
+    historial.registrar(instance.pk, tipo, nota, origen=instance)
 
 @receiver(post_save, sender=Factura)
 def log_factura(sender, instance, created, **kwargs):
     if created:
-        HistorialCliente.objects.create(
-            cliente=instance.cliente,
-            tipo='FACTURA_CREADA',
-            nota=f'Factura {instance.nro} por {instance.total}'
-        )
-@receiver(post_save, sender=Cliente)
-def log_cliente_save(sender, instance: Cliente, created: bool, **kwargs):
-    # Alta vs Edición
-    tipo = 'ALTA_CLIENTE' if created else 'EDIT_CLIENTE'
-    nota = f'{instance.razon_social}'
-    HistorialCliente.objects.create(cliente=instance, tipo=tipo, nota=nota)
-    
+        historial.registrar(instance.cliente_id, 'FACTURA_CREADA', f'Factura {instance.nro} por {instance.total}',
+                            origen=instance)
+
 @receiver(post_save, sender=Pago)
 def log_pago(sender, instance, created, **kwargs):
     if created:
-        HistorialCliente.objects.create(
-            cliente=instance.factura.cliente,
-            tipo='PAGO_REGISTRADO',
-            nota=f'Pago {instance.monto} a {instance.factura.nro}'
-        )
+        # la factura ya viene cargada del serializer; el cliente no hace falta (cliente_id)
+        f = instance.factura
+        historial.registrar(f.cliente_id, 'PAGO_REGISTRADO', f'Pago {instance.monto} a {f.nro}', origen=instance)
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_typeahead(sender, instance, update_fields=None, **kwargs):
+    # p. ej. activar/desactivar (update_fields=['estado']) no cambia lo que muestra el typeahead
+    if update_fields is None or set(update_fields) & {*CAMPOS_BUSQUEDA, 'busqueda'}:
+        typeahead.invalidar()
+
+@receiver(post_delete, sender=Cliente)
+def borrar_historial_archivado(sender, instance, **kwargs):
+    # el historial caliente se borra por CASCADE; el archivado no tiene FK real
+    historial.descartar(instance.pk)
+    HistorialClienteArchivo.objects.filter(cliente_id=instance.pk).delete()
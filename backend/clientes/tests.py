@@ -1,3 +1,413 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from facturacion.models import Factura, Pago
+from facturacion.tests import cursor_de, recorrer_paginas
+
+from . import historial
+from .models import Cliente, HistorialCliente
+
+
+class ImportarClientesTest(TestCase):
+    CSV = ('razon_social,cuit,email,activo\n'
+           'ACME SA,20-12345678-9,pagos@acme.com,1\n'
+           'Nueva SRL,30-11111111-1,,si\n'
+           ',30-22222222-2,x@y.com,1\n'              # sin razón social
+           'Mal Mail,30-33333333-3,no-es-mail,1\n'
+           'ACME Duplicada,20-12345678-9,,1\n'       # CUIT repetido en el archivo
+           '\n'
+           'Sin Cambios,27-44444444-4,,0\n')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.acme = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.igual = Cliente.objects.create(razon_social='Sin Cambios', cuit='27-44444444-4', activo=False)
+        HistorialCliente.objects.all().delete()
+
+    def _subir(self, contenido, url='/api/clientes/importar/'):
+        archivo = SimpleUploadedFile('clientes.csv', contenido.encode('utf-8-sig'), content_type='text/csv')
+        return self.api.post(url, {'archivo': archivo}, format='multipart')
+
+    def test_invalida_reportes_con_razon_social(self):
+        f = Factura.objects.create(cliente=self.acme, nro='F-1', total=Decimal('100.00'))
+        Pago.objects.create(factura=f, fecha=date(2025, 1, 1), monto=Decimal('100.00'))
+        top = lambda: [r['cliente'] for r in self.api.get('/api/reportes/pagos-tiempo/top/').json()]
+        self.assertEqual(top(), ['ACME'])
+        self.assertEqual(top(), ['ACME'])  # ya cacheado
+        with self.captureOnCommitCallbacks(execute=True):
+            self._subir('razon_social,cuit\nACME Renombrada,20-12345678-9\n')
+        self.assertEqual(top(), ['ACME Renombrada'])
+
+    def test_upsert_y_reporte(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self._subir(self.CSV)
+        self.assertEqual(resp.status_code, 200)
+        rep = resp.json()
+        self.assertEqual({k: rep[k] for k in ('procesadas', 'creados', 'actualizados', 'sin_cambios')},
+                         {'procesadas': 6, 'creados': 1, 'actualizados': 1, 'sin_cambios': 1})
+        self.assertEqual([(e['fila'], list(e['errores'])) for e in rep['errores']],
+                         [(4, ['razon_social']), (5, ['email']), (6, ['cuit'])])
+
+        self.acme.refresh_from_db()
+        self.assertEqual((self.acme.razon_social, self.acme.email), ('ACME SA', 'pagos@acme.com'))
+        nueva = Cliente.objects.get(cuit='30-11111111-1')
+        self.assertEqual((nueva.email, nueva.activo, nueva.estado), (None, True, Cliente.ACTIVO))
+        # un solo registro de historial por cliente tocado (no los dos receivers de post_save)
+        self.assertEqual(sorted(HistorialCliente.objects.values_list('cliente_id', 'tipo')),
+                         sorted([(self.acme.pk, 'EDIT_CLIENTE'), (nueva.pk, 'ALTA_CLIENTE')]))
+
+    def test_queries_por_tanda(self):
+        filas = ''.join(f'Cliente {i},30-{i:08d}-1,,1\n' for i in range(500))
+        archivo = StringIO('razon_social,cuit,email,activo\n' + filas)
+        from .importacion import importar_clientes
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            rep = importar_clientes(archivo, chunk=100)
+        self.assertEqual(rep['creados'], 500)
+        # por tanda: SELECT existentes + INSERT clientes + INSERT historial al commit (el resto son savepoints)
+        sql = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('SELECT', 'INSERT'))]
+        self.assertEqual(len(sql), 5 * 3)
+        self.assertEqual(HistorialCliente.objects.count(), 500)
+
+    def test_body_crudo_punto_y_coma_y_dry_run(self):
+        resp = self.api.generic('POST', '/api/clientes/importar/?dry_run=1',
+                                'razon_social;cuit\nOtra;30-55555555-5\n'.encode(), content_type='text/csv')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['creados'], 1)
+        self.assertFalse(Cliente.objects.filter(cuit='30-55555555-5').exists())
+
+    def test_faltan_columnas(self):
+        resp = self._subir('nombre,email\nx,y@z.com\n')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_comando(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as fh:
+            fh.write(self.CSV)
+        self.addCleanup(os.unlink, fh.name)
+        out = StringIO()
+        call_command('importar_clientes', fh.name, stdout=out)
+        self.assertIn('creados=1 actualizados=1 sin_cambios=1 errores=3', out.getvalue())
+
+
+class ClientePaginacionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        nombres = ['ACME', 'Beta', 'Gamma ACME']
+        for i in range(17):  # create(): arma el texto de búsqueda
+            Cliente.objects.create(razon_social=nombres[i % 3], cuit=f'20-{i:08d}-1')
+        for i, c in enumerate(Cliente.objects.order_by('id')):  # fecha_alta es auto_now_add
+            Cliente.objects.filter(pk=c.pk).update(fecha_alta=date(2025, 1, 1 + i % 2))
+
+    def setUp(self):
+        self.api = APIClient()
+
+    def _verificar(self, query, esperados):
+        ida, vuelta = recorrer_paginas(self, f'/api/clientes/?page_size=3&{query}')
+        self.assertEqual(len(ida), len(set(ida)))
+        self.assertEqual(set(ida), set(esperados))
+        self.assertEqual(vuelta, ida)
+        por_id = Cliente.objects.in_bulk(ida)
+        return [por_id[i] for i in ida]
+
+    def test_empates_en_razon_social(self):
+        clientes = self._verificar('', Cliente.objects.values_list('id', flat=True))
+        claves = [(c.razon_social, c.id) for c in clientes]
+        self.assertEqual(claves, sorted(claves))
+
+    def test_con_ordering_y_search(self):
+        esperados = Cliente.objects.filter(razon_social__contains='ACME').values_list('id', flat=True)
+        clientes = self._verificar('ordering=-fecha_alta&search=acme', esperados)
+        claves = [(c.fecha_alta, c.id) for c in clientes]
+        self.assertEqual(claves, sorted(claves, reverse=True))
+
+    def test_cursor_adulterado(self):
+        for cursor in ('%%%', cursor_de({'p': ['ACME', 'uno']}), cursor_de({'p': ['ACME', None]}), cursor_de({'p': 5})):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.api.get('/api/clientes/', {'cursor': cursor}).status_code, 404)
+
+
+class BuscarClientesTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.nandu = Cliente.objects.create(razon_social='Ñandú Construcciones S.A.', cuit='30-71234567-8')
+        self.acme = Cliente.objects.create(razon_social='ACME Servicios', cuit='20-12345678-9',
+                                           email='pagos@acme.com')
+        self.otro = Cliente.objects.create(razon_social='Construcción y Servicios ACME', cuit='27-99999999-1')
+
+    def _buscar(self, q):
+        resp = self.api.get('/api/clientes/buscar/', {'q': q})
+        self.assertEqual(resp.status_code, 200)
+        return [c['id'] for c in resp.json()]
+
+    def test_acentos_y_mayusculas(self):
+        self.assertEqual(self._buscar('nandu'), [self.nandu.id])
+        self.assertEqual(self._buscar('ÑANDÚ const'), [self.nandu.id])
+        self.assertEqual(set(self._buscar('construc')), {self.nandu.id, self.otro.id})
+
+    def test_prefijo_de_cuit_con_y_sin_guiones(self):
+        self.assertEqual(self._buscar('30-7123'), [self.nandu.id])
+        self.assertEqual(self._buscar('307123'), [self.nandu.id])
+        self.assertEqual(self._buscar('30712345678'), [self.nandu.id])
+        self.assertEqual(self._buscar('99'), [])  # prefijo, no subcadena
+
+    def test_todas_las_palabras_y_ranking(self):
+        self.assertEqual(set(self._buscar('acme serv')), {self.acme.id, self.otro.id})
+        self.assertEqual(self._buscar('acme pagos'), [self.acme.id])  # también indexa el email
+        self.assertEqual(self._buscar('acme')[0], self.acme.id)       # empieza por "acme"
+        sa = Cliente.objects.create(razon_social='Acme Norte S.A.')
+        self.assertEqual(self._buscar('acme s.a.')[0], sa.id)         # "sa" no filtra, ordena
+        self.assertEqual(len(self._buscar('acme s.a.')), 3)
+
+    def test_sincronizado_al_editar_y_borrar(self):
+        self.nandu.razon_social = 'Avestruz SRL'
+        self.nandu.save(update_fields=['razon_social'])
+        self.assertEqual(self._buscar('nandu'), [])
+        self.assertEqual(self._buscar('avestruz'), [self.nandu.id])
+        self.acme.delete()
+        self.assertEqual(self._buscar('acme'), [self.otro.id])
+
+    def test_importacion_actualiza_el_indice(self):
+        from .importacion import importar_clientes
+        importar_clientes(['razon_social,cuit\n', 'Pingüino SA,20-12345678-9\n', 'Zeta SRL,33-1\n'])
+        self.assertEqual(self._buscar('pinguino'), [self.acme.id])
+        self.assertEqual(self._buscar('pagos'), [self.acme.id])  # el email no venía: se conserva
+        self.assertEqual(self._buscar('servicios'), [self.otro.id])
+
+    def test_busqueda_no_sale_en_la_api(self):
+        datos = self.api.get(f'/api/clientes/{self.acme.id}/').json()
+        self.assertNotIn('busqueda', datos)
+        self.assertEqual(datos['razon_social'], 'ACME Servicios')
+
+    def test_search_del_listado_usa_el_indice(self):
+        resp = self.api.get('/api/clientes/', {'search': 'SERVICIOS acme'})
+        datos = resp.json()
+        ids = [c['id'] for c in (datos['results'] if isinstance(datos, dict) else datos)]
+        self.assertEqual(set(ids), {self.acme.id, self.otro.id})
+
+
+class TypeaheadTest(TestCase):
+    def setUp(self):
+        from .typeahead import get_cache
+        self.api = APIClient()
+        self.cache = get_cache()
+        self.cache.invalidar()
+        self.acme = Cliente.objects.create(razon_social='ACME Servicios', cuit='20-12345678-9', email='a@b.com')
+        self.acmar = Cliente.objects.create(razon_social='Acmar Logística SRL', cuit='30-12000000-1')
+        self.otro = Cliente.objects.create(razon_social='Ñandú SA', cuit='27-99999999-1')
+
+    def _ta(self, q, **params):
+        resp = self.api.get('/api/clientes/typeahead/', {'q': q, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_campos_y_orden(self):
+        datos = self._ta('acm')
+        self.assertIn({'id': self.acme.id, 'razon_social': 'ACME Servicios', 'cuit': '20-12345678-9'}, datos)
+        self.assertEqual([d['id'] for d in datos], [self.acmar.id, self.acme.id])  # más corto primero
+        self.assertEqual(len(self._ta('acm', limit=1)), 1)
+
+    def test_repetidos_y_refinados_sin_base(self):
+        self._ta('acm')
+        self._ta('20-1')
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self._ta('ACM')), 2)                   # misma clave normalizada
+            self.assertEqual([d['id'] for d in self._ta('acme')], [self.acme.id])   # refinado
+            self.assertEqual([d['id'] for d in self._ta('acmar log')], [self.acmar.id])
+            self.assertEqual([d['id'] for d in self._ta('2012345')], [self.acme.id])  # CUIT sin guiones
+            self.assertEqual(self._ta('acmez'), [])
+
+    def test_escrituras_invalidan(self):
+        self._ta('acm')
+        nuevo = Cliente.objects.create(razon_social='Acme Norte', cuit='33-1')
+        self.assertIn(nuevo.id, [d['id'] for d in self._ta('acm')])
+        self.acme.razon_social = 'Zeta'
+        self.acme.save(update_fields=['razon_social'])
+        self.assertNotIn(self.acme.id, [d['id'] for d in self._ta('acm')])
+        nuevo.delete()
+        self.assertEqual([d['id'] for d in self._ta('acm')], [self.acmar.id])
+
+    def test_importacion_invalida_y_estado_no(self):
+        from .importacion import importar_clientes
+        self._ta('acm')
+        self.api.post(f'/api/clientes/{self.acmar.id}/desactivar/')
+        with self.assertNumQueries(0):
+            self._ta('acm')
+        importar_clientes(['razon_social,cuit\n', 'Acmé Importada,30-55555555-5\n'])
+        self.assertEqual(len(self._ta('acm')), 3)
+
+
+class RetencionHistorialTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from core.retencion import _inicio, _mes, _sumar_meses
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        politica = {'modelo': 'clientes.HistorialCliente', 'archivo': 'clientes.HistorialClienteArchivo',
+                    'fecha': 'fecha', 'meses': 1, 'meses_archivo': 1}
+        ajustes = self.settings(ARCHIVO_DIR=self.tmp.name, RETENCION={'historial': politica})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.api = APIClient()
+        self.cli = Cliente.objects.create(razon_social='ACME')
+        HistorialCliente.objects.all().delete()
+        mes = _mes(timezone.localdate())
+        self.fechas = {
+            'caliente': timezone.now(),
+            'archivo': _inicio(_sumar_meses(mes, -2)) + timedelta(days=3),   # antes del corte (mes - 1)
+            'frio': _inicio(_sumar_meses(mes, -2)) - timedelta(days=20),     # antes de corte_archivo
+        }
+        for tipo, fecha in self.fechas.items():
+            h = HistorialCliente.objects.create(cliente=self.cli, tipo=tipo.upper())
+            HistorialCliente.objects.filter(pk=h.pk).update(fecha=fecha)
+
+    def _tipos(self, url, **params):
+        resp = self.api.get(url, params)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return [h['tipo'] for h in resp.json()]
+
+    def test_archivar_y_leer_los_tres_niveles(self):
+        from .models import HistorialClienteArchivo
+        out = StringIO()
+        call_command('archivar', 'historial', '--lote', '1', stdout=out)
+        self.assertEqual(list(HistorialCliente.objects.values_list('tipo', flat=True)), ['CALIENTE'])
+        self.assertEqual(list(HistorialClienteArchivo.objects.values_list('tipo', flat=True)), ['ARCHIVO'])
+        archivos = os.listdir(os.path.join(self.tmp.name, 'clientes_historialcliente'))
+        self.assertEqual(archivos, [f'{self.fechas["frio"]:%Y-%m}.1.ndjson.gz'])
+
+        url = '/api/clientes/historial-global/'
+        self.assertEqual(self._tipos(url), ['CALIENTE'])  # sin rango: solo la tabla caliente
+        desde = f'{self.fechas["frio"]:%Y-%m-%d}'
+        self.assertEqual(self._tipos(url, desde=desde), ['CALIENTE', 'ARCHIVO', 'FRIO'])
+        self.assertEqual(self._tipos(url, desde=desde, limit=2), ['CALIENTE', 'ARCHIVO'])
+        self.assertEqual(self._tipos(url, desde=desde, tipos='FRIO'), ['FRIO'])
+        self.assertEqual(self._tipos(f'/api/clientes/{self.cli.id}/historial/', desde=desde),
+                         ['CALIENTE', 'ARCHIVO', 'FRIO'])
+        datos = self.api.get(url, {'desde': desde}).json()
+        self.assertEqual(datos[-1]['cliente_razon_social'], 'ACME')
+        self.assertEqual(self.api.get(url, {'desde': 'ayer'}).status_code, 400)
+
+    def test_borrar_cliente_no_deja_historial_archivado(self):
+        from .models import HistorialClienteArchivo
+        call_command('archivar', stdout=StringIO())
+        self.cli.delete()
+        self.assertFalse(HistorialClienteArchivo.objects.exists())
+        self.assertEqual(self._tipos('/api/clientes/historial-global/', desde='2000-01-01'), [])
+
+
+class HistorialTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cli = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        HistorialCliente.objects.all().delete()
+
+    def _tipos(self):
+        return list(HistorialCliente.objects.order_by('id').values_list('tipo', flat=True))
+
+    def test_un_registro_por_evento_y_al_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                nuevo = Cliente.objects.create(razon_social='Nuevo', cuit='30-11111111-1')
+                nuevo.email = 'a@b.com'
+                nuevo.save()
+                self.cli.razon_social = 'ACME SA'
+                self.cli.save()
+                self.cli.telefono = '123'
+                self.cli.save()
+                self.assertEqual(self._tipos(), [])
+        self.assertEqual(sorted(HistorialCliente.objects.values_list('cliente_id', 'tipo')),
+                         sorted([(nuevo.pk, 'ALTA_CLIENTE'), (self.cli.pk, 'EDIT_CLIENTE')]))
+
+    def test_internos_de_django(self):
+        # historial._pendientes depende de esta forma: si una versión de Django la cambia, falla acá
+        conn = transaction.get_connection()
+        agendar = lambda: None  # noqa: E731
+        with transaction.atomic():
+            abiertos = len(conn.savepoint_ids)
+            with transaction.atomic():
+                self.assertEqual(len(conn.savepoint_ids), abiertos + 1)
+                transaction.on_commit(agendar, robust=False)
+                sids, func, robust = conn.run_on_commit[-1]
+                self.assertEqual((func, robust), (agendar, False))
+                self.assertIn(conn.savepoint_ids[-1], sids)
+            lista = conn.run_on_commit
+            try:
+                with transaction.atomic():
+                    transaction.on_commit(agendar)
+                    raise ValueError
+            except ValueError:
+                pass
+            # revertir un savepoint reemplaza la lista (sin sus callbacks)
+            self.assertIsNot(conn.run_on_commit, lista)
+            self.assertEqual([a[1] for a in conn.run_on_commit].count(agendar), 1)
+        self.assertIsNotNone(historial._internos(conn))
+
+    def test_sin_internos_conocidos_un_callback_por_evento(self):
+        with patch('clientes.historial._internos', return_value=None), \
+                self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for tel in ('1', '2'):
+                self.cli.telefono = tel
+                self.cli.save()
+            try:
+                with transaction.atomic():
+                    self.cli.razon_social = 'revertido'
+                    self.cli.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            otro = Cliente.objects.create(razon_social='Borrado', cuit='30-22222222-2')
+            otro.delete()  # lo agendado para él se descarta también en este modo
+        self.assertEqual(self._tipos(), ['EDIT_CLIENTE', 'EDIT_CLIENTE'])
+
+    def test_pagos_iguales_son_dos_eventos(self):
+        f = Factura.objects.create(cliente=self.cli, nro='F-1', total=Decimal('300.00'))
+        HistorialCliente.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for _ in range(2):
+                Pago.objects.create(factura=f, fecha=date(2025, 1, 1), monto=Decimal('100.00'))
+        self.assertEqual(list(HistorialCliente.objects.values_list('tipo', 'nota')),
+                         [('PAGO_REGISTRADO', 'Pago 100.00 a F-1')] * 2)
+
+    def test_rollback_no_deja_historial(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                self.cli.save()
+                1 / 0
+            with transaction.atomic():
+                borrado = Cliente.objects.create(razon_social='Efímero', cuit='30-22222222-2')
+                borrado.delete()
+        self.assertEqual(self._tipos(), [])
+
+    def test_activar_con_usuario_del_request(self):
+        from django.contrib.auth.models import User
+        user = User.objects.create_user('ana')
+        self.api.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.post(f'/api/clientes/{self.cli.pk}/desactivar/')
+        h = HistorialCliente.objects.get()
+        self.assertEqual((h.tipo, h.usuario_id), ('DESACTIVACION_CLIENTE', user.pk))
 
-# Create your tests here.
+    def test_suspendido_deja_un_resumen(self):
+        from . import historial
+        otro = Cliente.objects.create(razon_social='Otro', cuit='30-33333333-3')
+        HistorialCliente.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            with historial.suspendido('AJUSTE_MASIVO', 'Normalización'):
+                for c in (self.cli, otro, self.cli):
+                    c.telefono = '0'
+                    c.save()
+        self.assertEqual(sorted(HistorialCliente.objects.values_list('cliente_id', 'tipo', 'nota')),
+                         [(self.cli.pk, 'AJUSTE_MASIVO', 'Normalización: EDIT_CLIENTE×2'),
+                          (otro.pk, 'AJUSTE_MASIVO', 'Normalización: EDIT_CLIENTE×1')])
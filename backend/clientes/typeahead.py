@@ -0,0 +1,128 @@
+# clientes/typeahead.py
+"""
+Autocompletado de clientes:  GET /api/clientes/typeahead/?q=&limit=
+
+Devuelve solo id, razon_social y cuit, y guarda los resultados en un LRU en
+memoria del proceso, con clave = consulta normalizada ("Ñandú S" → "nandu s").
+- Misma consulta (o misma normalizada): se responde desde el cache.
+- Consulta que extiende una cacheada ("nan" → "nandu"): si la cacheada trajo
+  todas sus coincidencias, se filtra eso en Python (busqueda.coincide).
+- Cualquier alta/edición/baja de Cliente (señales e importación CSV) vacía el
+  cache. Cada proceso tiene el suyo: TTL corto para acotar lo que puede
+  quedar viejo por escrituras hechas en otro proceso.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import busqueda
+
+COLUMNAS = ('razon_social', 'cuit')
+
+
+class _Entrada:
+    __slots__ = ('filas', 'completa', 'ts', 'generacion', 'vence')
+
+    def __init__(self, filas, completa, ts, generacion, vence):
+        self.filas, self.completa, self.ts = filas, completa, ts
+        self.generacion, self.vence = generacion, vence
+
+
+def _implica(ts_nuevo: list[str], ts_cache: list[str]) -> bool:
+    """¿Toda fila que coincide con ts_nuevo coincide también con ts_cache?"""
+    return (all(t in ts_nuevo[:-1] for t in ts_cache[:-1])
+            and any(n.startswith(ts_cache[-1]) for n in ts_nuevo))
+
+
+class TypeaheadCache:
+    def __init__(self, maximo: int = 256, ttl: float = 60, recortar: int = 50):
+        self.maximo, self.ttl, self.recortar = maximo, ttl, recortar
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.generacion = 0
+        self.aciertos = self.refinados = self.consultas_db = 0
+
+    @staticmethod
+    def clave(q: str) -> str:
+        q = (q or '').strip()
+        if busqueda.es_cuit(q):
+            return busqueda.terminos(q)[0][0]  # "20-123" y "20123" comparten entrada
+        return busqueda.normalizar(q)
+
+    def invalidar(self):
+        with self._lock:
+            self.generacion += 1
+            self._entradas.clear()
+
+    def _get(self, clave, ahora):
+        e = self._entradas.get(clave)
+        if e is None:
+            return None
+        if e.vence < ahora:
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return e
+
+    def _put(self, clave, entrada):
+        if entrada.generacion != self.generacion:
+            return  # hubo una escritura mientras se consultaba: no se guarda
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.maximo:
+            self._entradas.popitem(last=False)
+
+    def buscar(self, q: str, limite: int = 10) -> list[tuple]:
+        """Filas (id, busqueda, razon_social, cuit), las más relevantes primero."""
+        ts, opcionales = busqueda.terminos(q)
+        if not ts:
+            return []
+        clave = self.clave(q)
+        ahora = time.monotonic()
+        with self._lock:
+            e = self._get(clave, ahora)
+            if e is not None:
+                self.aciertos += 1
+                return e.filas[:limite]
+            # el prefijo cacheado más largo que tenga todas sus coincidencias
+            for i in range(len(clave) - 1, 0, -1):
+                base = self._get(clave[:i], ahora)
+                if base is not None and base.completa and _implica(ts, base.ts):
+                    filas = busqueda.ordenar([f for f in base.filas if busqueda.coincide(f[1], ts)],
+                                             ts, opcionales)
+                    self._put(clave, _Entrada(filas, True, ts, base.generacion, base.vence))
+                    self.refinados += 1
+                    return filas[:limite]
+            generacion = self.generacion
+            self.consultas_db += 1
+
+        filas = busqueda.candidatos(q, COLUMNAS)
+        completa = len(filas) < busqueda.VENTANA
+        filas = busqueda.ordenar(filas, ts, opcionales)
+        if not completa:
+            filas = filas[:self.recortar]  # no sirve para refinar: alcanza con lo que se muestra
+        with self._lock:
+            self._put(clave, _Entrada(filas, completa, ts, generacion, ahora + self.ttl))
+        return filas[:limite]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TypeaheadCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TypeaheadCache(maximo=getattr(settings, 'CLIENTES_TYPEAHEAD_MAX', 256),
+                                    ttl=getattr(settings, 'CLIENTES_TYPEAHEAD_TTL', 60))
+        return _cache
+
+
+def invalidar():
+    """Vacía el cache ya y de nuevo al confirmar la transacción (lecturas concurrentes)."""
+    get_cache().invalidar()
+    transaction.on_commit(get_cache().invalidar)
@@ -3,44 +3,44 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.filters import SearchFilter, OrderingFilter 
+from rest_framework.filters import OrderingFilter 
 from facturacion.models import Proyecto
+from facturacion.resumen import EVENTOS_DEFAULT, EVENTOS_MAX, resumen_cliente
 from facturacion.serializers import ProyectoSerializer
-from .models import HistorialCliente
+from .busqueda import BusquedaFilter, buscar as buscar_clientes
+from .importacion import ImportacionError, importar_clientes
+from .typeahead import get_cache as typeahead_cache
 from .serializers import ClienteSerializer, HistorialClienteSerializer
 from .models import Cliente                    # ← IMPORTA EL MODELO
 from .serializers import ClienteSerializer 
-from django.db.models import Q
 from rest_framework.permissions import AllowAny
+from rest_framework.parsers import MultiPartParser
+from core.export import StreamingExportMixin
+from core.retencion import politicas, rango_de_params
 
-class ClienteViewSet(ModelViewSet):
+HISTORIAL_LIMIT_MAX = 500
+
+class ClienteViewSet(StreamingExportMixin, ModelViewSet):
     permission_classes = [AllowAny]
     queryset = Cliente.objects.all().order_by('razon_social')
     serializer_class = ClienteSerializer
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['razon_social', 'cuit', 'email']
+    filter_backends = [BusquedaFilter, OrderingFilter]
     ordering_fields = ['razon_social', 'fecha_alta']
+    ordering = ['razon_social', 'id']  # también es la clave del cursor
+    export_fields = ['id', 'razon_social', 'cuit', 'email', 'telefono', 'estado', 'fecha_alta', 'activo']
     
     @action(detail=True, methods=['post'])
     def desactivar(self, request, pk=None):
         cli = self.get_object()
         cli.estado = 'INACTIVO'
-        cli.save(update_fields=['estado'])
-        HistorialCliente.objects.create(
-            cliente=cli, tipo='DESACTIVACION_CLIENTE',
-            nota=f'{cli.razon_social} desactivado', usuario=request.user if request.user.is_authenticated else None
-        )
+        cli.save(update_fields=['estado'])  # historial: DESACTIVACION_CLIENTE (signals.log_cliente)
         return Response({'ok': True}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
     def activar(self, request, pk=None):
         cli = self.get_object()
         cli.estado = 'ACTIVO'
-        cli.save(update_fields=['estado'])
-        HistorialCliente.objects.create(
-            cliente=cli, tipo='ACTIVACION_CLIENTE',
-            nota=f'{cli.razon_social} activado', usuario=request.user if request.user.is_authenticated else None
-        )
+        cli.save(update_fields=['estado'])  # historial: ACTIVACION_CLIENTE (signals.log_cliente)
         return Response({'ok': True}, status=status.HTTP_200_OK)
 
    
@@ -49,18 +49,43 @@ class ClienteViewSet(ModelViewSet):
         qs = Proyecto.objects.filter(cliente_id=pk).order_by('nombre')
         return Response(ProyectoSerializer(qs, many=True).data)
     
+    # GET /api/clientes/ID/resumen/?eventos=N   facturas, importes, vencida más antigua, pagos a tiempo,
+    # proyectos activos y los últimos N eventos, en un request (agregado ResumenCliente, ver facturacion/resumen.py)
+    @action(detail=True, methods=['get'])
+    def resumen(self, request, pk=None):
+        try:
+            eventos = min(max(int(request.query_params.get('eventos', EVENTOS_DEFAULT)), 0), EVENTOS_MAX)
+        except ValueError:
+            eventos = EVENTOS_DEFAULT
+        return Response(resumen_cliente(self.get_object(), eventos))
+
     @action(detail=True, methods=['get'])
     def historial(self, request, pk=None):
-        qs = HistorialCliente.objects.filter(cliente_id=pk).order_by('-fecha')[:100]
-        return Response(HistorialClienteSerializer(qs, many=True).data)
+        # ?desde= anterior al corte de retención: también lee lo archivado (core/retencion.py)
+        desde, hasta = rango_de_params(request.query_params)
+        filas = politicas()['historial'].consultar(desde, hasta, filtro={'cliente_id': pk}, limite=100)
+        return Response(HistorialClienteSerializer(filas, many=True).data)
+    # GET /api/clientes/buscar/?q=   resultados por relevancia (índice FTS, ver busqueda.py)
     @action(detail=False, methods=['get'])
     def buscar(self, request):
         q = request.query_params.get('q','').strip()
         qs = self.get_queryset()
-        if q:
-            qs = qs.filter(Q(razon_social__icontains=q) | Q(cuit__icontains=q))
-        data = ClienteSerializer(qs[:50], many=True).data
+        qs = buscar_clientes(qs, q) if q else qs[:50]
+        data = ClienteSerializer(qs, many=True).data
         return Response(data)
+
+    # GET /api/clientes/typeahead/?q=&limit=   autocompletar: solo id, razón social y CUIT.
+    # Cache en memoria por prefijo (ver typeahead.py): tipear no consulta la base en cada tecla.
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        q = request.query_params.get('q', '')
+        try:
+            limite = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limite = 10
+        filas = typeahead_cache().buscar(q, limite)
+        return Response([{'id': f[0], 'razon_social': f[2], 'cuit': f[3]} for f in filas])
+
     def create(self, request, *args, **kwargs):
         ser = self.get_serializer(data=request.data)
         if not ser.is_valid():
@@ -94,16 +119,42 @@ class ClienteViewSet(ModelViewSet):
                 status=status.HTTP_409_CONFLICT
             )
         
+    # POST /api/clientes/importar/   multipart con "archivo", o el CSV crudo como body (text/csv)
+    # Upsert por CUIT; ?dry_run=1 solo valida. Responde el reporte con los errores por fila.
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser])
+    def importar(self, request):
+        if request.content_type.startswith('multipart/'):
+            lineas = request.FILES.get('archivo')
+            if lineas is None:
+                return Response({'detail': 'Falta el archivo (campo "archivo").'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            lineas = request.stream or []  # se lee en streaming, sin cargar el body entero
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        usuario = request.user if request.user.is_authenticated else None
+        try:
+            reporte = importar_clientes(lineas, dry_run=dry_run, usuario=usuario)
+        except ImportacionError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({'detail': 'El archivo debe estar en UTF-8.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(reporte)
+
     @action(detail=False, methods=['get'], url_path='historial-global')
     def historial_global(self, request):
-        qs = HistorialCliente.objects.select_related('cliente').order_by('-fecha')
-        # filtros opcionales
+        # filtros opcionales: ?tipos=A,B  ?desde=/?hasta= (AAAA-MM-DD)  ?limit= (máx. HISTORIAL_LIMIT_MAX)
+        filtro = {}
         tipos = request.query_params.get('tipos', '')
         if tipos:
             allow = [t.strip() for t in tipos.split(',') if t.strip()]
             if allow:
-                qs = qs.filter(tipo__in=allow)
-        limit = int(request.query_params.get('limit', 50))
+                filtro['tipo__in'] = allow
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), HISTORIAL_LIMIT_MAX)
+        except ValueError:
+            limit = 50
+        desde, hasta = rango_de_params(request.query_params)
+        filas = politicas()['historial'].consultar(desde, hasta, filtro=filtro, limite=limit,
+                                                   relacionados=['cliente'])
         from .serializers import HistorialClienteListSerializer
-        data = HistorialClienteListSerializer(qs[:limit], many=True).data
+        data = HistorialClienteListSerializer(filas, many=True).data
         return Response(data)
@@ -0,0 +1,97 @@
+# core/export.py
+"""
+Exportación por streaming para los ViewSets:  GET /api/<recurso>/export/?format=csv|ndjson
+
+- Mismos filtros que el listado (filter_queryset + get_queryset de la vista).
+- Sin serializers ni instancias de modelo: values_list() + iterator(chunk_size),
+  y la respuesta sale con StreamingHttpResponse. Memoria constante.
+
+La vista declara qué columnas salen:
+    export_fields = ['id', 'nro', ('cliente', 'cliente__razon_social'), ...]
+(nombre de columna = ruta del ORM, o una tupla (columna, ruta)).
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+
+class _ExportRenderer(BaseRenderer):
+    # la respuesta real es un StreamingHttpResponse; esto solo rinde errores (400, etc.)
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class _Linea:
+    """Destino de csv.writer que devuelve la línea en vez de escribirla."""
+    def write(self, value):
+        return value
+
+
+def filas_csv(columnas, filas, por_bloque=500):
+    w = csv.writer(_Linea())
+    yield '\ufeff' + w.writerow(columnas)  # BOM: Excel abre bien los acentos
+    bloque = []
+    for fila in filas:
+        bloque.append(w.writerow(fila))
+        if len(bloque) == por_bloque:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def filas_ndjson(columnas, filas, por_bloque=500):
+    dumps = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    bloque = []
+    for fila in filas:
+        bloque.append(dumps(dict(zip(columnas, fila))) + '\n')
+        if len(bloque) == por_bloque:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+class StreamingExportMixin:
+    export_fields = None
+    export_chunk_size = 2000
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        columnas, rutas = [], []
+        for campo in self.export_fields:
+            columna, ruta = campo if isinstance(campo, tuple) else (campo, campo)
+            columnas.append(columna)
+            rutas.append(ruta)
+
+        qs = (self.get_export_queryset()
+              .select_related(None).prefetch_related(None)
+              .values_list(*rutas)
+              .iterator(chunk_size=self.export_chunk_size))
+
+        formato = request.accepted_renderer.format
+        generar = filas_ndjson if formato == 'ndjson' else filas_csv
+        resp = StreamingHttpResponse(generar(columnas, qs),
+                                     content_type=f'{request.accepted_renderer.media_type}; charset=utf-8')
+        nombre = self.basename if hasattr(self, 'basename') else 'export'
+        resp['Content-Disposition'] = f'attachment; filename={nombre}.{formato}'
+        return resp
@@ -0,0 +1,233 @@
+# core/pagination.py
+"""
+Paginación por cursor (keyset) para los ViewSets del router.
+
+Es opt-in: solo pagina si el request trae ?cursor= o ?page_size=. Sin esos
+parámetros la respuesta sigue siendo la lista completa (lo que espera hoy el
+frontend).
+
+A diferencia de CursorPagination de DRF (que posiciona solo por el primer campo
+del ordering y resuelve empates con OFFSET), acá el cursor guarda el valor de
+TODOS los campos del ordering (+ id como desempate), y la página siguiente se
+pide con un WHERE lexicográfico:  (a, b, id) > (va, vb, vid).
+Así el costo por página es constante sin importar cuán "profundo" esté.
+
+Envelope: {"next": url|null, "previous": url|null, "results": [...]}
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor inválido.'
+
+    # ordering por defecto si la vista no declara uno
+    ordering = ('-id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None  # opt-in: sin parámetros → lista completa
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self._tipar(queryset.model, position)
+        terms = self._terms(reverse)
+
+        qs = queryset.order_by(*[self._order_expr(t) for t in terms])
+        if position is not None:
+            qs = qs.filter(self._after(queryset.model, terms, position))
+
+        rows = list(qs[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # ---------------- links ----------------
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, instance, reverse):
+        position = [self._value(instance, name) for name, _ in self.ordering]
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(position, reverse))
+
+    # ---------------- cursor ----------------
+    def encode_cursor(self, position, reverse):
+        raw = json.dumps({'p': position, 'r': int(reverse)}, cls=DjangoJSONEncoder)
+        return urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = data['p'], bool(data.get('r'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def _tipar(self, model, position):
+        """Cada valor del cursor al tipo de su campo: un cursor adulterado es 404, no un 500 en el filter()."""
+        out = []
+        for (name, _), value in zip(self.ordering, position):
+            field = self._campo(model, name)
+            if field is None:  # no es un campo del modelo (p. ej. una anotación): va tal cual
+                out.append(value)
+                continue
+            if value is None:
+                if not self._nullable(model, name):
+                    raise NotFound(self.invalid_cursor_message)
+                out.append(None)
+                continue
+            try:
+                out.append(field.to_python(value))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return out
+
+    @staticmethod
+    def _campo(model, name):
+        field = None
+        try:
+            for attr in name.split('__'):
+                field = model._meta.get_field(attr)
+                model = field.related_model
+        except FieldDoesNotExist:
+            return None
+        return getattr(field, 'target_field', field)
+
+    # ---------------- ordering ----------------
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                                 strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Igual que DRF: si la vista tiene OrderingFilter, manda ese ordering
+        (incluye ?ordering= del usuario); si no, `view.ordering`.
+        Devuelve [(campo, desc), ...] con 'id' agregado como desempate.
+        """
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view) or ordering
+                break
+        if isinstance(ordering, str):
+            ordering = [ordering]
+
+        out = []
+        for term in ordering:
+            name = term.lstrip('-')
+            out.append(('id' if name == 'pk' else name, term.startswith('-')))
+        if not any(name == 'id' for name, _ in out):
+            out.append(('id', out[-1][1] if out else True))
+        return out
+
+    def _terms(self, reverse):
+        # (campo, desc, nulls_last); recorrer hacia atrás invierte todo
+        return [(name, desc != reverse, not reverse) for name, desc in self.ordering]
+
+    @staticmethod
+    def _order_expr(term):
+        name, desc, nulls_last = term
+        nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+        return F(name).desc(**nulls) if desc else F(name).asc(**nulls)
+
+    @classmethod
+    def _after(cls, model, terms, position):
+        """WHERE lexicográfico "viene después de `position`" para el orden `terms`."""
+        cond = Q(pk__in=[])  # falso
+        prefix = Q()
+        for (name, desc, nulls_last), value in zip(terms, position):
+            if not cls._nullable(model, name):
+                step = Q(**{f'{name}__{"lt" if desc else "gt"}': value})
+                equal = Q(**{name: value})
+            elif value is None:
+                step = Q(**{f'{name}__isnull': False}) if not nulls_last else Q(pk__in=[])
+                equal = Q(**{f'{name}__isnull': True})
+            else:
+                step = Q(**{f'{name}__{"lt" if desc else "gt"}': value})
+                if nulls_last:
+                    step |= Q(**{f'{name}__isnull': True})
+                equal = Q(**{name: value})
+            cond |= prefix & step
+            prefix &= equal
+        return cond
+
+    @staticmethod
+    def _nullable(model, name):
+        try:
+            for attr in name.split('__'):
+                field = model._meta.get_field(attr)
+                if field.null:
+                    return True
+                model = field.related_model
+        except Exception:
+            return True
+        return False
+
+    @staticmethod
+    def _value(instance, name):
+        for attr in name.split('__'):
+            if instance is None:
+                return None
+            instance = getattr(instance, attr)
+        return instance
@@ -0,0 +1,317 @@
+# core/retencion.py
+"""
+Retención y archivo de tablas que crecen sin fin (UserActionLog, HistorialCliente).
+
+Tres niveles, por mes calendario:
+  1. tabla "caliente" (la de siempre): los últimos `meses` meses.
+  2. tabla de archivo (<tabla>_archivo, mismos campos y mismos ids):
+     - PostgreSQL: particionada por rango de fecha, una partición por mes.
+     - SQLite / otros: tabla común con índice por fecha.
+  3. archivos NDJSON comprimidos, ARCHIVO_DIR/<tabla>/<AAAA-MM>.<n>.ndjson.gz,
+     para lo que tiene más de `meses` + `meses_archivo` meses. En PostgreSQL
+     la partición del mes se borra con DROP TABLE (sin DELETE fila a fila).
+
+El pase entre niveles (comando `archivar`) va de a lotes chicos, cada uno
+en su propia transacción: la tabla caliente nunca queda bloqueada mucho tiempo.
+
+consultar() lee los tres niveles ordenados por fecha descendente. Sin `desde`
+solo lee la tabla caliente; si `desde` es anterior al corte, suma el archivo
+y, si hace falta, los archivos .ndjson.gz de esos meses.
+
+Las políticas salen de settings.RETENCION:
+    RETENCION = {
+        'auditoria': {'modelo': 'auditoria.UserActionLog', 'archivo': 'auditoria.UserActionLogArchivo',
+                      'fecha': 'ts', 'meses': 6, 'meses_archivo': 18},
+    }
+(meses_archivo=None: lo archivado queda en la tabla de archivo para siempre).
+"""
+import datetime as dt
+import gzip
+import heapq
+import json
+import os
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, migrations, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def _mes(fecha) -> dt.date:
+    return dt.date(fecha.year, fecha.month, 1)
+
+
+def _sumar_meses(mes: dt.date, n: int) -> dt.date:
+    total = mes.year * 12 + mes.month - 1 + n
+    return dt.date(total // 12, total % 12 + 1, 1)
+
+
+def _inicio(mes: dt.date):
+    return timezone.make_aware(dt.datetime(mes.year, mes.month, 1)) if settings.USE_TZ \
+        else dt.datetime(mes.year, mes.month, 1)
+
+
+class Politica:
+    def __init__(self, nombre, modelo, archivo, fecha, meses, meses_archivo=None):
+        self.nombre = nombre
+        self.modelo = apps.get_model(modelo)
+        self.archivo = apps.get_model(archivo)
+        self.fecha = fecha
+        self.meses, self.meses_archivo = meses, meses_archivo
+        self.campos = [f.attname for f in self.modelo._meta.concrete_fields]
+
+    # ─────────────────────────── cortes ───────────────────────────
+    def corte(self, hoy=None) -> dt.date:
+        """Primer mes que queda en la tabla caliente."""
+        return _sumar_meses(_mes(hoy or timezone.localdate()), -self.meses)
+
+    def corte_archivo(self, hoy=None) -> dt.date | None:
+        """Primer mes que queda en la tabla de archivo (lo anterior va a .ndjson.gz)."""
+        if self.meses_archivo is None:
+            return None
+        return _sumar_meses(self.corte(hoy), -self.meses_archivo)
+
+    @property
+    def directorio(self) -> Path:
+        return Path(settings.ARCHIVO_DIR) / self.modelo._meta.db_table
+
+    # ─────────────────────── caliente → archivo ───────────────────────
+    def _particion(self, mes: dt.date) -> str:
+        return f'{self.archivo._meta.db_table}_{mes:%Y%m}'
+
+    def _asegurar_particiones(self, meses, creadas: set):
+        if connection.vendor != 'postgresql':
+            return
+        tabla = self.archivo._meta.db_table
+        with connection.cursor() as c:
+            for mes in meses - creadas:
+                c.execute(f'CREATE TABLE IF NOT EXISTS {self._particion(mes)} PARTITION OF {tabla} '
+                          f'FOR VALUES FROM (%s) TO (%s)', [_inicio(mes), _inicio(_sumar_meses(mes, 1))])
+                creadas.add(mes)
+
+    def archivar(self, hoy=None, lote: int = 1000, pausa: float = 0) -> int:
+        """Mueve a la tabla de archivo lo anterior al corte. Devuelve cuántas filas movió."""
+        limite = _inicio(self.corte(hoy))
+        movidas, particiones = 0, set()
+        while True:
+            with transaction.atomic():
+                filas = list(self.modelo.objects.filter(**{f'{self.fecha}__lt': limite})
+                             .order_by(self.fecha, 'pk').values(*self.campos)[:lote])
+                if not filas:
+                    return movidas
+                self._asegurar_particiones({_mes(timezone.localtime(f[self.fecha]) if settings.USE_TZ
+                                                 else f[self.fecha]) for f in filas}, particiones)
+                self.archivo.objects.bulk_create([self.archivo(**f) for f in filas])
+                self.modelo.objects.filter(pk__in=[f['id'] for f in filas]).delete()
+            movidas += len(filas)
+            if pausa:
+                time.sleep(pausa)  # deja pasar a las escrituras normales entre lote y lote
+
+    # ─────────────────────── archivo → .ndjson.gz ───────────────────────
+    def meses_en_archivo(self, antes_de: dt.date) -> list[dt.date]:
+        fechas = (self.archivo.objects.filter(**{f'{self.fecha}__lt': _inicio(antes_de)})
+                  .dates(self.fecha, 'month'))
+        return sorted({dt.date(f.year, f.month, 1) for f in fechas})
+
+    def _ruta_nueva(self, mes: dt.date) -> Path:
+        n = len(list(self.directorio.glob(f'{mes:%Y-%m}.*.ndjson.gz'))) + 1
+        return self.directorio / f'{mes:%Y-%m}.{n}.ndjson.gz'
+
+    def exportar(self, hoy=None, lote: int = 1000) -> list[Path]:
+        """Pasa a .ndjson.gz los meses de la tabla de archivo anteriores a corte_archivo()."""
+        corte = self.corte_archivo(hoy)
+        if corte is None:
+            return []
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        dumps = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        rutas = []
+        for mes in self.meses_en_archivo(corte):
+            qs = self.archivo.objects.filter(**{f'{self.fecha}__gte': _inicio(mes),
+                                                f'{self.fecha}__lt': _inicio(_sumar_meses(mes, 1))})
+            ruta = self._ruta_nueva(mes)
+            tmp = ruta.with_suffix('.tmp')
+            with gzip.open(tmp, 'wt', encoding='utf-8') as out:
+                for fila in qs.order_by(self.fecha, 'pk').values(*self.campos).iterator(chunk_size=lote):
+                    out.write(dumps(fila) + '\n')
+            os.replace(tmp, ruta)  # el archivo aparece completo o no aparece
+            self._borrar_mes(qs, mes, lote)
+            rutas.append(ruta)
+        return rutas
+
+    def _borrar_mes(self, qs, mes, lote):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as c:
+                c.execute(f'DROP TABLE IF EXISTS {self._particion(mes)}')
+            return
+        while True:
+            with transaction.atomic():
+                ids = list(qs.values_list('pk', flat=True)[:lote])
+                if not ids:
+                    return
+                self.archivo.objects.filter(pk__in=ids).delete()
+
+    # ─────────────────────────── lectura ───────────────────────────
+    def _leer_archivos(self, desde, hasta, filtro, limite):
+        """Filas de los .ndjson.gz (como instancias del modelo de archivo, sin guardar)."""
+        if not self.directorio.exists():
+            return []
+        meses = sorted({p.name[:7] for p in self.directorio.glob('*.ndjson.gz')}, reverse=True)
+        filtro = self._tipar(filtro)
+        filas = []
+        for mes in meses:
+            inicio = dt.date.fromisoformat(mes + '-01')
+            if hasta is not None and _inicio(inicio) >= hasta:
+                continue
+            if desde is not None and _inicio(_sumar_meses(inicio, 1)) <= desde:
+                break
+            for ruta in sorted(self.directorio.glob(f'{mes}.*.ndjson.gz')):
+                with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+                    for linea in f:
+                        fila = json.loads(linea)
+                        fila[self.fecha] = parse_datetime(fila[self.fecha])
+                        if _en_rango(fila[self.fecha], desde, hasta) and _coincide(fila, filtro):
+                            filas.append(self.archivo(**fila))
+            if len(filas) >= limite:
+                break  # los meses que siguen son más viejos
+        return filas
+
+    def _tipar(self, filtro: dict) -> dict:
+        """Valores del filtro con el tipo del campo (?cliente=5 llega como '5')."""
+        tipado = {}
+        for clave, valor in filtro.items():
+            campo = self.archivo._meta.get_field(clave.partition('__')[0])
+            campo = getattr(campo, 'target_field', campo)
+            if clave.endswith('__in'):
+                tipado[clave] = [campo.to_python(getattr(v, 'pk', v)) for v in valor]
+            else:
+                tipado[clave] = campo.to_python(getattr(valor, 'pk', valor))
+        return tipado
+
+    def consultar(self, desde=None, hasta=None, filtro=None, limite=50, relacionados=()):
+        """
+        Las `limite` filas más recientes en [desde, hasta) que cumplen `filtro`
+        (dict de lookups: campo=valor / campo__in=[...]), de los niveles que
+        correspondan. `relacionados`: FKs a traer con select_related (las
+        filas de .ndjson.gz cuyo relacionado ya no existe se descartan).
+        """
+        filtro = filtro or {}
+        rango = {}
+        if desde is not None:
+            rango[f'{self.fecha}__gte'] = desde
+        if hasta is not None:
+            rango[f'{self.fecha}__lt'] = hasta
+        orden = (f'-{self.fecha}', 'pk')  # el orden de los índices (fecha desc, rowid asc)
+
+        def qs(modelo):
+            return list(modelo.objects.filter(**rango, **filtro).select_related(*relacionados)
+                        .order_by(*orden)[:limite])
+
+        niveles = [qs(self.modelo)]
+        if desde is not None and desde < _inicio(self.corte()):
+            niveles.append(qs(self.archivo))
+            corte = self.corte_archivo()
+            if corte is not None and desde < _inicio(corte):
+                frios = self._leer_archivos(desde, hasta, filtro, limite)
+                niveles.append(_con_relacionados(frios, relacionados))
+        clave = lambda o: (getattr(o, self.fecha), -o.pk)  # noqa: E731
+        niveles = [sorted(n, key=clave, reverse=True) for n in niveles]
+        return list(heapq.merge(*niveles, key=clave, reverse=True))[:limite]
+
+
+def _en_rango(valor, desde, hasta):
+    return (desde is None or valor >= desde) and (hasta is None or valor < hasta)
+
+
+def _coincide(fila: dict, filtro: dict) -> bool:
+    for clave, valor in filtro.items():
+        campo, _, lookup = clave.partition('__')
+        campo = campo if campo in fila else f'{campo}_id'  # cliente=5 ≡ cliente_id=5
+        if lookup == 'in':
+            if fila.get(campo) not in valor:
+                return False
+        elif lookup:
+            raise ValueError(f'Lookup no soportado en archivos: {clave}')
+        elif fila.get(campo) != getattr(valor, 'pk', valor):
+            return False
+    return True
+
+
+def _con_relacionados(objs, relacionados):
+    for rel in relacionados:
+        if not objs:
+            break
+        campo = objs[0]._meta.get_field(rel)
+        ids = {getattr(o, campo.attname) for o in objs}
+        existentes = campo.related_model.objects.in_bulk([i for i in ids if i is not None])
+        objs = [o for o in objs if getattr(o, campo.attname) is None or getattr(o, campo.attname) in existentes]
+        for o in objs:
+            valor = getattr(o, campo.attname)
+            setattr(o, rel, existentes[valor] if valor is not None else None)
+    return objs
+
+
+def rango_de_params(params) -> tuple:
+    """
+    ?desde= / ?hasta= (AAAA-MM-DD, ambos inclusive) → (desde, hasta) como
+    datetimes [desde, hasta + 1 día). Fecha inválida → ValidationError de DRF.
+    """
+    from django.utils.dateparse import parse_date
+    from rest_framework.exceptions import ValidationError
+    res = []
+    for param, dias in (('desde', 0), ('hasta', 1)):
+        valor = params.get(param)
+        if not valor:
+            res.append(None)
+            continue
+        d = parse_date(valor)
+        if d is None:
+            raise ValidationError({param: 'Fecha inválida (AAAA-MM-DD).'})
+        d += dt.timedelta(days=dias)
+        res.append(timezone.make_aware(dt.datetime(d.year, d.month, d.day)))
+    return tuple(res)
+
+
+def politicas() -> dict[str, Politica]:
+    return {nombre: Politica(nombre, **cfg) for nombre, cfg in getattr(settings, 'RETENCION', {}).items()}
+
+
+def politica_de(modelo) -> Politica | None:
+    for p in politicas().values():
+        if p.modelo is modelo:
+            return p
+    return None
+
+
+# ─────────────────────────── migraciones ───────────────────────────
+class CrearTablaArchivo(migrations.CreateModel):
+    """
+    CreateModel para la tabla de archivo: en PostgreSQL la crea particionada por
+    rango de `fecha` (la PK pasa a ser (id, fecha), como exige el particionado);
+    en otros motores, igual que CreateModel.
+    """
+
+    def __init__(self, *args, fecha, **kwargs):
+        self.fecha = fecha
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        nombre, args, kwargs = super().deconstruct()
+        return nombre, args, {**kwargs, 'fecha': self.fecha}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        model = to_state.apps.get_model(app_label, self.name)
+        q = schema_editor.quote_name
+        sql, params = schema_editor.table_sql(model)
+        pk = f'{q("id")} bigint NOT NULL PRIMARY KEY'
+        assert pk in sql, sql
+        sql = sql.replace(pk, f'{q("id")} bigint NOT NULL')
+        sql = sql[:sql.rindex(')')] + f', PRIMARY KEY ({q("id")}, {q(self.fecha)})) PARTITION BY RANGE ({q(self.fecha)})'
+        schema_editor.execute(sql, params or None)
+        for index in model._meta.indexes:
+            schema_editor.execute(index.create_sql(model, schema_editor))
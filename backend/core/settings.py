@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
   'DEFAULT_AUTHENTICATION_CLASSES': [],  # <- sin auth en DEV
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    # Paginación por cursor opt-in (?page_size= / ?cursor=); sin params devuelve la lista completa
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # <- debe ir bien arriba
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'clientes.historial.UsuarioActualMiddleware',  # usuario de los registros de HistorialCliente
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auditoria.middleware.UserActionLogMiddleware',
@@ -78,6 +82,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+TEST_RUNNER = 'core.test_runner.TestRunner'  # settings propios de los tests
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -142,7 +148,6 @@ EMAIL_BACKEND = (
     if os.getenv('DJANGO_EMAIL_BACKEND', 'console') == 'console'
     else 'django.core.mail.backends.smtp.EmailBackend'
 )
-WKHTMLTOPDF_CMD = r"C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe"
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -155,6 +160,39 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL  # para errores de Django
 # (Opcional) timeouts y retries más amables
 EMAIL_TIMEOUT = 20
 
+# Cola de envíos de facturas (facturacion/envios.py, worker: manage.py procesar_envios)
+ENVIOS_MAX_INTENTOS = 5
+ENVIOS_BACKOFF_SEGUNDOS = 30          # 30s, 60s, 120s, ... (tope ENVIOS_BACKOFF_MAX_SEGUNDOS)
+ENVIOS_BACKOFF_MAX_SEGUNDOS = 60 * 60
+ENVIOS_LEASE_SEGUNDOS = 5 * 60        # si el worker muere, otro retoma el trabajo pasado este tiempo
+ENVIOS_POR_DOMINIO_POR_MINUTO = 60    # tope por dominio de destino (0 = sin tope); el resto se difiere
+
+# Cache en disco de PDFs de facturas (facturacion/pdf_cache.py)
+PDF_CACHE_DIR = Path(os.getenv('PDF_CACHE_DIR', BASE_DIR / 'pdf_cache'))
+PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Render de PDFs (facturacion/pdf_render.py): 'auto' (wkhtmltopdf o WeasyPrint) | 'wkhtmltopdf' |
+# 'weasyprint' | 'texto' (solo texto, sin dependencias: desarrollo; los tests lo fijan en core/test_runner.py)
+PDF_RENDERER = os.getenv('PDF_RENDERER', 'auto')
+PDF_RENDER_PROCESOS = int(os.getenv('PDF_RENDER_PROCESOS', '2'))  # 0 = en el mismo proceso
+PDF_RENDER_TIMEOUT = 30               # segundos por factura
+WKHTMLTOPDF_CMD = os.getenv('WKHTMLTOPDF_CMD')  # None → se busca en el PATH
+
+# Caches. 'reportes' guarda las respuestas de /api/reportes/ (facturacion/cache_reportes.py):
+# locmem es por proceso; con varios workers conviene compartirlo (REPORTES_CACHE=file,
+# o en producción Redis/Memcached cambiando el BACKEND acá).
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reportes': (
+        {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+         'LOCATION': os.getenv('REPORTES_CACHE_DIR', str(BASE_DIR / 'cache_reportes'))}
+        if os.getenv('REPORTES_CACHE') == 'file' else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reportes'}
+    ),
+}
+REPORTES_CACHE = 'reportes'           # alias de CACHES
+REPORTES_CACHE_TTL = 15 * 60          # segundos; las escrituras invalidan antes (generaciones)
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -167,3 +205,25 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+
+# Typeahead de clientes (clientes/typeahead.py): LRU en memoria por proceso
+CLIENTES_TYPEAHEAD_MAX = 256   # consultas cacheadas
+CLIENTES_TYPEAHEAD_TTL = 60    # segundos; acota lo viejo por escrituras de otros procesos
+
+# Auditoría (auditoria/writer.py): los UserActionLog se escriben en lote desde un thread.
+# 'sincronico' escribe en el request; los tests lo fijan en core/test_runner.py.
+AUDITORIA_MODO = os.getenv('AUDITORIA_MODO', 'async')
+AUDITORIA_LOTE = 200             # registros por INSERT
+AUDITORIA_INTERVALO_MS = 200     # espera máxima antes de escribir un lote incompleto
+AUDITORIA_MAX_PENDIENTES = 10_000  # buffer lleno → se escribe en el request (ver metricas())
+AUDITORIA_PAYLOAD_MAX_BYTES = 16 * 1024  # bodies más grandes no se guardan en payload
+
+# Retención (core/retencion.py, comando `archivar`): meses en la tabla caliente y,
+# después, en la tabla de archivo; lo más viejo queda en ARCHIVO_DIR como .ndjson.gz
+ARCHIVO_DIR = Path(os.getenv('ARCHIVO_DIR', BASE_DIR / 'archivo'))
+RETENCION = {
+    'auditoria': {'modelo': 'auditoria.UserActionLog', 'archivo': 'auditoria.UserActionLogArchivo',
+                  'fecha': 'ts', 'meses': 6, 'meses_archivo': 18},
+    'historial': {'modelo': 'clientes.HistorialCliente', 'archivo': 'clientes.HistorialClienteArchivo',
+                  'fecha': 'fecha', 'meses': 24, 'meses_archivo': 36},
+}
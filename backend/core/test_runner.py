@@ -0,0 +1,27 @@
+# core/test_runner.py
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runner de `manage.py test` (settings.TEST_RUNNER). Ajusta los settings que
+    los tests necesitan distintos de los de la app, como hace Django con
+    EMAIL_BACKEND:
+    - la auditoría se escribe en el request (AUDITORIA_MODO), así los tests ven
+      los UserActionLog sin esperar al thread de fondo;
+    - los PDFs se renderizan con el backend 'texto' (PDF_RENDERER), que no
+      necesita wkhtmltopdf ni WeasyPrint instalados.
+    """
+    PARA_TESTS = {'AUDITORIA_MODO': 'sincronico', 'PDF_RENDERER': 'texto'}
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._originales = {k: getattr(settings, k) for k in self.PARA_TESTS}
+        for k, v in self.PARA_TESTS.items():
+            setattr(settings, k, v)
+
+    def teardown_test_environment(self, **kwargs):
+        for k, v in self._originales.items():
+            setattr(settings, k, v)
+        super().teardown_test_environment(**kwargs)
@@ -1,8 +1,9 @@
 # core/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from facturacion.views_pdf import factura_pdf
+from auditoria.views import acciones as auditoria_acciones
 # ViewSets base (no deben fallar)
 from clientes.views import ClienteViewSet
 from facturacion.views import FacturaViewSet, PagoViewSet, ProyectoViewSet, aging_view
@@ -20,6 +21,8 @@ from facturacion.views_reportes import (
     estado_cartera,
     pagos_tiempo_resumen,
     pagos_tiempo_top,
+    reportes_cache_metricas,
+    aging_serie,
 )
 
 router = DefaultRouter()
@@ -30,10 +33,14 @@ router.register(r'proyectos', ProyectoViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # descargas masivas de PDFs, con o sin barra final. Va antes del router: si no,
+    # /api/facturas/export.zip/ lo toma el sufijo de formato de /api/facturas/export/
+    re_path(r'^api/facturas/export\.(?P<formato>pdf|zip)/?$', FacturaViewSet.as_view({'get': 'export_pdfs'}, **FacturaViewSet.export_pdfs.kwargs)),
     path('api/', include(router.urls)),
 
     # Reportes
     path('api/reportes/aging/', aging_view),
+    path('api/reportes/aging/serie/', aging_serie),
     path('api/reportes/ingresos-por-mes/', ingresos_por_mes),
     path('api/reportes/estado-cartera/', estado_cartera),
     path('api/facturas/<int:pk>/pdf/', factura_pdf),
@@ -45,7 +52,9 @@ urlpatterns = [
     path('api/reportes/estado-cartera/', estado_cartera),
     path('api/reportes/pagos-tiempo/resumen/', pagos_tiempo_resumen),
     path('api/reportes/pagos-tiempo/top/', pagos_tiempo_top),
+    path('api/reportes/cache/', reportes_cache_metricas),
     path('api/facturas/<int:pk>/enviar/', enviar_factura_email),
+    path('api/auditoria/acciones/', auditoria_acciones),
 ]
 
 # ---- Rutas opcionales que requieren WeasyPrint (PDF/email) ----
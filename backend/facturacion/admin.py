@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Proyecto, Factura, FacturaItem, Pago
+from .models import EnvioFactura, Proyecto, Factura, FacturaItem, Pago
 
 class FacturaItemInline(admin.TabularInline):
     model = FacturaItem
@@ -13,3 +13,9 @@ class FacturaAdmin(admin.ModelAdmin):
 admin.site.register([Proyecto, FacturaItem, Pago])
 
 
+@admin.register(EnvioFactura)
+class EnvioFacturaAdmin(admin.ModelAdmin):
+    list_display = ("factura", "destinatario", "estado", "intentos", "proximo_intento", "enviado_en")
+    list_filter = ("estado",)
+
+
@@ -0,0 +1,115 @@
+# facturacion/aging.py
+"""
+Aging de la cartera: saldo abierto por bandas de días de atraso.
+
+Un solo motor para /api/reportes/aging/ y /api/reportes/estado-cartera/.
+Las bandas se arman en SQL (SUM(CASE WHEN vencimiento ...)): una pasada
+sobre las facturas abiertas, sin traer filas a Python, y los importes
+quedan en Decimal.
+
+    ?as_of=AAAA-MM-DD   fecha de corte (default: hoy)
+    ?bandas=30,60,90    límites en días → 0-30, 31-60, 61-90, 90+
+    ?por=cliente|moneda agrupado (lista); sin `por`, un dict con el total
+
+- Días de atraso = as_of - vencimiento. Sin vencimiento o todavía no
+  vencida cuenta en la primera banda.
+- as_of >= hoy: saldo materializado de Factura (ABIERTA/PARCIAL).
+- as_of pasado (o exacto=True): saldo a esa fecha = total - pagos con fecha
+  <= as_of, de las facturas emitidas hasta as_of (las ANULADAS no cuentan: no
+  se guarda cuándo se anularon). exacto=True lo usa la foto diaria
+  (aging_diario.foto), para que hoy dé lo mismo que el backfill aunque haya
+  pagos o facturas con fecha futura.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Factura, Pago
+
+BANDAS_DEFAULT = (30, 60, 90)
+MAX_BANDAS = 12
+AGRUPACIONES = {'cliente': ('cliente_id', 'cliente__razon_social'), 'moneda': ('moneda',)}
+
+_DEC = DecimalField(max_digits=14, decimal_places=2)
+_CERO = Value(Decimal('0.00'), output_field=_DEC)
+_CENTAVO = Decimal('0.01')
+
+
+def etiquetas(bandas=BANDAS_DEFAULT) -> list[str]:
+    """(30, 60, 90) → ['0-30', '31-60', '61-90', '90+']"""
+    desde = [0] + [b + 1 for b in bandas]
+    return [f'{d}-{h}' for d, h in zip(desde, bandas)] + [f'{bandas[-1]}+']
+
+
+def parse_bandas(valor: str) -> tuple[int, ...]:
+    try:
+        bandas = tuple(int(x) for x in valor.split(','))
+    except ValueError:
+        raise ValueError('bandas debe ser una lista de días separados por coma (ej. 30,60,90).')
+    if not bandas or len(bandas) > MAX_BANDAS or bandas[0] < 1 or list(bandas) != sorted(set(bandas)):
+        raise ValueError(f'bandas: entre 1 y {MAX_BANDAS} enteros positivos, crecientes y sin repetir.')
+    return bandas
+
+
+def _facturas(as_of: date, exacto: bool = False):
+    """Facturas con saldo a `as_of`, anotadas con ese saldo (`monto`)."""
+    if as_of >= date.today() and not exacto:
+        return (Factura.objects.filter(estado__in=[Factura.ABIERTA, Factura.PARCIAL], saldo__gt=0)
+                .annotate(monto=F('saldo')))
+    pagado = (Pago.objects.filter(factura=OuterRef('pk'), fecha__lte=as_of)
+              .order_by().values('factura').annotate(s=Sum('monto')).values('s'))
+    return (Factura.objects.filter(fecha__lte=as_of, total__gt=0).exclude(estado=Factura.ANULADA)
+            .annotate(monto=F('total') - Coalesce(Subquery(pagado, output_field=_DEC), _CERO))
+            .filter(monto__gt=0))
+
+
+def _columnas(as_of: date, bandas) -> dict:
+    """{etiqueta: SUM(CASE WHEN <vencimiento en la banda> THEN monto ELSE 0 END)}"""
+    cortes = [as_of - timedelta(days=b) for b in bandas]  # vencimiento >= corte ⇔ días de atraso <= b
+    condiciones = [Q(vencimiento__isnull=True) | Q(vencimiento__gte=cortes[0])]
+    condiciones += [Q(vencimiento__lt=a, vencimiento__gte=b) for a, b in zip(cortes, cortes[1:])]
+    condiciones.append(Q(vencimiento__lt=cortes[-1]))
+    return {etiqueta: Coalesce(Sum(Case(When(q, then=F('monto')), default=_CERO, output_field=_DEC)), _CERO)
+            for etiqueta, q in zip(etiquetas(bandas), condiciones)}
+
+
+def aging(as_of: date | None = None, bandas=BANDAS_DEFAULT, por: str | None = None, exacto: bool = False):
+    """
+    Sin `por`: {'0-30': Decimal, ...} (todas las monedas juntas, como siempre).
+    por='cliente' | 'moneda': [{cliente_id, cliente | moneda, <bandas>..., total, facturas}, ...]
+    por total desc.
+    """
+    as_of = as_of or date.today()
+    columnas = _columnas(as_of, bandas)
+    qs = _facturas(as_of, exacto).order_by()
+    if por is None:
+        return {e: v.quantize(_CENTAVO) for e, v in qs.aggregate(**columnas).items()}
+
+    campos = AGRUPACIONES[por]
+    filas = qs.values(*campos).annotate(**columnas, facturas=Count('id'))
+    out = []
+    for r in filas:
+        fila = {('cliente' if c == 'cliente__razon_social' else c): r[c] for c in campos}
+        fila.update((e, r[e].quantize(_CENTAVO)) for e in columnas)
+        fila['total'] = sum(fila[e] for e in columnas)
+        fila['facturas'] = r['facturas']
+        out.append(fila)
+    out.sort(key=lambda x: (-x['total'], x[campos[0]]))
+    return out
+
+
+def desde_params(params):
+    """aging() con los query params del request; ValueError si alguno no es válido."""
+    as_of = None
+    if params.get('as_of'):
+        try:
+            as_of = date.fromisoformat(params['as_of'])
+        except ValueError:
+            raise ValueError('as_of debe ser AAAA-MM-DD.')
+    bandas = parse_bandas(params['bandas']) if params.get('bandas') else BANDAS_DEFAULT
+    por = params.get('por') or None
+    if por is not None and por not in AGRUPACIONES:
+        raise ValueError(f'por debe ser uno de: {", ".join(AGRUPACIONES)}.')
+    return aging(as_of, bandas, por)
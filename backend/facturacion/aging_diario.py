@@ -0,0 +1,134 @@
+# facturacion/aging_diario.py
+"""
+Fotos diarias del aging (tabla AgingDiario) para la serie histórica.
+
+- foto(fecha): una fecha con el motor de facturacion/aging.py, con el saldo a
+  esa fecha (aging(..., exacto=True)) también si es hoy: un pago con fecha
+  futura no cuenta, igual que en el backfill. Es lo que corre el cron diario:
+      0 1 * * *  python manage.py snapshot_aging
+- backfill(desde, hasta): todos los días del rango en una sola pasada por
+  Factura y Pago ordenados por fecha, reproduciendo el saldo de cada
+  factura día a día. Por día cuesta lo que tarda en recorrer los
+  vencimientos distintos con saldo, no las facturas: rellenar un año es
+  una lectura de cada tabla, no 365 consultas de aging. Escribe de a
+  LOTE_DIAS días por transacción: no bloquea la tabla durante todo el rango
+  y, si se corta, lo escrito queda (se puede volver a correr).
+
+Mismo criterio que aging(as_of=...): facturas emitidas hasta la fecha, sin
+ANULADAS, saldo = total - pagos hasta la fecha. Días sin saldo abierto en
+una moneda no tienen fila para esa moneda.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+
+from .aging import BANDAS_DEFAULT, aging
+from .models import AgingDiario, Factura, Pago
+
+LOTE = 2000
+LOTE_DIAS = 31  # días por transacción en backfill()
+
+
+def foto(fecha: date | None = None) -> int:
+    """Guarda (reemplaza) la foto de `fecha` (default hoy); devuelve las filas escritas."""
+    fecha = fecha or date.today()
+    filas = [AgingDiario(fecha=fecha, moneda=r['moneda'], saldo=r['total'], abiertas=r['facturas'],
+                         **{campo: r[e] for e, campo in AgingDiario.BANDAS.items()})
+             for r in aging(fecha, BANDAS_DEFAULT, por='moneda', exacto=True)]
+    with transaction.atomic():
+        AgingDiario.objects.filter(fecha=fecha).delete()
+        AgingDiario.objects.bulk_create(filas)
+    return len(filas)
+
+
+def _banda(dias: int) -> int:
+    for i, limite in enumerate(BANDAS_DEFAULT):
+        if dias <= limite:
+            return i
+    return len(BANDAS_DEFAULT)
+
+
+class _Siguiente:
+    """Iterador ordenado por fecha del que se consumen los elementos hasta un día."""
+
+    def __init__(self, it, pos_fecha: int):
+        self.it, self.pos = iter(it), pos_fecha
+        self.actual = next(self.it, None)
+
+    def hasta(self, dia: date):
+        while self.actual is not None and self.actual[self.pos] <= dia:
+            yield self.actual
+            self.actual = next(self.it, None)
+
+
+def _recorrer(desde: date, hasta: date):
+    """AgingDiario (sin guardar) de cada día del rango, en orden."""
+    facturas = _Siguiente(Factura.objects.filter(fecha__lte=hasta, total__gt=0).exclude(estado=Factura.ANULADA)
+                          .order_by('fecha', 'id').values_list('id', 'fecha', 'vencimiento', 'moneda', 'total')
+                          .iterator(chunk_size=LOTE), 1)
+    pagos = _Siguiente(Pago.objects.filter(fecha__lte=hasta).order_by('fecha', 'id')
+                       .values_list('factura_id', 'fecha', 'monto').iterator(chunk_size=LOTE), 1)
+
+    emitidas = {}    # factura_id → [saldo, vencimiento, moneda]
+    prepagos = {}    # pagos de facturas todavía no emitidas (o anuladas, que nunca aparecen)
+    abiertas = {}    # moneda → {vencimiento: [saldo, cantidad]} de las que tienen saldo > 0
+
+    def mover(venc, moneda, saldo, n):
+        grupo = abiertas.setdefault(moneda, {})
+        s = grupo.setdefault(venc, [Decimal('0.00'), 0])
+        s[0] += saldo
+        s[1] += n
+        if not s[1]:
+            del grupo[venc]
+
+    dia = desde
+    while dia <= hasta:
+        for fid, _, venc, moneda, total in facturas.hasta(dia):
+            saldo = total - prepagos.pop(fid, 0)
+            emitidas[fid] = [saldo, venc, moneda]
+            if saldo > 0:
+                mover(venc, moneda, saldo, 1)
+        for fid, _, monto in pagos.hasta(dia):
+            f = emitidas.get(fid)
+            if f is None:
+                prepagos[fid] = prepagos.get(fid, 0) + monto
+                continue
+            antes, venc, moneda = f
+            f[0] = antes - monto
+            if antes > 0:
+                mover(venc, moneda, -antes, -1)
+            if f[0] > 0:
+                mover(venc, moneda, f[0], 1)
+
+        for moneda, grupo in sorted(abiertas.items()):
+            if not grupo:
+                continue
+            bandas = [Decimal('0.00')] * (len(BANDAS_DEFAULT) + 1)
+            n = 0
+            for venc, (saldo, cant) in grupo.items():
+                bandas[0 if venc is None else _banda((dia - venc).days)] += saldo
+                n += cant
+            yield AgingDiario(fecha=dia, moneda=moneda, saldo=sum(bandas), abiertas=n,
+                              **dict(zip(AgingDiario.BANDAS.values(), bandas)))
+        dia += timedelta(days=1)
+
+
+def backfill(desde: date, hasta: date | None = None) -> int:
+    """Reemplaza las fotos de [desde, hasta] (default hasta hoy); devuelve las filas escritas."""
+    hasta = hasta or date.today()
+    filas = _recorrer(desde, hasta)  # se lee fuera de las transacciones de escritura
+    fila = next(filas, None)
+    n = 0
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=LOTE_DIAS - 1), hasta)
+        lote = []
+        while fila is not None and fila.fecha <= fin:
+            lote.append(fila)
+            fila = next(filas, None)
+        with transaction.atomic():
+            AgingDiario.objects.filter(fecha__gte=inicio, fecha__lte=fin).delete()
+            n += len(AgingDiario.objects.bulk_create(lote, batch_size=LOTE))
+        inicio = fin + timedelta(days=1)
+    return n
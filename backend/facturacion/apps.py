@@ -1,6 +1,31 @@
 from django.apps import AppConfig
 
+from auditoria.acciones import Regla
+
 
 class FacturacionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'facturacion'
+
+    # requests que registra auditoria.middleware (ver auditoria/acciones.py)
+    acciones_auditoria = {
+        'factura': {
+            'create': 'FACTURA_CREATE',
+            ('update', 'partial_update'): 'FACTURA_UPDATE',
+            'destroy': 'FACTURA_DELETE',
+            'bulk': Regla('FACTURA_BULK', payload=0.1),  # lotes grandes: una muestra alcanza
+            'enviar_lote': 'FACTURA_ENVIO_LOTE',
+        },
+        'pago': {
+            'create': 'PAGO_CREATE',
+            ('update', 'partial_update'): 'PAGO_UPDATE',
+            'destroy': 'PAGO_DELETE',
+        },
+        'facturacion.views_email.enviar_factura_email': {'POST': 'FACTURA_ENVIO'},
+    }
+
+    def ready(self):
+        # signals: al borrar pagos mantiene Factura.total_pagado/saldo e IngresoMensual; al borrar
+        # facturas/proyectos, ResumenCliente; invalida el cache de reportes (facturas, pagos,
+        # clientes) y el de PDFs (facturas, ítems)
+        from . import signals  # noqa: F401
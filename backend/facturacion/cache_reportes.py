@@ -0,0 +1,156 @@
+# facturacion/cache_reportes.py
+"""
+Cache de los endpoints de reportes (views_reportes.py, aging).
+
+    @api_view(['GET'])
+    @reporte_cacheado('estado_cartera')
+    def estado_cartera(request): ...
+
+- Backend: el alias REPORTES_CACHE de settings.CACHES (locmem o file en
+  local; cualquier backend de Django en producción).
+- Clave: reporte + generaciones de lo que lee + día de hoy (bandas de aging,
+  "últimos 12 meses") + query params normalizados (ordenados, sin vacíos).
+- Invalidación: cada escritura de Factura/Pago (señales, bulk) llama a
+  invalidar('facturas'), que cambia la generación: las claves viejas dejan de
+  usarse y vencen solas (REPORTES_CACHE_TTL). La generación es un token
+  único, no un incr(): en backends sin incr atómico dos escrituras
+  simultáneas no pueden quedar en el mismo valor.
+- Single-flight: si varios requests piden la misma clave vencida, uno la
+  calcula y el resto espera su resultado (lock por proceso + cache.add
+  entre procesos, con timeout por si el que calcula muere).
+- metricas(): aciertos / fallos / esperas por reporte (por proceso); cada
+  respuesta lleva X-Cache: HIT | MISS.
+"""
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+ESPERA_MAX = 30        # segundos que se espera a otro que está calculando la misma clave
+ESPERA_PASO = 0.05
+
+_locks = defaultdict(threading.Lock)  # una por clave; pocas (reportes × params × generación)
+_locks_lock = threading.Lock()
+_metricas = defaultdict(Counter)
+
+
+def _cache():
+    return caches[settings.REPORTES_CACHE]
+
+
+def _clave_gen(dependencia: str) -> str:
+    return f'reportes:gen:{dependencia}'
+
+
+def generaciones(dependencias) -> str:
+    c = _cache()
+    claves = [_clave_gen(d) for d in dependencias]
+    actuales = c.get_many(claves)
+    for k in claves:
+        if k not in actuales:  # primera vez o desalojada: una nueva nunca coincide con una vieja
+            c.add(k, uuid.uuid4().hex[:12], None)
+            actuales[k] = c.get(k)
+    return '.'.join(str(actuales[k]) for k in claves)
+
+
+def invalidar(*dependencias):
+    """Nueva generación para `dependencias`: ya y al commit (un request concurrente pudo cachear lo viejo)."""
+    def bump():
+        _cache().set_many({_clave_gen(d): uuid.uuid4().hex[:12] for d in dependencias}, None)
+    bump()
+    transaction.on_commit(bump)
+
+
+def _contar(nombre, que):
+    with _locks_lock:
+        _metricas[nombre][que] += 1
+
+
+def _lock(clave):
+    with _locks_lock:
+        return _locks[clave]
+
+
+def _clave(nombre: str, dependencias, params) -> str:
+    params = sorted((k, v) for k, v in params if v not in ('', None, ()))
+    firma = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'reportes:{nombre}:{generaciones(dependencias)}:{date.today():%Y%m%d}:{firma}'
+
+
+def obtener(nombre: str, dependencias, calcular, params=()):
+    """(valor, hit) del reporte `nombre`; si no está, lo calcula una sola vez entre los que lo piden."""
+    clave = _clave(nombre, dependencias, params)
+    c = _cache()
+    valor = c.get(clave)
+    if valor is not None:
+        _contar(nombre, 'aciertos')
+        return valor, True
+
+    try:
+        with _lock(clave):  # los threads de este proceso esperan acá
+            valor = c.get(clave)
+            if valor is not None:
+                _contar(nombre, 'esperas')
+                return valor, True
+            marca = f'{clave}:calculando'
+            limite = time.monotonic() + ESPERA_MAX
+            # otro proceso lo está calculando: se espera su valor. Si suelta la marca sin
+            # cachear nada (error, respuesta no 200), el próximo add() la toma y se calcula ya
+            while not c.add(marca, 1, ESPERA_MAX) and time.monotonic() < limite:
+                time.sleep(ESPERA_PASO)
+                valor = c.get(clave)
+                if valor is not None:
+                    _contar(nombre, 'esperas')
+                    return valor, True
+            try:
+                _contar(nombre, 'fallos')
+                valor = calcular()
+                if valor is not None:
+                    c.set(clave, valor, settings.REPORTES_CACHE_TTL)
+            finally:
+                c.delete(marca)
+        return valor, False
+    finally:  # también si calcular() falla: si no, las claves con error se acumulan en _locks
+        with _locks_lock:
+            _locks.pop(clave, None)
+
+
+def reporte_cacheado(nombre: str, depende=('facturas',)):
+    """Decorador para vistas de reportes (debajo de @api_view): cachea response.data de los 200."""
+    def deco(vista):
+        @functools.wraps(vista)
+        def envuelta(request, *args, **kwargs):
+            respuestas = []
+
+            def calcular():
+                resp = vista(request, *args, **kwargs)
+                respuestas.append(resp)
+                return resp.data if resp.status_code == 200 else None
+
+            params = [(k, tuple(v for v in request.query_params.getlist(k) if v)) for k in request.query_params]
+            data, hit = obtener(nombre, depende, calcular, params)
+            if data is None:  # error (400, ...): no se cachea, va la respuesta tal cual
+                return respuestas[0]
+            resp = Response(data)
+            resp['X-Cache'] = 'HIT' if hit else 'MISS'
+            return resp
+        return envuelta
+    return deco
+
+
+def metricas() -> dict:
+    """{reporte: {aciertos, fallos, esperas, ratio}}; ratio = servidos sin calcular / pedidos."""
+    out = {}
+    for nombre, m in sorted(_metricas.items()):
+        total = m['aciertos'] + m['fallos'] + m['esperas']
+        out[nombre] = {'aciertos': m['aciertos'], 'fallos': m['fallos'], 'esperas': m['esperas'],
+                       'ratio': round((m['aciertos'] + m['esperas']) / total, 3) if total else None}
+    return out
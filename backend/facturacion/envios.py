@@ -0,0 +1,277 @@
+# facturacion/envios.py
+"""
+Cola de envíos de facturas por email (modelo EnvioFactura).
+
+- encolar_envio(): lo usan los endpoints; no renderiza ni habla con SMTP.
+- encolar_lote(): envío masivo (POST /api/facturas/enviar-lote/), un INSERT.
+- procesar_pendientes(): lo corre el worker (`manage.py procesar_envios`).
+  Toma trabajos con un UPDATE condicional (lease), así varios workers
+  pueden correr a la vez sin mandar dos veces el mismo mail.
+  Por pasada: una sola conexión SMTP, PDFs renderizados en paralelo por
+  delante del loop de envío, y límite de mensajes por minuto por dominio.
+"""
+import queue
+import threading
+import uuid
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import IntegrityError, transaction
+from django.db import connection as db_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EnvioFactura, Factura
+from .pdf_cache import obtener_pdf_bytes, obtener_pdfs
+
+BACKOFF_BASE = getattr(settings, 'ENVIOS_BACKOFF_SEGUNDOS', 30)
+BACKOFF_MAX = getattr(settings, 'ENVIOS_BACKOFF_MAX_SEGUNDOS', 60 * 60)
+LEASE = getattr(settings, 'ENVIOS_LEASE_SEGUNDOS', 5 * 60)
+MAX_INTENTOS = getattr(settings, 'ENVIOS_MAX_INTENTOS', 5)
+POR_DOMINIO_MINUTO = getattr(settings, 'ENVIOS_POR_DOMINIO_POR_MINUTO', 60)
+
+
+class EnvioError(Exception):
+    """Error permanente: no tiene sentido reintentar (p. ej. cliente sin email)."""
+
+
+def encolar_envio(factura: Factura, clave: str | None = None) -> tuple[EnvioFactura, bool]:
+    """
+    Encola el envío de `factura`. Con `clave` (idempotency key) un reintento del
+    cliente HTTP devuelve el mismo trabajo en vez de duplicarlo.
+    Devuelve (envio, creado). Lanza EnvioError si el cliente no tiene email.
+    """
+    if clave:
+        existente = EnvioFactura.objects.filter(clave=clave).first()
+        if existente is not None:
+            return existente, False
+    if not factura.cliente.email:
+        raise EnvioError('El cliente no tiene email cargado')
+    try:
+        with transaction.atomic():
+            envio = EnvioFactura.objects.create(factura=factura, clave=clave or None,
+                                                destinatario=factura.cliente.email,
+                                                max_intentos=MAX_INTENTOS)
+    except IntegrityError:
+        # carrera con otro request con la misma clave
+        if clave:
+            existente = EnvioFactura.objects.filter(clave=clave).first()
+            if existente is not None:
+                return existente, False
+        raise
+    return envio, True
+
+
+def encolar_lote(facturas, lote: str | None = None) -> tuple[str, list[EnvioFactura], list[dict]]:
+    """
+    Encola un envío por cada factura (con cliente cargado) en un solo INSERT.
+    Devuelve (lote, envios, omitidas); omitidas = [{'factura': id, 'error': ...}].
+    """
+    lote = lote or uuid.uuid4().hex
+    envios, omitidas = [], []
+    for f in facturas:
+        if not f.cliente.email:
+            omitidas.append({'factura': f.pk, 'error': 'El cliente no tiene email cargado'})
+            continue
+        envios.append(EnvioFactura(factura=f, lote=lote, destinatario=f.cliente.email,
+                                   max_intentos=MAX_INTENTOS))
+    return lote, EnvioFactura.objects.bulk_create(envios), omitidas
+
+
+def _render_pdf(factura: Factura) -> bytes:
+    # pasa por el cache de PDFs: reenviar una factura sin cambios no vuelve a renderizar
+    return obtener_pdf_bytes(factura)
+
+
+def _render_pdfs(facturas, tanda: int = 16):
+    """
+    Generador de (factura, pdf_bytes | Exception) en orden. Cada tanda se
+    renderiza en paralelo en el pool; si la tanda falla, se reintenta de a una
+    para que un PDF roto no arrastre a los demás.
+    """
+    facturas = list(facturas)
+    for i in range(0, len(facturas), tanda):
+        parte = facturas[i:i + tanda]
+        try:
+            yield from list(obtener_pdfs(parte, tanda=len(parte)))
+        except Exception:
+            for f in parte:
+                try:
+                    yield f, _render_pdf(f)
+                except Exception as e:
+                    yield f, e
+
+
+def _por_delante(gen, maximo: int = 32):
+    """Corre `gen` en un hilo aparte, hasta `maximo` resultados por delante del consumidor."""
+    q = queue.Queue(maxsize=maximo)
+    fin = object()
+
+    def producir():
+        try:
+            for x in gen:
+                q.put(x)
+        except Exception as e:  # no debería pasar (_render_pdfs atrapa por factura)
+            q.put(e)
+        finally:
+            try:
+                db_connection.close()  # la que abrió este hilo al leer (cada hilo tiene la suya)
+            finally:
+                q.put(fin)
+    threading.Thread(target=producir, daemon=True).start()
+    while (x := q.get()) is not fin:
+        if isinstance(x, Exception):
+            raise x
+        yield x
+
+
+class LimitePorDominio:
+    """Ventana deslizante de 1 minuto por dominio de destino (en memoria del worker)."""
+    def __init__(self, por_minuto: int):
+        self.por_minuto = por_minuto
+        self.enviados = defaultdict(deque)
+
+    def reservar(self, dominio: str, ahora):
+        """None si se puede enviar ya (y lo cuenta); si no, desde cuándo se puede."""
+        if not self.por_minuto:
+            return None
+        q = self.enviados[dominio]
+        while q and q[0] <= ahora - timedelta(minutes=1):
+            q.popleft()
+        if len(q) >= self.por_minuto:
+            return q[0] + timedelta(minutes=1)
+        q.append(ahora)
+        return None
+
+
+_limite = LimitePorDominio(POR_DOMINIO_MINUTO)
+
+
+def construir_mensaje(factura: Factura, destinatario: str, pdf_bytes: bytes, connection=None) -> EmailMessage:
+    cli = factura.cliente
+    msg = EmailMessage(
+        subject=f'Factura {factura.nro} - {cli.razon_social}',
+        body=(f'Hola {cli.razon_social},\n\n'
+              'Adjuntamos su factura. Muchas gracias.\n\n'
+              'Saludos,\nSGI'),
+        from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+        to=[destinatario],
+        connection=connection,
+    )
+    msg.attach(filename=f'factura_{factura.nro}.pdf', content=pdf_bytes, mimetype='application/pdf')
+    return msg
+
+
+def _backoff(intentos: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** max(intentos - 1, 0), BACKOFF_MAX))
+
+
+def _tomables(ahora):
+    return (Q(estado=EnvioFactura.PENDIENTE, proximo_intento__lte=ahora)
+            | Q(estado=EnvioFactura.ENVIANDO, bloqueado_hasta__lt=ahora))  # worker caído
+
+
+def tomar(ids, ahora=None) -> list[EnvioFactura]:
+    """
+    Reclama los trabajos `ids` para esta pasada con un solo UPDATE condicional
+    y devuelve los que efectivamente quedaron tomados (otro worker pudo ganar algunos).
+    """
+    ahora = ahora or timezone.now()
+    token = uuid.uuid4().hex
+    EnvioFactura.objects.filter(_tomables(ahora), pk__in=ids).update(
+        estado=EnvioFactura.ENVIANDO, bloqueado_hasta=ahora + timedelta(seconds=LEASE), tomado_por=token)
+    return list(EnvioFactura.objects.filter(tomado_por=token, estado=EnvioFactura.ENVIANDO)
+                .order_by('proximo_intento', 'id'))
+
+
+def entregar(envio: EnvioFactura, connection=None, pdf_bytes: bytes | Exception | None = None,
+             factura: Factura | None = None):
+    """Renderiza y envía. Actualiza el estado del trabajo (ENVIADO / PENDIENTE con backoff / FALLIDO)."""
+    ahora = timezone.now()
+    envio.intentos += 1
+    try:
+        f = factura or (Factura.objects.select_related('cliente', 'proyecto')
+                        .prefetch_related('items').get(pk=envio.factura_id))
+        if isinstance(pdf_bytes, Exception):
+            raise pdf_bytes
+        if pdf_bytes is None:
+            pdf_bytes = _render_pdf(f)
+        if construir_mensaje(f, envio.destinatario, pdf_bytes, connection=connection).send() <= 0:
+            raise RuntimeError('No se pudo enviar el email')
+    except Exception as e:
+        envio.ultimo_error = f'{type(e).__name__}: {e}'
+        if isinstance(e, EnvioError) or envio.intentos >= envio.max_intentos:
+            envio.estado = EnvioFactura.FALLIDO
+        else:
+            envio.estado = EnvioFactura.PENDIENTE
+            envio.proximo_intento = ahora + _backoff(envio.intentos)
+    else:
+        envio.estado = EnvioFactura.ENVIADO
+        envio.enviado_en = ahora
+        envio.ultimo_error = None
+    envio.bloqueado_hasta = None
+    envio.save(update_fields=['estado', 'intentos', 'proximo_intento', 'bloqueado_hasta',
+                              'ultimo_error', 'enviado_en'])
+    return envio
+
+
+def _dominio(email: str) -> str:
+    return email.rsplit('@', 1)[-1].lower()
+
+
+def procesar_pendientes(limite: int = 50, connection=None, limite_dominio: LimitePorDominio | None = None) -> dict:
+    """
+    Una pasada del worker. Devuelve contadores por estado resultante
+    (PENDIENTE incluye los diferidos por el límite por dominio).
+    """
+    ahora = timezone.now()
+    limite_dominio = limite_dominio or _limite
+    ids = list(EnvioFactura.objects.filter(_tomables(ahora))
+               .order_by('proximo_intento', 'id').values_list('id', flat=True)[:limite])
+    out = {EnvioFactura.ENVIADO: 0, EnvioFactura.PENDIENTE: 0, EnvioFactura.FALLIDO: 0}
+    envios = tomar(ids, ahora) if ids else []
+    if not envios:
+        return out
+
+    facturas = (Factura.objects.select_related('cliente', 'proyecto').prefetch_related('items')
+                .in_bulk({e.factura_id for e in envios}))
+
+    # dominios saturados: vuelven a la cola sin gastar un intento
+    listos = []
+    for envio in envios:
+        desde = limite_dominio.reservar(_dominio(envio.destinatario), ahora)
+        if desde is None:
+            listos.append(envio)
+        else:
+            EnvioFactura.objects.filter(pk=envio.pk).update(
+                estado=EnvioFactura.PENDIENTE, proximo_intento=desde, bloqueado_hasta=None)
+            out[EnvioFactura.PENDIENTE] += 1
+
+    conn = connection or get_connection()
+    pdfs = _por_delante(_render_pdfs(facturas[e.factura_id] for e in listos))
+    try:
+        conn.open()  # una sola conexión SMTP para toda la pasada
+    except Exception:
+        pass  # SMTP caído: cada envío falla y queda con backoff
+    try:
+        for envio, (f, pdf) in zip(listos, pdfs):
+            entregar(envio, connection=conn, pdf_bytes=pdf, factura=f)
+            out[envio.estado] += 1
+            if envio.estado != EnvioFactura.ENVIADO and not isinstance(pdf, Exception):
+                _reabrir(conn)  # falló el envío: la conexión puede haber quedado rota
+    finally:
+        conn.close()
+    return out
+
+
+def _reabrir(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+    try:
+        conn.open()
+    except Exception:
+        pass  # el próximo send_messages reintenta abrir
@@ -0,0 +1,38 @@
+# facturacion/exportar.py
+"""
+Exportaciones masivas que se devuelven con StreamingHttpResponse:
+se generan de a pedazos, así la memoria no crece con la cantidad de filas.
+"""
+import re
+import zipfile
+
+
+class _Salida:
+    """'Archivo' de solo escritura que junta lo escrito hasta que se lo vacía."""
+    def __init__(self):
+        self.partes = []
+
+    def write(self, data):
+        self.partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        data, self.partes = b''.join(self.partes), []
+        return data
+
+
+def zip_stream(archivos):
+    """Generador de bytes de un .zip con los (nombre, contenido) de `archivos`."""
+    salida = _Salida()  # sin seek/tell: zipfile escribe en modo streaming
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in archivos:
+            zf.writestr(nombre, contenido)
+            yield salida.vaciar()
+    yield salida.vaciar()
+
+
+def nombre_pdf(factura) -> str:
+    return 'factura_' + re.sub(r'[^\w.-]+', '_', factura.nro) + '.pdf'
@@ -0,0 +1,89 @@
+# facturacion/management/commands/bench_aging.py
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from clientes.models import Cliente
+from facturacion.aging import aging
+from facturacion.models import Factura
+
+
+def _legacy_aging():
+    """Implementación anterior (filas a Python, float y bandas en un loop), para comparar."""
+    qs = (Factura.objects
+          .filter(estado__in=['ABIERTA', 'PARCIAL'], saldo__gt=0)
+          .order_by()
+          .values('id', 'vencimiento', 'saldo'))
+    out = {'0-30': 0.0, '31-60': 0.0, '61-90': 0.0, '90+': 0.0}
+    hoy = date.today()
+    for f in qs:
+        saldo = f['saldo']
+        if saldo is None or float(saldo) <= 0:
+            continue
+        venc = f['vencimiento']
+        dias = (hoy - venc).days if venc else 0
+        if dias <= 30: band = '0-30'
+        elif dias <= 60: band = '31-60'
+        elif dias <= 90: band = '61-90'
+        else: band = '90+'
+        out[band] += float(saldo)
+    return out
+
+
+class Command(BaseCommand):
+    help = ('Benchmark del aging: loop en Python (anterior) vs bandas en SQL (facturacion/aging.py), '
+            'sobre facturas abiertas sintéticas generadas dentro de una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=10_000)
+        parser.add_argument('--facturas', type=int, default=1_000_000, help='facturas abiertas')
+        parser.add_argument('--batch', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        n_cli, n_fac, batch = opts['clientes'], opts['facturas'], opts['batch']
+        rnd = random.Random(42)
+        hoy = date.today()
+
+        with transaction.atomic():
+            t0 = perf_counter()
+            clientes = Cliente.objects.bulk_create(
+                [Cliente(razon_social=f'BENCH {i}') for i in range(n_cli)], batch_size=batch)
+            ids = [c.pk for c in clientes]
+            for desde in range(0, n_fac, batch):
+                facturas = []
+                for i in range(desde, min(desde + batch, n_fac)):
+                    fecha = hoy - timedelta(days=rnd.randrange(180))
+                    total = Decimal(rnd.randrange(1000, 100_000)) / 100
+                    pagado = (total / 2).quantize(Decimal('0.01')) if rnd.random() < 0.3 else Decimal('0.00')
+                    facturas.append(Factura(
+                        cliente_id=rnd.choice(ids), nro=f'BENCH-{i}', fecha=fecha,
+                        vencimiento=None if rnd.random() < 0.05 else fecha + timedelta(days=30),
+                        moneda='USD' if rnd.random() < 0.1 else 'ARS', total=total,
+                        total_pagado=pagado, saldo=total - pagado,
+                        estado=Factura.PARCIAL if pagado else Factura.ABIERTA))
+                Factura.objects.bulk_create(facturas)
+            self.stdout.write(f'datos: {n_cli} clientes, {n_fac} facturas abiertas ({perf_counter() - t0:.1f}s)')
+
+            t0 = perf_counter()
+            legacy = _legacy_aging()
+            t_legacy = perf_counter() - t0
+
+            t0 = perf_counter()
+            nuevo = aging()
+            t_sql = perf_counter() - t0
+
+            t0 = perf_counter()
+            aging(por='cliente')
+            t_cliente = perf_counter() - t0
+
+            transaction.set_rollback(True)
+
+        dif = max(abs(Decimal(str(legacy[b])) - nuevo[b]) for b in nuevo)
+        self.stdout.write(f'  anterior (Python)    : {t_legacy * 1000:10.1f} ms')
+        self.stdout.write(f'  bandas en SQL        : {t_sql * 1000:10.1f} ms')
+        self.stdout.write(f'  SQL por cliente      : {t_cliente * 1000:10.1f} ms')
+        self.stdout.write(f'  diferencia máxima    : {dif} (float acumulado vs Decimal)')
@@ -0,0 +1,98 @@
+# facturacion/management/commands/bench_envios.py
+import asyncio
+import socket
+import tempfile
+from time import perf_counter
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from clientes.models import Cliente
+from facturacion.envios import LimitePorDominio, construir_mensaje, encolar_lote, procesar_pendientes
+from facturacion.models import EnvioFactura, Factura, FacturaItem
+from facturacion.pdf_cache import obtener_pdf_bytes
+
+
+class Command(BaseCommand):
+    help = ('Benchmark contra un SMTP local (aiosmtpd): N mails con una conexión por mensaje '
+            '(EmailMessage.send()) vs una pasada de procesar_envios (una conexión por lote). '
+            'Corre dentro de una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=200)
+        parser.add_argument('--batch', type=int, default=200)
+        parser.add_argument('--handshake-ms', type=float, default=50,
+                            help='Demora simulada al abrir cada conexión (TLS + AUTH de un SMTP remoto).')
+
+    def handle(self, *args, **opts):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError('Instalar aiosmtpd para este benchmark (pip install aiosmtpd).')
+
+        demora = opts['handshake_ms'] / 1000
+
+        class Handler:
+            mensajes = 0
+
+            async def handle_EHLO(self, server, session, envelope, hostname, responses):
+                await asyncio.sleep(demora)
+                session.host_name = hostname
+                return responses
+
+            async def handle_DATA(self, server, session, envelope):
+                self.mensajes += 1
+                return '250 OK'
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            puerto = s.getsockname()[1]
+        handler = Handler()
+        smtp = Controller(handler, hostname='127.0.0.1', port=puerto)
+        smtp.start()
+
+        def conexion():
+            return get_connection('django.core.mail.backends.smtp.EmailBackend', host='127.0.0.1',
+                                  port=puerto, use_tls=False, username='', password='')
+
+        n = opts['n']
+        try:
+            with tempfile.TemporaryDirectory() as tmp, override_settings(PDF_CACHE_DIR=tmp), transaction.atomic():
+                clientes = Cliente.objects.bulk_create(
+                    [Cliente(razon_social=f'BENCH {i}', email=f'c{i}@dominio{i % 10}.com') for i in range(n)])
+                facturas = Factura.objects.bulk_create(
+                    [Factura(cliente=c, nro=f'BENCH-{i}', total=100) for i, c in enumerate(clientes)])
+                FacturaItem.objects.bulk_create(
+                    [FacturaItem(factura=f, descripcion='servicio', qty=1, precio_unit=100) for f in facturas])
+                facturas = list(Factura.objects.filter(nro__startswith='BENCH-')
+                                .select_related('cliente', 'proyecto').prefetch_related('items'))
+
+                for f in facturas:  # cache de PDFs caliente: se compara solo el envío
+                    obtener_pdf_bytes(f)
+
+                # 1) como antes: EmailMessage.send() con una conexión nueva por mensaje
+                t0 = perf_counter()
+                for f in facturas:
+                    construir_mensaje(f, f.cliente.email, obtener_pdf_bytes(f), connection=conexion()).send()
+                t_loop = perf_counter() - t0
+
+                # 2) cola: una conexión por pasada
+                encolar_lote(facturas)
+                t0 = perf_counter()
+                pendientes = n
+                while pendientes:
+                    procesar_pendientes(opts['batch'], connection=conexion(), limite_dominio=LimitePorDominio(0))
+                    pendientes = EnvioFactura.objects.exclude(estado=EnvioFactura.ENVIADO).count()
+                t_lote = perf_counter() - t0
+
+                transaction.set_rollback(True)
+        finally:
+            smtp.stop()
+
+        self.stdout.write(f'{n} mails, handshake {opts["handshake_ms"]:.0f} ms '
+                          f'(recibidos por el SMTP local: {handler.mensajes})')
+        self.stdout.write(f'  conexión por mensaje : {t_loop:8.3f}s  {n / t_loop:10.1f} msg/s')
+        self.stdout.write(f'  procesar_pendientes  : {t_lote:8.3f}s  {n / t_lote:10.1f} msg/s')
+        self.stdout.write(f'  speedup              : {t_loop / t_lote:8.1f}x')
@@ -0,0 +1,65 @@
+# facturacion/management/commands/bench_export.py
+import tracemalloc
+from decimal import Decimal
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from facturacion.models import Factura, FacturaItem
+
+CAMPOS = 'id,nro,cliente,cliente_nombre,proyecto,fecha,vencimiento,estado,moneda,total,total_pagado,saldo'
+
+
+class Command(BaseCommand):
+    help = ('Benchmark: GET /api/facturas/ (serializer, lista completa) vs '
+            'GET /api/facturas/export/?format=csv|ndjson (streaming). '
+            'Corre dentro de una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=20000)
+
+    def _medir(self, api, url, streaming):
+        def bajar():
+            resp = api.get(url)
+            assert resp.status_code == 200, resp.status_code
+            return sum(len(c) for c in resp.streaming_content) if streaming else len(resp.content)
+
+        t0 = perf_counter()
+        size = bajar()
+        t = perf_counter() - t0
+        # memoria en una segunda pasada: tracemalloc distorsiona los tiempos
+        tracemalloc.start()
+        bajar()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return t, pico, size
+
+    def handle(self, *args, **opts):
+        n = opts['n']
+        api = APIClient(SERVER_NAME='localhost')
+        with transaction.atomic():
+            clientes = Cliente.objects.bulk_create([Cliente(razon_social=f'BENCH {i}') for i in range(50)])
+            facturas = Factura.objects.bulk_create(
+                [Factura(cliente=clientes[i % 50], nro=f'BENCH-{i}', total=Decimal('121.00'), saldo=Decimal('121.00'))
+                 for i in range(n)], batch_size=2000)
+            FacturaItem.objects.bulk_create(
+                [FacturaItem(factura=f, descripcion='servicio', qty=1, precio_unit=100, impuesto=21) for f in facturas],
+                batch_size=2000)
+
+            casos = [
+                ('serializer (completo)', '/api/facturas/', False),
+                ('serializer (?fields=)', f'/api/facturas/?fields={CAMPOS}', False),
+                ('export csv', '/api/facturas/export/?format=csv', True),
+                ('export ndjson', '/api/facturas/export/?format=ndjson', True),
+            ]
+            res = [(nombre, *self._medir(api, url, streaming)) for nombre, url, streaming in casos]
+            transaction.set_rollback(True)
+
+        base = res[0][1]
+        self.stdout.write(f'{n} facturas')
+        for nombre, t, pico, size in res:
+            self.stdout.write(f'  {nombre:22}: {t:7.3f}s {n / t:10.0f} filas/s  pico {pico / 2**20:7.1f} MiB'
+                              f'  {size / 2**20:6.1f} MiB  x{base / t:5.1f}')
@@ -0,0 +1,49 @@
+# facturacion/management/commands/bench_facturas_bulk.py
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+
+
+class Command(BaseCommand):
+    help = ('Benchmark: N facturas con un POST /api/facturas/ por factura vs un solo '
+            'POST /api/facturas/bulk/. Corre dentro de una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--n', type=int, default=500)
+        parser.add_argument('--items', type=int, default=3)
+
+    def handle(self, *args, **opts):
+        n, n_items = opts['n'], opts['items']
+        api = APIClient(SERVER_NAME='localhost')
+
+        with transaction.atomic():
+            cliente = Cliente.objects.create(razon_social='BENCH')
+
+            def payload(nro):
+                return {
+                    'cliente': cliente.pk, 'nro': nro, 'fecha': '2025-01-01', 'vencimiento': '2025-02-01',
+                    'items': [{'descripcion': f'item {j}', 'qty': '2', 'precio_unit': '100.00', 'impuesto': '21'}
+                              for j in range(n_items)],
+                }
+
+            t0 = perf_counter()
+            for i in range(n):
+                r = api.post('/api/facturas/', payload(f'BENCH-A-{i}'), format='json')
+                assert r.status_code == 201, r.content
+            t_loop = perf_counter() - t0
+
+            t0 = perf_counter()
+            r = api.post('/api/facturas/bulk/', [payload(f'BENCH-B-{i}') for i in range(n)], format='json')
+            assert r.status_code == 201, r.content
+            t_bulk = perf_counter() - t0
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{n} facturas x {n_items} ítems')
+        self.stdout.write(f'  1 request por factura : {t_loop:8.3f}s  {n / t_loop:10.1f} fact/s')
+        self.stdout.write(f'  /api/facturas/bulk/   : {t_bulk:8.3f}s  {n / t_bulk:10.1f} fact/s')
+        self.stdout.write(f'  speedup               : {t_loop / t_bulk:8.1f}x')
@@ -0,0 +1,104 @@
+# facturacion/management/commands/bench_pagos_tiempo.py
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from clientes.models import Cliente
+from facturacion.models import Factura, Pago
+from facturacion import cache_reportes
+from facturacion.reportes import calc_pagos_tiempo, pagos_tiempo_ranking
+
+
+def _legacy_calc_pagos_tiempo():
+    """Implementación anterior (annotate de todas las facturas + agrupado en Python), para comparar."""
+    dec = DecimalField(max_digits=14, decimal_places=2)
+    qs = (Factura.objects
+          .annotate(
+              tp=Coalesce(Sum('pagos__monto'), Value(0, output_field=dec)),
+              phv=Coalesce(Sum('pagos__monto', filter=Q(pagos__fecha__lte=F('vencimiento'))),
+                           Value(0, output_field=dec)),
+          )
+          .values('id', 'cliente_id', 'cliente__razon_social', 'total', 'vencimiento', 'tp', 'phv'))
+    rows = {}
+    for f in qs:
+        total, tp, phv = f['total'] or 0, f['tp'] or 0, f['phv'] or 0
+        if total <= 0 or tp < total:
+            continue
+        r = rows.setdefault(f['cliente_id'], {'cliente_id': f['cliente_id'], 'cliente': f['cliente__razon_social'],
+                                              'pagadas': 0, 'a_tiempo': 0})
+        r['pagadas'] += 1
+        if f['vencimiento'] is None or phv >= total:
+            r['a_tiempo'] += 1
+    out = [{**v, 'ratio': round(v['a_tiempo'] / v['pagadas'], 3)} for v in rows.values()]
+    out.sort(key=lambda x: (x['ratio'], x['a_tiempo']), reverse=True)
+    return out
+
+
+class Command(BaseCommand):
+    help = ('Benchmark de pagos a tiempo: implementación anterior vs query agrupada vs ranking cacheado, '
+            'sobre datos sintéticos generados dentro de una transacción que se descarta.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=10_000)
+        parser.add_argument('--facturas', type=int, default=1_000_000)
+        parser.add_argument('--batch', type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        n_cli, n_fac, batch = opts['clientes'], opts['facturas'], opts['batch']
+        rnd = random.Random(42)
+        base = date(2024, 1, 1)
+
+        with transaction.atomic():
+            t0 = perf_counter()
+            clientes = Cliente.objects.bulk_create(
+                [Cliente(razon_social=f'BENCH {i}') for i in range(n_cli)], batch_size=batch)
+            ids = [c.pk for c in clientes]
+            for desde in range(0, n_fac, batch):
+                facturas, pagos = [], []
+                for i in range(desde, min(desde + batch, n_fac)):
+                    fecha = base + timedelta(days=rnd.randrange(365))
+                    pagada = rnd.random() < 0.8
+                    total = Decimal('100.00')
+                    facturas.append(Factura(cliente_id=rnd.choice(ids), nro=f'BENCH-{i}', fecha=fecha,
+                                            vencimiento=fecha + timedelta(days=30), total=total,
+                                            total_pagado=total if pagada else Decimal('0.00'),
+                                            saldo=Decimal('0.00') if pagada else total,
+                                            estado=Factura.PAGADA if pagada else Factura.ABIERTA))
+                Factura.objects.bulk_create(facturas)
+                for f in facturas:
+                    if f.estado == Factura.PAGADA:
+                        pagos.append(Pago(factura=f, monto=f.total,
+                                          fecha=f.vencimiento + timedelta(days=rnd.choice([-10, 15]))))
+                Pago.objects.bulk_create(pagos)
+            self.stdout.write(f'datos: {n_cli} clientes, {n_fac} facturas ({perf_counter() - t0:.1f}s)')
+
+            t0 = perf_counter()
+            legacy = _legacy_calc_pagos_tiempo()
+            t_legacy = perf_counter() - t0
+
+            t0 = perf_counter()
+            nuevo = calc_pagos_tiempo()
+            t_sql = perf_counter() - t0
+
+            cache_reportes.invalidar('facturas')
+            pagos_tiempo_ranking()
+            t0 = perf_counter()
+            for _ in range(100):
+                pagos_tiempo_ranking()[:5]
+            t_cache = (perf_counter() - t0) / 100
+            cache_reportes.invalidar('facturas')
+
+            transaction.set_rollback(True)
+
+        clave = lambda r: (r['cliente_id'], r['pagadas'], r['a_tiempo'], r['ratio'])
+        iguales = sorted(map(clave, legacy)) == sorted(map(clave, nuevo))
+        self.stdout.write(f'  anterior (Python)    : {t_legacy * 1000:10.1f} ms')
+        self.stdout.write(f'  query agrupada       : {t_sql * 1000:10.1f} ms')
+        self.stdout.write(f'  top-5 desde cache    : {t_cache * 1000:10.3f} ms')
+        self.stdout.write(f'  resultados iguales   : {iguales}')
@@ -0,0 +1,29 @@
+# facturacion/management/commands/procesar_envios.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from facturacion.envios import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Worker de la cola de envíos de facturas (EnvioFactura). Sin --once corre en loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Una sola pasada y sale.')
+        parser.add_argument('--batch', type=int, default=50)
+        parser.add_argument('--sleep', type=float, default=2.0, help='Espera entre pasadas sin trabajo (s).')
+
+    def handle(self, *args, **opts):
+        while True:
+            res = procesar_pendientes(opts['batch'])
+            procesados = sum(res.values())
+            if procesados:
+                self.stdout.write(' '.join(f'{k}={v}' for k, v in res.items()))
+            if opts['once']:
+                return
+            if not procesados:
+                try:
+                    time.sleep(opts['sleep'])
+                except KeyboardInterrupt:
+                    return
@@ -0,0 +1,43 @@
+# facturacion/management/commands/rebuild_ingresos_mensuales.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from facturacion.models import IngresoMensual, Pago
+
+
+class Command(BaseCommand):
+    help = ('Regenera el rollup IngresoMensual (cliente × mes × moneda) desde Pago. '
+            'Con --verify solo compara (exit 1 si hay diferencias).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='No escribe, solo compara.')
+
+    def handle(self, *args, **opts):
+        filas = (Pago.objects
+                 .annotate(mes=TruncMonth('fecha'))
+                 .values('factura__cliente_id', 'mes', 'factura__moneda')
+                 .annotate(importe=Sum('monto'), pagos=Count('id'))
+                 .order_by())
+        real = {(r['factura__cliente_id'], r['mes'], r['factura__moneda']): (r['importe'], r['pagos'])
+                for r in filas}
+
+        if opts['verify']:
+            actual = {(r.cliente_id, r.mes, r.moneda): (r.importe, r.pagos)
+                      for r in IngresoMensual.objects.all()}
+            diff = sorted(k for k in real.keys() | actual.keys() if real.get(k) != actual.get(k))
+            for k in diff:
+                self.stdout.write(f'{k}: rollup {actual.get(k)} != pagos {real.get(k)}')
+            self.stdout.write(f'{len(real)} filas esperadas, {len(diff)} con diferencias')
+            if diff:
+                raise CommandError(f'{len(diff)} filas desincronizadas')
+            return
+
+        with transaction.atomic():
+            IngresoMensual.objects.all().delete()
+            IngresoMensual.objects.bulk_create([
+                IngresoMensual(cliente_id=cid, mes=mes, moneda=moneda, importe=importe, pagos=pagos)
+                for (cid, mes, moneda), (importe, pagos) in real.items()
+            ], batch_size=2000)
+        self.stdout.write(f'{len(real)} filas regeneradas')
@@ -0,0 +1,54 @@
+# facturacion/management/commands/rebuild_resumen_clientes.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from facturacion.models import Factura, Pago, Proyecto, ResumenCliente
+from facturacion.resumen import calcular_a_tiempo, calcular_resumenes
+
+CAMPOS = ('abiertas', 'parciales', 'pagadas', 'anuladas', 'cobradas', 'cobradas_a_tiempo', 'proyectos_activos')
+
+
+def _comparable(campos: dict) -> tuple:
+    importes = {m: {k: Decimal(v) for k, v in d.items()} for m, d in campos['importes'].items()}
+    return tuple(campos[c] for c in CAMPOS) + (importes,)
+
+
+class Command(BaseCommand):
+    help = ('Regenera ResumenCliente (y Factura.a_tiempo) desde facturas, pagos y proyectos. '
+            'Con --verify solo compara (exit 1 si hay diferencias).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='No escribe, solo compara.')
+
+    def handle(self, *args, **opts):
+        a_tiempo = calcular_a_tiempo(Factura, Pago)
+        actual_a_tiempo = dict(Factura.objects.exclude(a_tiempo=None).values_list('id', 'a_tiempo'))
+        facturas_mal = sorted(k for k in a_tiempo.keys() | actual_a_tiempo.keys()
+                              if a_tiempo.get(k) != actual_a_tiempo.get(k))
+
+        if opts['verify']:
+            real = calcular_resumenes(Factura, Proyecto)
+            actual = {r.cliente_id: {c: getattr(r, c) for c in (*CAMPOS, 'importes')}
+                      for r in ResumenCliente.objects.all()}
+            vacio = {c: 0 for c in CAMPOS} | {'importes': {}}  # cliente sin facturas ni proyectos
+            diff = sorted(k for k in real.keys() | actual.keys()
+                          if _comparable(real.get(k, vacio)) != _comparable(actual.get(k, vacio)))
+            for k in diff:
+                self.stdout.write(f'cliente {k}: resumen {actual.get(k)} != real {real.get(k)}')
+            self.stdout.write(f'{len(real)} clientes, {len(diff)} con diferencias, '
+                              f'{len(facturas_mal)} facturas con a_tiempo desactualizado')
+            if diff or facturas_mal:
+                raise CommandError(f'{len(diff) + len(facturas_mal)} filas desincronizadas')
+            return
+
+        with transaction.atomic():
+            for fid in facturas_mal:
+                Factura.objects.filter(pk=fid).update(a_tiempo=a_tiempo.get(fid))
+            real = calcular_resumenes(Factura, Proyecto)
+            ResumenCliente.objects.all().delete()
+            ResumenCliente.objects.bulk_create([
+                ResumenCliente(cliente_id=cid, **campos) for cid, campos in real.items()
+            ], batch_size=2000)
+        self.stdout.write(f'{len(real)} resúmenes regenerados, {len(facturas_mal)} facturas con a_tiempo corregido')
@@ -0,0 +1,57 @@
+# facturacion/management/commands/rebuild_saldos.py
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+
+from facturacion.models import Factura
+
+
+class Command(BaseCommand):
+    help = ('Recalcula Factura.total_pagado / saldo / estado desde los pagos. '
+            'Con --verify solo informa diferencias (exit 1 si hay).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='No escribe, solo compara.')
+        parser.add_argument('--batch', type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        verify, batch = opts['verify'], opts['batch']
+        dec0 = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+        qs = (Factura.objects
+              .annotate(real=Coalesce(Sum('pagos__monto'), dec0))
+              .only('id', 'nro', 'total', 'total_pagado', 'saldo', 'estado')
+              .order_by('id'))
+
+        revisadas, difieren, lote = 0, [], []
+        for f in qs.iterator(chunk_size=batch):
+            revisadas += 1
+            real = f.real
+            estado = f.estado if f.estado == Factura.ANULADA else Factura.estado_segun_pagos(f.total, real)
+            if f.total_pagado == real and f.saldo == f.total - real and f.estado == estado:
+                continue
+            difieren.append(f.nro)
+            if verify:
+                self.stdout.write(f'{f.nro}: pagado {f.total_pagado} != {real} | saldo {f.saldo} | estado {f.estado} -> {estado}')
+                continue
+            f.total_pagado, f.saldo, f.estado = real, f.total - real, estado
+            lote.append(f)
+            if len(lote) >= batch:
+                self._flush(lote)
+                lote = []
+        if lote:
+            self._flush(lote)
+
+        self.stdout.write(f'{revisadas} facturas revisadas, {len(difieren)} con diferencias'
+                          + ('' if verify else ' (corregidas)'))
+        if verify and difieren:
+            raise CommandError(f'{len(difieren)} facturas desincronizadas')
+        if difieren:  # bulk_update no pasa por Factura.save()
+            self.stdout.write('Correr también rebuild_resumen_clientes.')
+
+    @staticmethod
+    def _flush(lote):
+        with transaction.atomic():
+            Factura.objects.bulk_update(lote, ['total_pagado', 'saldo', 'estado'])
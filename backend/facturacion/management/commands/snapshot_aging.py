@@ -0,0 +1,38 @@
+# facturacion/management/commands/snapshot_aging.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from facturacion.aging_diario import backfill, foto
+
+
+def _fecha(valor: str) -> date:
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida (AAAA-MM-DD): {valor}')
+
+
+class Command(BaseCommand):
+    help = ('Guarda la foto diaria del aging (AgingDiario). Sin opciones, la de hoy (correr una vez por día); '
+            '--desde rellena todos los días del rango en una sola pasada por facturas y pagos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', type=_fecha, help='Foto de un solo día (default hoy).')
+        parser.add_argument('--desde', type=_fecha, help='Backfill desde este día.')
+        parser.add_argument('--hasta', type=_fecha, help='Fin del backfill (default hoy).')
+
+    def handle(self, *args, **opts):
+        if opts['desde']:
+            if opts['fecha']:
+                raise CommandError('--fecha y --desde son excluyentes.')
+            hasta = opts['hasta'] or date.today()
+            if opts['desde'] > hasta:
+                raise CommandError('--desde no puede ser posterior a --hasta.')
+            n = backfill(opts['desde'], hasta)
+            self.stdout.write(f'{n} filas ({opts["desde"]} → {hasta})')
+            return
+        if opts['hasta']:
+            raise CommandError('--hasta va con --desde.')
+        fecha = opts['fecha'] or date.today()
+        self.stdout.write(f'{foto(fecha)} filas ({fecha})')
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:45
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def poblar_saldos(apps, schema_editor):
+    Factura = apps.get_model('facturacion', 'Factura')
+    Pago = apps.get_model('facturacion', 'Pago')
+    pagado = dict(Pago.objects.values('factura_id').annotate(s=Sum('monto')).values_list('factura_id', 's'))
+    lote = []
+    for f in Factura.objects.only('id', 'total').iterator(chunk_size=2000):
+        f.total_pagado = pagado.get(f.id) or Decimal('0.00')
+        f.saldo = f.total - f.total_pagado
+        lote.append(f)
+        if len(lote) >= 2000:
+            Factura.objects.bulk_update(lote, ['total_pagado', 'saldo'])
+            lote = []
+    if lote:
+        Factura.objects.bulk_update(lote, ['total_pagado', 'saldo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0007_alter_facturaitem_impuesto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factura',
+            name='saldo',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='factura',
+            name='total_pagado',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.RunPython(poblar_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_indices_historial_y_razon_social'),
+        ('facturacion', '0008_factura_total_pagado_saldo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['-fecha', '-id'], name='facturacion_fecha_47cbda_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', 'vencimiento'], name='facturacion_estado_fc0c18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['cliente', '-fecha'], name='facturacion_cliente_9839c9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['factura', 'fecha'], name='facturacion_factura_6a39f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['-fecha', '-id'], name='facturacion_fecha_11a4e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['cliente', 'nombre'], name='facturacion_cliente_6cc112_idx'),
+        ),
+    ]
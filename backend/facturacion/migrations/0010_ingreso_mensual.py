@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def poblar_rollup(apps, schema_editor):
+    Pago = apps.get_model('facturacion', 'Pago')
+    IngresoMensual = apps.get_model('facturacion', 'IngresoMensual')
+    filas = (Pago.objects
+             .annotate(mes=TruncMonth('fecha'))
+             .values('factura__cliente_id', 'mes', 'factura__moneda')
+             .annotate(importe=Sum('monto'), pagos=Count('id'))
+             .order_by())
+    IngresoMensual.objects.bulk_create([
+        IngresoMensual(cliente_id=r['factura__cliente_id'], mes=r['mes'], moneda=r['factura__moneda'],
+                       importe=r['importe'], pagos=r['pagos'])
+        for r in filas
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_indices_historial_y_razon_social'),
+        ('facturacion', '0009_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngresoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('moneda', models.CharField(max_length=10)),
+                ('importe', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('pagos', models.PositiveIntegerField(default=0)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingresos_mensuales', to='clientes.cliente')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mes', 'moneda'], name='facturacion_mes_f41e6b_idx')],
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'mes', 'moneda'), name='ingreso_mensual_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_rollup, migrations.RunPython.noop),
+    ]
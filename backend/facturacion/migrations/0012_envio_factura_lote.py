@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0011_envio_factura'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enviofactura',
+            name='lote',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='enviofactura',
+            name='tomado_por',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+    ]
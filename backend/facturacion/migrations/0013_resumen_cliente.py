@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from facturacion.resumen import calcular_a_tiempo, calcular_resumenes
+
+
+def poblar_resumen(apps, schema_editor):
+    Factura = apps.get_model('facturacion', 'Factura')
+    Pago = apps.get_model('facturacion', 'Pago')
+    Proyecto = apps.get_model('facturacion', 'Proyecto')
+    ResumenCliente = apps.get_model('facturacion', 'ResumenCliente')
+    a_tiempo = calcular_a_tiempo(Factura, Pago)
+    for valor in (True, False):
+        ids = [fid for fid, v in a_tiempo.items() if v is valor]
+        for i in range(0, len(ids), 500):
+            Factura.objects.filter(pk__in=ids[i:i + 500]).update(a_tiempo=valor)
+    ResumenCliente.objects.bulk_create([
+        ResumenCliente(cliente_id=cid, **campos) for cid, campos in calcular_resumenes(Factura, Proyecto).items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0006_archivo'),
+        ('facturacion', '0012_envio_factura_lote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='clientes.cliente')),
+                ('abiertas', models.IntegerField(default=0)),
+                ('parciales', models.IntegerField(default=0)),
+                ('pagadas', models.IntegerField(default=0)),
+                ('anuladas', models.IntegerField(default=0)),
+                ('cobradas', models.IntegerField(default=0)),
+                ('cobradas_a_tiempo', models.IntegerField(default=0)),
+                ('proyectos_activos', models.IntegerField(default=0)),
+                ('importes', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='factura',
+            name='a_tiempo',
+            field=models.BooleanField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['cliente', 'estado', 'vencimiento'], name='facturacion_cliente_bf57d0_idx'),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
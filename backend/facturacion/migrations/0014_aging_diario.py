@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturacion', '0013_resumen_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgingDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('moneda', models.CharField(max_length=10)),
+                ('b0_30', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('b31_60', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('b61_90', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('b90', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('saldo', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('abiertas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'moneda'), name='aging_diario_unico')],
+            },
+        ),
+    ]
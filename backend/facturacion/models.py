@@ -1,12 +1,40 @@
 # facturacion/models.py
-from django.db import models
-from decimal import Decimal
+from django.db import models, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from decimal import Decimal, ROUND_HALF_EVEN
 from datetime import date
 
 from clientes.models import Cliente
 
 
-class Proyecto(models.Model):
+class _ConResumen:
+    """
+    Para que ResumenCliente aplique solo la diferencia de cada escritura: los
+    valores de CAMPOS_RESUMEN que hay en la base antes de guardar/borrar.
+    Se leen de la base (la instancia puede estar vieja), salvo que quien
+    guarda ya los tenga bloqueados y los deje en `_en_base` (aplicar_pago).
+    """
+    CAMPOS_RESUMEN = ()
+
+    def _valores(self) -> dict:
+        return {c: getattr(self, c) for c in self.CAMPOS_RESUMEN}
+
+    def _valores_en_base(self) -> dict | None:
+        previo = self.__dict__.pop('_en_base', None)
+        if previo is None and not self._state.adding:
+            previo = type(self)._base_manager.filter(pk=self.pk).values(*self.CAMPOS_RESUMEN).first()
+        return previo
+
+    def _valores_guardados(self, previo, update_fields) -> dict:
+        """Lo que quedó en la base después de save(update_fields=...)."""
+        if update_fields is None or previo is None:
+            return self._valores()
+        guardados = {self._meta.get_field(f).attname for f in update_fields}
+        return {c: getattr(self, c) if c in guardados else previo[c] for c in self.CAMPOS_RESUMEN}
+
+
+class Proyecto(_ConResumen, models.Model):
     cliente = models.ForeignKey('clientes.Cliente', on_delete=models.CASCADE)
     nombre = models.CharField(max_length=200)
     estado = models.CharField(
@@ -19,11 +47,23 @@ class Proyecto(models.Model):
     fecha_inicio = models.DateField(null=True, blank=True)
     fecha_fin_prev = models.DateField(null=True, blank=True)
 
+    CAMPOS_RESUMEN = ('cliente_id', 'estado')
+
+    class Meta:
+        # /api/proyectos/?cliente=ID y /api/clientes/ID/proyectos/ (ordenan por nombre)
+        indexes = [models.Index(fields=['cliente', 'nombre'])]
+
     def __str__(self) -> str:
         return f'{self.nombre} · {self.cliente.razon_social}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previo = self._valores_en_base()
+            super().save(*args, **kwargs)
+            ResumenCliente.aplicar_proyectos([(previo, self._valores_guardados(previo, kwargs.get('update_fields')))])
+
 
-class Factura(models.Model):
+class Factura(_ConResumen, models.Model):
     ABIERTA = 'ABIERTA'
     PARCIAL = 'PARCIAL'
     PAGADA  = 'PAGADA'
@@ -44,20 +84,107 @@ class Factura(models.Model):
     estado      = models.CharField(max_length=20, choices=ESTADOS, default=ABIERTA)
     total       = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     moneda      = models.CharField(max_length=10, default='ARS')
+    # Materializados: los mantiene Pago (save/delete) → ver aplicar_pago / rebuild_saldos
+    total_pagado = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    saldo        = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
+    # None = no está pagada; si lo está, ¿los pagos hasta el vencimiento cubren el total? (ver calcular_a_tiempo)
+    a_tiempo     = models.BooleanField(null=True, blank=True, editable=False)
+
+    CAMPOS_RESUMEN = ('cliente_id', 'moneda', 'estado', 'total', 'total_pagado', 'a_tiempo')
 
     def __str__(self) -> str:
         return self.nro
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previo = self._valores_en_base()
+            update_fields = kwargs.get('update_fields')
+            if (previo is not None and self.total != previo['total'] and self.estado != self.ANULADA
+                    and (update_fields is None or 'total' in update_fields)):
+                # cambió el total: el estado sale de los pagos (una PAGADA que sube vuelve a PARCIAL)
+                self.estado = self.estado_segun_pagos(self.total, self.total_pagado)
+                if update_fields is not None:
+                    update_fields = set(update_fields) | {'estado'}
+            # saldo siempre derivado de total - total_pagado
+            self.saldo = (self.total or Decimal('0')) - (self.total_pagado or Decimal('0'))
+            if update_fields is None or {'total', 'total_pagado', 'vencimiento'} & set(update_fields):
+                self.a_tiempo = self.calcular_a_tiempo()
+            if update_fields is not None and {'total', 'total_pagado', 'vencimiento'} & set(update_fields):
+                update_fields = set(update_fields) | {'saldo', 'a_tiempo'}
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields
+            super().save(*args, **kwargs)
+            guardados = self._valores_guardados(previo, kwargs.get('update_fields'))
+            ResumenCliente.aplicar_facturas([(previo, guardados)])
+            if previo is not None and (previo['cliente_id'], previo['moneda']) != (guardados['cliente_id'], guardados['moneda']):
+                IngresoMensual.mover_factura(self.pk, previo, guardados)
+
+    def calcular_a_tiempo(self) -> bool | None:
+        """Mismo criterio que /api/reportes/pagos-tiempo/ (reportes.calc_pagos_tiempo)."""
+        total, pagado = self.total or Decimal('0'), self.total_pagado or Decimal('0')
+        if not (total > 0 and pagado >= total):
+            return None
+        if self.vencimiento is None:
+            return True
+        if self.pk is None:
+            return False
+        hasta_venc = (Pago.objects.filter(factura_id=self.pk, fecha__lte=self.vencimiento)
+                      .aggregate(s=models.Sum('monto'))['s'])
+        return (hasta_venc or Decimal('0')) >= total
+
+    @staticmethod
+    def estado_segun_pagos(total, total_pagado) -> str:
+        if total_pagado <= 0:
+            return Factura.ABIERTA
+        if total_pagado < total:
+            return Factura.PARCIAL
+        return Factura.PAGADA
+
+    @classmethod
+    def aplicar_pago(cls, factura_id, delta: Decimal) -> 'Factura':
+        """
+        Suma `delta` (negativo al borrar/reducir un pago) a total_pagado y ajusta
+        saldo/estado. Una fila bloqueada + un UPDATE: no re-agrega todos los pagos.
+        """
+        with transaction.atomic():
+            f = (cls.objects.select_for_update()
+                 .only('cliente_id', 'moneda', 'total', 'total_pagado', 'estado', 'vencimiento', 'a_tiempo')
+                 .get(pk=factura_id))
+            f._en_base = f._valores()  # recién leída y bloqueada: save() no la vuelve a leer
+            f.total_pagado += delta
+            if f.estado != cls.ANULADA:
+                f.estado = cls.estado_segun_pagos(f.total, f.total_pagado)
+            f.save(update_fields=['total_pagado', 'estado'])
+        return f
+
+    @staticmethod
+    def calcular_total(items) -> Decimal:
+        """
+        Total en memoria a partir de dicts validados (qty/precio_unit/impuesto)
+        o de FacturaItem (guardados o no). Misma fórmula que FacturaItem.subtotal,
+        redondeado a 2 decimales igual que lo guarda el DecimalField.
+        """
+        total = Decimal('0')
+        for it in items:
+            if isinstance(it, dict):
+                total += FacturaItem.calcular_subtotal(it.get('qty'), it.get('precio_unit'), it.get('impuesto'))
+            else:
+                total += it.subtotal
+        return total.quantize(Decimal('0.01'), rounding=ROUND_HALF_EVEN)
+
     def recalc_total(self):
-        total = sum(
-            (it.qty or 0) * (it.precio_unit or 0) * (1 + ((it.impuesto or Decimal('0')) / Decimal('100')))
-            for it in self.items.all()
-        )
-        self.total = total
+        # Relee los ítems de la base: usar solo si no se tienen en memoria (ver calcular_total)
+        self.total = self.calcular_total(self.items.all())
         self.save(update_fields=['total'])
 
     class Meta:
         ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['-fecha', '-id']),            # listado / cursor del ViewSet
+            models.Index(fields=['estado', 'vencimiento']),    # aging / cartera (ABIERTA, PARCIAL)
+            models.Index(fields=['cliente', '-fecha']),        # facturas de un cliente
+            models.Index(fields=['cliente', 'estado', 'vencimiento']),  # vencida más antigua (resumen)
+        ]
 
 
 class FacturaItem(models.Model):
@@ -66,12 +193,16 @@ class FacturaItem(models.Model):
     qty          = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     precio_unit  = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     impuesto  = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, default=None)  # % puede ser nulo
+    @staticmethod
+    def calcular_subtotal(qty, precio_unit, impuesto) -> Decimal:
+        qty = qty or Decimal('0')
+        pu  = precio_unit or Decimal('0')
+        imp = (impuesto or Decimal('0')) / Decimal('100')
+        return (qty * pu) * (1 + imp)
+
     @property
     def subtotal(self) -> Decimal:
-        qty = self.qty or Decimal('0')
-        pu  = self.precio_unit or Decimal('0')
-        imp = (self.impuesto or Decimal('0')) / Decimal('100')
-        return (qty * pu) * (1 + imp)
+        return self.calcular_subtotal(self.qty, self.precio_unit, self.impuesto)
     def __str__(self) -> str:
         return f'{self.descripcion} ({self.qty} x {self.precio_unit})'
 
@@ -83,15 +214,233 @@ class Pago(models.Model):
     medio      = models.CharField(max_length=30, null=True, blank=True)
     referencia = models.CharField(max_length=60, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['factura', 'fecha']),  # pagos de una factura / pagado hasta el vencimiento
+            models.Index(fields=['-fecha', '-id']),     # listado / cursor del ViewSet
+        ]
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        from django.db.models import Sum
-        total_pagado = self.factura.pagos.aggregate(s=Sum('monto'))['s'] or Decimal('0.00')
-        f = self.factura
-        if total_pagado <= 0:
-            f.estado = Factura.ABIERTA
-        elif total_pagado < f.total:
-            f.estado = Factura.PARCIAL
-        else:
-            f.estado = Factura.PAGADA
-        f.save(update_fields=['estado'])
+        monto = Decimal(str(self.monto))
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = Pago.objects.filter(pk=self.pk).values('factura_id', 'monto', 'fecha').first()
+            super().save(*args, **kwargs)
+
+            # Ajuste incremental de la(s) factura(s) (total_pagado/saldo/estado) y del rollup mensual
+            if anterior is None:
+                f = Factura.aplicar_pago(self.factura_id, monto)
+                IngresoMensual.sumar(f, self.fecha, monto, 1)
+            elif (anterior['factura_id'], anterior['monto'], anterior['fecha']) == (self.factura_id, monto, self.fecha):
+                f = None
+            else:
+                if anterior['factura_id'] == self.factura_id:
+                    f = vieja = Factura.aplicar_pago(self.factura_id, monto - anterior['monto'])
+                else:
+                    vieja = Factura.aplicar_pago(anterior['factura_id'], -anterior['monto'])
+                    f = Factura.aplicar_pago(self.factura_id, monto)
+                IngresoMensual.sumar(vieja, anterior['fecha'], -anterior['monto'], -1)
+                IngresoMensual.sumar(f, self.fecha, monto, 1)
+        self._sync_factura_cacheada(f)
+
+    def _sync_factura_cacheada(self, f):
+        if f is not None and Pago.factura.is_cached(self):
+            for campo in ('total_pagado', 'saldo', 'estado'):
+                setattr(self.factura, campo, getattr(f, campo))
+
+
+class IngresoMensual(models.Model):
+    """
+    Rollup de cobranzas: cliente × mes × moneda. Lo mantienen Pago.save(), el
+    post_delete de Pago y Factura.save() cuando la factura cambia de cliente o
+    moneda; `manage.py rebuild_ingresos_mensuales` lo regenera.
+    Lo lee /api/reportes/ingresos-por-mes/ (a lo sumo meses × clientes filas).
+    """
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ingresos_mensuales')
+    mes     = models.DateField()  # primer día del mes
+    moneda  = models.CharField(max_length=10)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    pagos   = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['cliente', 'mes', 'moneda'], name='ingreso_mensual_unico')]
+        indexes = [models.Index(fields=['mes', 'moneda'])]
+
+    @staticmethod
+    def mes_de(fecha) -> date:
+        if isinstance(fecha, str):
+            fecha = date.fromisoformat(fecha)
+        return fecha.replace(day=1)
+
+    @classmethod
+    def sumar(cls, factura, fecha, delta: Decimal, n: int):
+        """Suma `delta` y `n` pagos a la fila (cliente, mes, moneda) de `factura`; la borra si queda vacía."""
+        cls._sumar(factura.cliente_id, factura.moneda, cls.mes_de(fecha), delta, n)
+
+    @classmethod
+    def mover_factura(cls, factura_id, de: dict, a: dict):
+        """La factura pasó de (cliente_id, moneda) `de` a `a`: sus pagos cambian de fila, mes a mes."""
+        por_mes = (Pago.objects.filter(factura_id=factura_id).order_by()
+                   .annotate(m=TruncMonth('fecha')).values('m')
+                   .annotate(s=models.Sum('monto'), n=models.Count('id')))
+        for r in por_mes:
+            cls._sumar(de['cliente_id'], de['moneda'], r['m'], -r['s'], -r['n'])
+            cls._sumar(a['cliente_id'], a['moneda'], r['m'], r['s'], r['n'])
+
+    @classmethod
+    def _sumar(cls, cliente_id, moneda, mes: date, delta: Decimal, n: int):
+        with transaction.atomic():
+            fila, _ = (cls.objects.select_for_update()
+                       .get_or_create(cliente_id=cliente_id, mes=mes, moneda=moneda))
+            fila.importe += delta
+            fila.pagos += n
+            if fila.pagos <= 0:
+                fila.delete()
+            else:
+                fila.save(update_fields=['importe', 'pagos'])
+
+
+class ResumenCliente(models.Model):
+    """
+    Agregado por cliente para /api/clientes/ID/resumen/. Lo mantienen
+    Factura.save() (y con eso los pagos, vía aplicar_pago), Proyecto.save() y
+    los post_delete de ambos, sumando solo la diferencia de cada escritura;
+    `manage.py rebuild_resumen_clientes` lo regenera.
+    """
+    POR_ESTADO = {Factura.ABIERTA: 'abiertas', Factura.PARCIAL: 'parciales',
+                  Factura.PAGADA: 'pagadas', Factura.ANULADA: 'anuladas'}
+
+    cliente   = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+    abiertas  = models.IntegerField(default=0)
+    parciales = models.IntegerField(default=0)
+    pagadas   = models.IntegerField(default=0)
+    anuladas  = models.IntegerField(default=0)
+    # facturas pagadas (total_pagado >= total > 0) y cuántas de ellas a tiempo (Factura.a_tiempo)
+    cobradas          = models.IntegerField(default=0)
+    cobradas_a_tiempo = models.IntegerField(default=0)
+    proyectos_activos = models.IntegerField(default=0)  # no FINALIZADO
+    # por moneda, sin anuladas: {'ARS': {'facturado': '1500.00', 'cobrado': '700.00', 'saldo': '800.00'}}
+    importes  = models.JSONField(default=dict)
+
+    IMPORTES = ('facturado', 'cobrado', 'saldo')
+
+    @classmethod
+    def _aporte_factura(cls, v: dict) -> tuple[dict, dict]:
+        """(contadores, importes por moneda) con los que una factura suma al resumen."""
+        contadores = {cls.POR_ESTADO[v['estado']]: 1, 'cobradas': int(v['a_tiempo'] is not None),
+                      'cobradas_a_tiempo': int(bool(v['a_tiempo']))}
+        if v['estado'] == Factura.ANULADA:
+            return contadores, {}
+        abierta = v['estado'] in (Factura.ABIERTA, Factura.PARCIAL)
+        return contadores, {v['moneda']: {'facturado': v['total'], 'cobrado': v['total_pagado'],
+                                          'saldo': v['total'] - v['total_pagado'] if abierta else Decimal('0')}}
+
+    @classmethod
+    def aplicar_facturas(cls, cambios):
+        """cambios: [(valores antes, valores después)] de facturas (None = no existía / se borró)."""
+        deltas = {}
+        for previo, nuevo in cambios:
+            for v, signo in ((previo, -1), (nuevo, 1)):
+                if v is None:
+                    continue
+                contadores, importes = cls._aporte_factura(v)
+                d = deltas.setdefault(v['cliente_id'], ({}, {}))
+                for k, n in contadores.items():
+                    d[0][k] = d[0].get(k, 0) + signo * n
+                for moneda, montos in importes.items():
+                    m = d[1].setdefault(moneda, dict.fromkeys(cls.IMPORTES, Decimal('0')))
+                    for k, x in montos.items():
+                        m[k] += signo * x
+        for cliente_id, (contadores, importes) in deltas.items():
+            cls._sumar(cliente_id, contadores, importes)
+
+    @classmethod
+    def aplicar_proyectos(cls, cambios):
+        deltas = {}
+        for previo, nuevo in cambios:
+            for v, signo in ((previo, -1), (nuevo, 1)):
+                if v is not None and v['estado'] != 'FINALIZADO':
+                    deltas[v['cliente_id']] = deltas.get(v['cliente_id'], 0) + signo
+        for cliente_id, n in deltas.items():
+            cls._sumar(cliente_id, {'proyectos_activos': n}, {})
+
+    @classmethod
+    def _sumar(cls, cliente_id, contadores: dict, importes: dict):
+        contadores = {k: n for k, n in contadores.items() if n}
+        importes = {m: d for m, d in importes.items() if any(d.values())}
+        if not (contadores or importes):
+            return
+        with transaction.atomic():
+            fila, _ = cls.objects.select_for_update().get_or_create(cliente_id=cliente_id)
+            for k, n in contadores.items():
+                setattr(fila, k, getattr(fila, k) + n)
+            for moneda, delta in importes.items():
+                actual = fila.importes.get(moneda, {})
+                nuevo = {k: Decimal(actual.get(k, '0')) + delta[k] for k in cls.IMPORTES}
+                if any(nuevo.values()):
+                    fila.importes[moneda] = {k: str((x + 0).quantize(Decimal('0.01'))) for k, x in nuevo.items()}
+                else:
+                    fila.importes.pop(moneda, None)  # ya no tiene facturas en esa moneda
+            fila.save()
+
+
+class AgingDiario(models.Model):
+    """
+    Foto diaria del aging por moneda (bandas 0-30/31-60/61-90/90+ de
+    facturacion/aging.py), para graficar su evolución sin recalcular el pasado.
+    La escribe `manage.py snapshot_aging` (una vez por día; --desde rellena
+    días anteriores). La lee /api/reportes/aging/serie/.
+    """
+    fecha    = models.DateField()
+    moneda   = models.CharField(max_length=10)
+    b0_30    = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    b31_60   = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    b61_90   = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    b90      = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))  # 90+
+    saldo    = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))  # total a cobrar
+    abiertas = models.PositiveIntegerField(default=0)  # facturas con saldo
+
+    BANDAS = {'0-30': 'b0_30', '31-60': 'b31_60', '61-90': 'b61_90', '90+': 'b90'}
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['fecha', 'moneda'], name='aging_diario_unico')]
+
+
+class EnvioFactura(models.Model):
+    """
+    Cola persistente de envíos de factura por email (PDF adjunto).
+    Los endpoints solo encolan; `manage.py procesar_envios` los entrega con
+    reintentos y backoff (ver facturacion/envios.py). Cada fila es además el
+    reporte de entrega de esa factura (estado, intentos, último error).
+    """
+    PENDIENTE = 'PENDIENTE'
+    ENVIANDO  = 'ENVIANDO'
+    ENVIADO   = 'ENVIADO'
+    FALLIDO   = 'FALLIDO'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (ENVIANDO,  'Enviando'),
+        (ENVIADO,   'Enviado'),
+        (FALLIDO,   'Fallido'),
+    ]
+
+    factura         = models.ForeignKey(Factura, related_name='envios', on_delete=models.CASCADE)
+    clave           = models.CharField(max_length=100, unique=True, null=True, blank=True)  # idempotency key
+    lote            = models.CharField(max_length=100, null=True, blank=True, db_index=True)  # envío masivo
+    destinatario    = models.EmailField()
+    estado          = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos        = models.PositiveSmallIntegerField(default=0)
+    max_intentos    = models.PositiveSmallIntegerField(default=5)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)  # lease del worker que lo tomó
+    tomado_por      = models.CharField(max_length=32, null=True, blank=True)  # pasada del worker que lo tomó
+    ultimo_error    = models.TextField(null=True, blank=True)
+    creado          = models.DateTimeField(auto_now_add=True)
+    enviado_en      = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['estado', 'proximo_intento'])]
+
+    def __str__(self) -> str:
+        return f'Envío {self.factura_id} → {self.destinatario} ({self.estado})'
@@ -0,0 +1,194 @@
+# facturacion/pdf_cache.py
+"""
+Cache en disco de PDFs de facturas, direccionado por contenido.
+
+Clave = sha256(HTML renderizado + backend que renderiza + versión del cache).
+Si cambia la factura, sus ítems, el cliente o el template, cambia el HTML →
+cambia la clave: nunca se sirve un PDF viejo. Con otro backend (p. ej. se
+pasó de 'texto' a wkhtmltopdf) también cambia: no se sirve (ni se responde 304
+a) un PDF hecho por el renderer anterior. Archivos: <factura_id>-<clave>.pdf, así al guardar uno nuevo
+se borran las versiones anteriores de esa factura, y las señales de
+Factura/FacturaItem lo invalidan directo.
+
+Tamaño acotado (PDF_CACHE_MAX_BYTES) con desalojo LRU por mtime (cada hit lo toca).
+El tamaño total se lleva en memoria: put() solo recorre el directorio cuando se
+pasa del tope o cada RESINCRONIZAR_CADA escrituras (otros procesos también
+escriben), así una tanda de N PDFs no hace N recorridas.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from . import pdf_utils
+
+VERSION = '1'  # subir si cambia el renderer / sus opciones
+RESINCRONIZAR_CADA = 200  # escrituras entre recorridas del directorio
+
+
+class PdfCache:
+    def __init__(self, directorio, max_bytes: int):
+        self.dir = Path(directorio)
+        self.max_bytes = max_bytes
+        self._total = None  # bytes en disco según este proceso; None = hay que recorrer
+        self._escrituras = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clave(html: str, backend: str = '') -> str:
+        return hashlib.sha256(f'{VERSION}\n{backend}\n{html}'.encode('utf-8')).hexdigest()
+
+    def ruta(self, factura_id, clave: str) -> Path:
+        return self.dir / f'{factura_id}-{clave}.pdf'
+
+    def get(self, factura_id, clave: str) -> Path | None:
+        path = self.ruta(factura_id, clave)
+        try:
+            os.utime(path)  # LRU: un hit lo vuelve "reciente"
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, factura_id, clave: str, data: bytes) -> Path:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        path = self.ruta(factura_id, clave)
+        reemplazado = self._tamano(path)
+        # escritura atómica: nadie lee un PDF a medio escribir
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+        liberado = self.invalidar(factura_id, excepto=path) + reemplazado
+        with self._lock:
+            self._escrituras += 1
+            if self._total is not None and self._escrituras % RESINCRONIZAR_CADA:
+                self._total += len(data) - liberado
+                if self._total <= self.max_bytes:
+                    return path
+            self._desalojar()
+        return path
+
+    def invalidar(self, factura_id, excepto: Path | None = None) -> int:
+        """Borra las versiones de la factura (menos `excepto`); devuelve los bytes liberados."""
+        liberado = 0
+        for p in self.dir.glob(f'{factura_id}-*.pdf'):
+            if p != excepto:
+                liberado += self._tamano(p)
+                p.unlink(missing_ok=True)
+        if liberado and excepto is None:
+            with self._lock:
+                if self._total is not None:
+                    self._total -= liberado
+        return liberado
+
+    @staticmethod
+    def _tamano(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _desalojar(self):
+        """Recorre el directorio, borra los menos usados hasta entrar en el tope y fija el total."""
+        archivos = []
+        for p in self.dir.glob('*.pdf'):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((st.st_mtime, st.st_size, p))
+        total = sum(s for _, s, _ in archivos)
+        for _, size, p in sorted(archivos, key=lambda a: a[0]):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._total = total
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache() -> PdfCache:
+    # una instancia por directorio y tope: el total en memoria se comparte entre requests
+    clave = (str(getattr(settings, 'PDF_CACHE_DIR', settings.BASE_DIR / 'pdf_cache')),
+             getattr(settings, 'PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    with _caches_lock:
+        if clave not in _caches:
+            _caches[clave] = PdfCache(*clave)
+        return _caches[clave]
+
+
+def clave_pdf(factura) -> tuple[str, str]:
+    """(HTML, clave/ETag) de la factura: solo renderiza el HTML, no genera el PDF."""
+    html = pdf_utils.render_factura_html(factura)
+    return html, PdfCache.clave(html, pdf_utils.nombre_backend())
+
+
+def obtener_pdf(factura, html: str | None = None) -> tuple[Path, str]:
+    """
+    (ruta del PDF en cache, clave/ETag). Renderiza el HTML (barato, o usa `html`
+    si ya se tiene) y solo genera el PDF si no está en cache. `factura` con
+    cliente/proyecto/items cargados.
+    """
+    cache = get_cache()
+    if html is None:
+        html = pdf_utils.render_factura_html(factura)
+    clave = cache.clave(html, pdf_utils.nombre_backend())
+    path = cache.get(factura.pk, clave)
+    if path is None:
+        path = cache.put(factura.pk, clave, pdf_utils.html_to_pdf(html))
+    return path, clave
+
+
+def obtener_pdf_bytes(factura) -> bytes:
+    for _ in range(2):
+        path, _clave = obtener_pdf(factura)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:  # desalojado entre get y lectura: se vuelve a generar
+            continue
+    return pdf_utils.render_factura_pdf_bytes(factura)
+
+
+def invalidar(factura_id):
+    get_cache().invalidar(factura_id)
+
+
+def obtener_pdfs(facturas, tanda: int = 32):
+    """
+    Generador de (factura, pdf_bytes) en el orden de `facturas` (iterable).
+    Los que están en cache se leen del disco; los que faltan de cada tanda se
+    renderizan en paralelo en el pool y quedan cacheados. Memoria acotada por `tanda`.
+    """
+    cache = get_cache()
+    lote = []
+    for f in facturas:
+        lote.append(f)
+        if len(lote) == tanda:
+            yield from _tanda(cache, lote)
+            lote = []
+    if lote:
+        yield from _tanda(cache, lote)
+
+
+def _tanda(cache: PdfCache, facturas):
+    htmls = [pdf_utils.render_factura_html(f) for f in facturas]
+    backend = pdf_utils.nombre_backend()
+    claves = [cache.clave(h, backend) for h in htmls]
+    datos = []
+    for f, clave in zip(facturas, claves):
+        path = cache.get(f.pk, clave)
+        try:
+            datos.append(path.read_bytes() if path else None)
+        except FileNotFoundError:
+            datos.append(None)
+    faltan = [i for i, d in enumerate(datos) if d is None]
+    for i, pdf in zip(faltan, pdf_utils.html_to_pdf_muchos(htmls[i] for i in faltan)):
+        cache.put(facturas[i].pk, claves[i], pdf)
+        datos[i] = pdf
+    yield from zip(facturas, datos)
@@ -0,0 +1,102 @@
+# facturacion/pdf_merge.py
+"""
+Une muchos PDFs en uno solo, escribiendo la salida a medida que llegan.
+
+No arma el documento en memoria: de cada PDF de entrada copia las páginas y
+los objetos que usan (fuentes, imágenes, contenidos) con números nuevos, los
+emite y se olvida del documento. Al final solo quedan los offsets para la
+tabla xref y la lista de páginas.
+
+Usa `pypdf` (opcional) para leer cada PDF de entrada.
+"""
+from io import BytesIO
+
+
+class PdfMergeStream:
+    def __init__(self):
+        from pypdf import PdfReader  # dependencia opcional
+        from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+        self._PdfReader, self._Array, self._Dict = PdfReader, ArrayObject, DictionaryObject
+        self._Ref, self._Name = IndirectObject, NameObject
+        self.offsets = [None, None]  # 1 = catálogo, 2 = árbol de páginas (se escriben al final)
+        self.paginas = []
+        self.pos = 0
+
+    def _out(self, data: bytes) -> bytes:
+        self.pos += len(data)
+        return data
+
+    def _nuevo_num(self) -> int:
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def _objeto(self, num: int, cuerpo: bytes) -> bytes:
+        self.offsets[num - 1] = self.pos
+        return self._out(b'%d 0 obj\n' % num + cuerpo + b'\nendobj\n')
+
+    def inicio(self) -> bytes:
+        return self._out(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def agregar(self, pdf: bytes):
+        """Genera los bytes de las páginas de `pdf` (y lo que referencian)."""
+        reader = self._PdfReader(BytesIO(pdf))
+        mapa, pendientes = {}, []
+
+        def ref(ind):
+            key = (ind.idnum, ind.generation)
+            if key not in mapa:
+                mapa[key] = self._nuevo_num()
+                pendientes.append((mapa[key], ind))
+            return self._Ref(mapa[key], 0, None)
+
+        def remapear(obj):
+            # los objetos son del reader descartable: se modifican en el lugar
+            if isinstance(obj, self._Ref):
+                # pdf=None: referencia ya renumerada (objeto directo compartido, p. ej. Resources heredados)
+                return obj if obj.pdf is None else ref(obj)
+            if isinstance(obj, self._Dict):
+                for k, v in list(dict.items(obj)):
+                    dict.__setitem__(obj, k, remapear(v))
+            elif isinstance(obj, self._Array):
+                for i, v in enumerate(list.__iter__(obj)):
+                    list.__setitem__(obj, i, remapear(v))
+            return obj
+
+        for page in reader.pages:  # ya trae Resources/MediaBox heredados del árbol original
+            num = ref(page.indirect_reference).idnum
+            self.paginas.append(num)
+            dict.__setitem__(page, self._Name('/Parent'), self._Ref(2, 0, None))
+            pendientes[-1] = (num, page)
+
+        while pendientes:
+            num, obj = pendientes.pop(0)
+            obj = obj.get_object() if isinstance(obj, self._Ref) else obj
+            remapear(obj)
+            buf = BytesIO()
+            obj.write_to_stream(buf)
+            yield self._objeto(num, buf.getvalue())
+
+    def fin(self) -> bytes:
+        kids = b' '.join(b'%d 0 R' % n for n in self.paginas)
+        out = self._objeto(2, b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(self.paginas))
+        out += self._objeto(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = self.pos
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(self.offsets) + 1)
+        out += b''.join(b'%010d 00000 n \n' % o for o in self.offsets)
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(self.offsets) + 1, xref)
+        return out
+
+
+def unir_pdfs(pdfs):
+    """
+    Iterador de bytes: el PDF unido de la secuencia `pdfs`.
+    Lanza ImportError enseguida (no al iterar) si falta pypdf.
+    """
+    m = PdfMergeStream()
+
+    def gen():
+        yield m.inicio()
+        for pdf in pdfs:
+            yield b''.join(m.agregar(pdf))
+        yield m.fin()
+    return gen()
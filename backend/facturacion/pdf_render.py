@@ -0,0 +1,341 @@
+# facturacion/pdf_render.py
+"""
+Servicio de render HTML → PDF.
+
+Un pool de procesos "calientes" (multiprocessing): cada worker importa y
+configura su backend una sola vez, y después renderiza lo que le llegue.
+- Concurrencia acotada: N procesos + a lo sumo 2N lotes en vuelo (el resto espera).
+- Timeout por render: si un lote se pasa, se matan los workers y se recrea el pool;
+  los otros lotes que estaban en ese pool fallan en el acto (PdfRenderError),
+  no se quedan esperando su propio timeout.
+- API por lotes: render_lote(htmls) viaja al worker en un solo round-trip;
+  render_muchos(htmls) reparte lotes entre todos los workers y devuelve en orden.
+
+Backends (PDF_RENDERER): 'wkhtmltopdf', 'weasyprint', 'auto' (el primero de
+esos dos que arranque, en ese orden; si ninguno, se loguea y PdfRenderError)
+o 'texto' (Python puro, sin dependencias: solo el texto del HTML). 'texto'
+solo se usa si se pide explícitamente (desarrollo/tests), nunca como respaldo.
+El backend se prueba en el proceso que crea el pool, así un renderer que no
+arranca falla en el request y no en workers que el pool relanza sin fin.
+
+Este módulo no importa Django a nivel módulo: los workers no cargan settings.
+"""
+import atexit
+import logging
+import multiprocessing
+import shutil
+import threading
+from concurrent.futures import Future, InvalidStateError
+from concurrent.futures import TimeoutError as FutureTimeout
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+
+class PdfRenderError(RuntimeError):
+    pass
+
+
+class PdfTimeout(PdfRenderError):
+    pass
+
+
+# ─────────────────────────────── backends ────────────────────────────────
+class WeasyPrintBackend:
+    nombre = 'weasyprint'
+
+    def __init__(self, base_url=None, **_):
+        from weasyprint import HTML  # import caro: una vez por worker
+        self._HTML = HTML
+        self.base_url = base_url
+
+    def render(self, html: str) -> bytes:
+        return self._HTML(string=html, base_url=self.base_url).write_pdf()
+
+
+class WkhtmltopdfBackend:
+    nombre = 'wkhtmltopdf'
+
+    def __init__(self, wkhtmltopdf_cmd=None, **_):
+        import pdfkit
+        cmd = wkhtmltopdf_cmd or shutil.which('wkhtmltopdf')
+        if not cmd or not shutil.which(cmd):
+            raise PdfRenderError(f'wkhtmltopdf no encontrado ({cmd or "PATH"})')
+        self._pdfkit = pdfkit
+        self._cfg = pdfkit.configuration(wkhtmltopdf=cmd)
+
+    def render(self, html: str) -> bytes:
+        return self._pdfkit.from_string(html, False, configuration=self._cfg,
+                                        options={'quiet': '', 'encoding': 'UTF-8'})
+
+
+class _Texto(HTMLParser):
+    BLOQUES = {'p', 'br', 'tr', 'h1', 'h2', 'h3', 'h4', 'div', 'li', 'table'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lineas, self.actual, self._ignorar = [], [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('style', 'script', 'head'):
+            self._ignorar += 1
+        elif tag in self.BLOQUES:
+            self._cortar()
+        elif tag in ('td', 'th') and self.actual:
+            self.actual.append(' | ')
+
+    def handle_endtag(self, tag):
+        if tag in ('style', 'script', 'head'):
+            self._ignorar -= 1
+        elif tag in self.BLOQUES:
+            self._cortar()
+
+    def handle_data(self, data):
+        if not self._ignorar:
+            self.actual.append(data)
+
+    def _cortar(self):
+        linea = ' '.join(''.join(self.actual).split())
+        if linea:
+            self.lineas.append(linea)
+        self.actual = []
+
+    def texto(self):
+        self._cortar()
+        return self.lineas
+
+
+class TextoBackend:
+    """PDF mínimo (Helvetica, A4) con el texto del HTML. Sin dependencias externas."""
+    nombre = 'texto'
+    LINEAS_POR_PAGINA = 60
+
+    def __init__(self, **_):
+        pass
+
+    def render(self, html: str) -> bytes:
+        p = _Texto()
+        p.feed(html)
+        lineas = p.texto() or ['']
+        paginas = [lineas[i:i + self.LINEAS_POR_PAGINA]
+                   for i in range(0, len(lineas), self.LINEAS_POR_PAGINA)]
+        return self._pdf(paginas)
+
+    @staticmethod
+    def _escapar(s: str) -> bytes:
+        s = s.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        return s.encode('cp1252', 'replace')
+
+    def _pdf(self, paginas) -> bytes:
+        n = len(paginas)
+        # objetos: 1 catálogo, 2 páginas, 3 fuente, luego (página, contenido) por página
+        objs = [b'<< /Type /Catalog /Pages 2 0 R >>',
+                b'<< /Type /Pages /Kids [' + b' '.join(b'%d 0 R' % (4 + 2 * i) for i in range(n))
+                + b'] /Count %d >>' % n,
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>']
+        for i, lineas in enumerate(paginas):
+            stream = b'BT /F1 10 Tf 13 TL 40 800 Td ' + b' '.join(
+                b'(' + self._escapar(l) + b") '" for l in lineas) + b' ET'
+            objs.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                        b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (5 + 2 * i))
+            objs.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+
+        out = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for num, obj in enumerate(objs, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % num + obj + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objs) + 1)
+        out += b''.join(b'%010d 00000 n \n' % o for o in offsets)
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objs) + 1, xref)
+        return bytes(out)
+
+
+BACKENDS = {b.nombre: b for b in (WeasyPrintBackend, WkhtmltopdfBackend, TextoBackend)}
+
+
+def crear_backend(nombre: str = 'auto', **opciones):
+    if nombre != 'auto':
+        try:
+            return BACKENDS[nombre](**opciones)
+        except KeyError:
+            raise PdfRenderError(f'Backend de PDF desconocido: {nombre}')
+    errores = []
+    for cls in (WkhtmltopdfBackend, WeasyPrintBackend):  # wkhtmltopdf primero, como siempre
+        try:
+            return cls(**opciones)
+        except Exception as e:  # no instalado / dependencias nativas rotas
+            errores.append(f'{cls.nombre}: {e}')
+    logger.error('No hay renderer de PDF utilizable (%s)', '; '.join(errores))
+    raise PdfRenderError(f'No hay renderer de PDF utilizable ({"; ".join(errores)})')
+
+
+# ─────────────────────────────── workers ─────────────────────────────────
+_backend = None
+
+
+def _iniciar_worker(nombre, opciones):
+    global _backend
+    _backend = crear_backend(nombre, **opciones)
+
+
+def _render_lote(htmls):
+    return [_backend.render(h) for h in htmls]
+
+
+# ──────────────────────────────── pool ───────────────────────────────────
+def _resolver(fut: Future, resultado=None, error=None):
+    """Completa `fut` si nadie lo hizo antes (el callback del pool y el reinicio compiten)."""
+    try:
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(resultado)
+    except InvalidStateError:
+        pass
+
+
+class RendererPool:
+    def __init__(self, backend: str = 'auto', procesos: int = 2, timeout: float = 30,
+                 lote: int = 8, start_method: str | None = None, **opciones):
+        self.backend, self.opciones = backend, opciones
+        self.start_method = start_method  # None = el default de la plataforma (fork en Linux)
+        self.procesos, self.timeout, self.lote = procesos, timeout, lote
+        self._pool = None
+        self._lock = threading.Lock()
+        self._en_vuelo = threading.BoundedSemaphore(max(procesos, 1) * 2)
+        self._pendientes = set()  # Futures de los lotes en el pool actual
+        self._local = None  # backend en proceso (procesos=0)
+        self._nombre = None  # backend concreto ('auto' resuelto), probado en este proceso
+
+    # procesos=0: se renderiza en el mismo proceso (sin pool)
+    def _backend_local(self):
+        if self._local is None:
+            self._local = crear_backend(self.backend, **self.opciones)
+            self._nombre = self._local.nombre
+        return self._local
+
+    @property
+    def nombre(self) -> str:
+        """Backend que renderiza ('auto' ya resuelto); PdfRenderError si no arranca."""
+        if self._nombre is None:
+            self._nombre = crear_backend(self.backend, **self.opciones).nombre
+        return self._nombre
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                nombre = self.nombre  # falla acá, no en el initializer de cada worker
+                ctx = multiprocessing.get_context(self.start_method)
+                self._pool = ctx.Pool(self.procesos, initializer=_iniciar_worker,
+                                      initargs=(nombre, self.opciones))
+            return self._pool
+
+    def _reiniciar(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool = None
+            # los lotes del pool viejo ya no van a liberar sus lugares ni a terminar
+            self._en_vuelo = threading.BoundedSemaphore(max(self.procesos, 1) * 2)
+            pendientes, self._pendientes = self._pendientes, set()
+        for fut in pendientes:
+            _resolver(fut, error=PdfRenderError('pool de PDF reiniciado (timeout de otro render)'))
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def _enviar(self, htmls) -> Future:
+        sem = self._en_vuelo
+        if not sem.acquire(timeout=self.timeout):
+            raise PdfTimeout('Pool de PDF saturado')
+        fut = Future()
+
+        def terminar(resultado=None, error=None):
+            sem.release()
+            with self._lock:
+                self._pendientes.discard(fut)
+            _resolver(fut, resultado, error)
+        try:
+            pool = self._get_pool()
+            with self._lock:
+                self._pendientes.add(fut)
+            pool.apply_async(_render_lote, (htmls,), callback=terminar,
+                             error_callback=lambda e: terminar(error=e))
+        except Exception:
+            with self._lock:
+                self._pendientes.discard(fut)
+            sem.release()
+            raise
+        return fut
+
+    def _esperar(self, fut, n):
+        try:
+            return fut.result(timeout=self.timeout * n)
+        except FutureTimeout:
+            self._reiniciar()  # el worker puede estar colgado: se descarta el pool entero
+            raise PdfTimeout(f'El render de PDF superó {self.timeout * n:.0f}s')
+
+    def render(self, html: str) -> bytes:
+        return self.render_lote([html])[0]
+
+    def render_lote(self, htmls) -> list[bytes]:
+        """Renderiza `htmls` en un solo worker (un round-trip)."""
+        htmls = list(htmls)
+        if not htmls:
+            return []
+        if self.procesos <= 0:
+            b = self._backend_local()
+            return [b.render(h) for h in htmls]
+        return self._esperar(self._enviar(htmls), len(htmls))
+
+    def render_muchos(self, htmls):
+        """
+        Generador: reparte `htmls` en lotes entre todos los workers y devuelve
+        los PDFs en el mismo orden. Consume la entrada de a poco (memoria acotada).
+        """
+        if self.procesos <= 0:
+            b = self._backend_local()
+            for h in htmls:
+                yield b.render(h)
+            return
+        pendientes = []  # [(Future, n)]
+        lote = []
+        for h in htmls:
+            lote.append(h)
+            if len(lote) == self.lote:
+                pendientes.append((self._enviar(lote), len(lote)))
+                lote = []
+                while len(pendientes) >= self.procesos * 2 - 1:
+                    yield from self._esperar(*pendientes.pop(0))
+        if lote:
+            pendientes.append((self._enviar(lote), len(lote)))
+        for res, n in pendientes:
+            yield from self._esperar(res, n)
+
+
+_servicio = None
+_servicio_lock = threading.Lock()
+
+
+def get_renderer() -> RendererPool:
+    """Pool único del proceso, configurado desde settings."""
+    global _servicio
+    with _servicio_lock:
+        if _servicio is None:
+            from django.conf import settings
+            _servicio = RendererPool(
+                backend=getattr(settings, 'PDF_RENDERER', 'auto'),
+                procesos=getattr(settings, 'PDF_RENDER_PROCESOS', 2),
+                timeout=getattr(settings, 'PDF_RENDER_TIMEOUT', 30),
+                start_method=getattr(settings, 'PDF_RENDER_START_METHOD', None),
+                wkhtmltopdf_cmd=getattr(settings, 'WKHTMLTOPDF_CMD', None),
+                base_url=getattr(settings, 'BASE_URL', None),
+            )
+            atexit.register(_servicio.close)
+        return _servicio
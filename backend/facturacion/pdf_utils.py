@@ -1,10 +1,21 @@
 # facturacion/pdf_utils.py
-import os, pdfkit
 from django.template.loader import render_to_string
 
-WKHTML = os.getenv('WKHTMLTOPDF_CMD', r'C:\Program Files\wkhtmltopdf\bin\wkhtmltopdf.exe')
-CFG = pdfkit.configuration(wkhtmltopdf=WKHTML)
+from .pdf_render import get_renderer
+
+def render_factura_html(factura) -> str:
+    return render_to_string('facturacion/factura.html', {'f': factura})
+
+def nombre_backend() -> str:
+    """Backend con el que se renderiza (va en la clave/ETag del cache de PDFs)."""
+    return get_renderer().nombre
+
+def html_to_pdf(html: str) -> bytes:
+    return get_renderer().render(html)
 
 def render_factura_pdf_bytes(factura, base_url: str = ''):
-    html = render_to_string('facturacion/factura.html', {'f': factura})
-    return pdfkit.from_string(html, False, configuration=CFG)
+    return html_to_pdf(render_factura_html(factura))
+
+def html_to_pdf_muchos(htmls):
+    """Generador: PDFs en el mismo orden, repartidos entre los workers del pool."""
+    return get_renderer().render_muchos(htmls)
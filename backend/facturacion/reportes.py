@@ -0,0 +1,45 @@
+# facturacion/reportes.py
+"""
+Cálculos de reportes que no son endpoints (los usan views_reportes.py).
+"""
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from . import cache_reportes
+from .models import Factura, Pago
+
+
+def calc_pagos_tiempo() -> list[dict]:
+    """
+    Una sola query agrupada por cliente:
+      {cliente_id, cliente, pagadas, a_tiempo, ratio}
+    Considera SOLO facturas pagadas (total_pagado >= total > 0, columnas materializadas).
+    'A tiempo' si los pagos con fecha <= vencimiento cubren el total, o si no tiene vencimiento.
+    Ordenado por ratio y a_tiempo descendentes.
+    """
+    dec = DecimalField(max_digits=14, decimal_places=2)
+    pagado_hasta_venc = (Pago.objects
+                         .filter(factura=OuterRef('pk'), fecha__lte=OuterRef('vencimiento'))
+                         .order_by()
+                         .values('factura')
+                         .annotate(s=Sum('monto'))
+                         .values('s'))
+    qs = (Factura.objects
+          .filter(total__gt=0, total_pagado__gte=F('total'))
+          .annotate(phv=Coalesce(Subquery(pagado_hasta_venc, output_field=dec), Value(0, output_field=dec)))
+          .values('cliente_id', 'cliente__razon_social')
+          .annotate(
+              pagadas=Count('id'),
+              a_tiempo=Count('id', filter=Q(vencimiento__isnull=True) | Q(phv__gte=F('total'))),
+          )
+          .annotate(ratio=Cast('a_tiempo', FloatField()) / Cast('pagadas', FloatField()))
+          .order_by('-ratio', '-a_tiempo', 'cliente_id'))
+
+    return [{'cliente_id': r['cliente_id'], 'cliente': r['cliente__razon_social'],
+             'pagadas': r['pagadas'], 'a_tiempo': r['a_tiempo'], 'ratio': round(r['ratio'], 3)}
+            for r in qs]
+
+
+def pagos_tiempo_ranking() -> list[dict]:
+    """calc_pagos_tiempo() cacheado (cache_reportes); lo comparten /resumen/ y /top/."""
+    return cache_reportes.obtener('pagos_tiempo', ('facturas', 'clientes'), calc_pagos_tiempo)[0]
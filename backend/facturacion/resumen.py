@@ -0,0 +1,106 @@
+# facturacion/resumen.py
+"""
+Vista 360 de un cliente:  GET /api/clientes/ID/resumen/
+
+Lo agregado (conteos por estado, importes por moneda, pagos a tiempo,
+proyectos activos) sale de la fila ResumenCliente, que se mantiene en cada
+escritura de Factura/Pago/Proyecto. El resto son lecturas por índice de
+tamaño fijo: la vencida más antigua, los proyectos activos y los últimos N
+eventos del historial. Seis queries, tenga el cliente 10 facturas o 100.000.
+
+calcular_resumenes() / calcular_a_tiempo() recalculan todo desde cero: los
+usan la migración que crea la tabla y `manage.py rebuild_resumen_clientes`.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+EVENTOS_DEFAULT = 10
+EVENTOS_MAX = 50
+
+_ABIERTAS = ('ABIERTA', 'PARCIAL')
+_POR_ESTADO = {'ABIERTA': 'abiertas', 'PARCIAL': 'parciales', 'PAGADA': 'pagadas', 'ANULADA': 'anuladas'}
+
+
+def resumen_cliente(cliente, eventos: int = EVENTOS_DEFAULT) -> dict:
+    from clientes.models import HistorialCliente
+    from clientes.serializers import HistorialClienteSerializer
+    from .models import Factura, Proyecto, ResumenCliente
+
+    r = ResumenCliente.objects.filter(cliente=cliente).first() or ResumenCliente(cliente=cliente)
+    hoy = date.today()
+    # una lectura por estado: cada una es el primer elemento del índice (cliente, estado, vencimiento)
+    vencidas = [Factura.objects.filter(cliente=cliente, estado=estado, vencimiento__lt=hoy)
+                .order_by('vencimiento', 'id').values('id', 'nro', 'vencimiento', 'moneda', 'saldo').first()
+                for estado in _ABIERTAS]
+    vencida = min(filter(None, vencidas), key=lambda f: (f['vencimiento'], f['id']), default=None)
+    if vencida:
+        vencida['dias_vencida'] = (hoy - vencida['vencimiento']).days
+    proyectos = (Proyecto.objects.filter(cliente=cliente).exclude(estado='FINALIZADO')
+                 .order_by('nombre').values('id', 'nombre', 'estado', 'fecha_inicio', 'fecha_fin_prev'))
+    historial = HistorialCliente.objects.filter(cliente=cliente).order_by('-fecha', 'id')[:eventos]
+
+    return {
+        'cliente': {'id': cliente.id, 'razon_social': cliente.razon_social,
+                    'cuit': cliente.cuit, 'estado': cliente.estado},
+        'facturas': {estado: getattr(r, campo) for estado, campo in _POR_ESTADO.items()},
+        'importes': [{'moneda': moneda, **montos} for moneda, montos in sorted(r.importes.items())],
+        'vencida_mas_antigua': vencida,
+        'pagos_a_tiempo': {
+            'pagadas': r.cobradas,
+            'a_tiempo': r.cobradas_a_tiempo,
+            'ratio': round(r.cobradas_a_tiempo / r.cobradas, 3) if r.cobradas else None,
+        },
+        'proyectos_activos': list(proyectos),
+        'historial': HistorialClienteSerializer(historial, many=True).data,
+    }
+
+
+# ─────────────────────────── recálculo completo ───────────────────────────
+def calcular_a_tiempo(Factura, Pago) -> dict:
+    """{factura_id: a_tiempo} de las facturas pagadas (criterio de Factura.calcular_a_tiempo)."""
+    dec = DecimalField(max_digits=14, decimal_places=2)
+    hasta_venc = (Pago.objects.filter(factura=OuterRef('pk'), fecha__lte=OuterRef('vencimiento'))
+                  .order_by().values('factura').annotate(s=Sum('monto')).values('s'))
+    qs = (Factura.objects.filter(total__gt=0, total_pagado__gte=F('total'))
+          .annotate(phv=Coalesce(Subquery(hasta_venc, output_field=dec), Value(0, output_field=dec)))
+          .values_list('id', 'vencimiento', 'phv', 'total'))
+    return {fid: venc is None or phv >= total for fid, venc, phv, total in qs.iterator(chunk_size=2000)}
+
+
+def calcular_resumenes(Factura, Proyecto) -> dict:
+    """{cliente_id: campos de ResumenCliente} desde las facturas y proyectos (lee Factura.a_tiempo)."""
+    resumenes = {}
+
+    def fila(cid):
+        return resumenes.setdefault(cid, {'abiertas': 0, 'parciales': 0, 'pagadas': 0, 'anuladas': 0,
+                                          'cobradas': 0, 'cobradas_a_tiempo': 0, 'proyectos_activos': 0,
+                                          'importes': {}})
+
+    por_estado = Factura.objects.order_by().values('cliente_id', 'estado').annotate(
+        n=Count('id'),
+        cobradas=Count('id', filter=Q(a_tiempo__isnull=False)),
+        a_tiempo=Count('id', filter=Q(a_tiempo=True)),
+    )
+    for r in por_estado:
+        f = fila(r['cliente_id'])
+        f[_POR_ESTADO[r['estado']]] += r['n']
+        f['cobradas'] += r['cobradas']
+        f['cobradas_a_tiempo'] += r['a_tiempo']
+
+    cero = Value(Decimal('0.00'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    importes = (Factura.objects.exclude(estado='ANULADA').order_by().values('cliente_id', 'moneda')
+                .annotate(facturado=Sum('total'), cobrado=Sum('total_pagado'),
+                          saldo=Coalesce(Sum(F('total') - F('total_pagado'), filter=Q(estado__in=_ABIERTAS)), cero)))
+    for r in importes:
+        montos = {k: Decimal(r[k]).quantize(Decimal('0.01')) for k in ('facturado', 'cobrado', 'saldo')}
+        if any(montos.values()):
+            fila(r['cliente_id'])['importes'][r['moneda']] = {k: str(x + 0) for k, x in montos.items()}
+
+    activos = (Proyecto.objects.exclude(estado='FINALIZADO').order_by()
+               .values('cliente_id').annotate(n=Count('id')))
+    for r in activos:
+        fila(r['cliente_id'])['proyectos_activos'] = r['n']
+    return resumenes
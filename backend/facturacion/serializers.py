@@ -1,8 +1,11 @@
 ## facturacion/serializers.py
 from decimal import Decimal
+from django.db import transaction
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from clientes.models import Cliente
-from .models import Proyecto, Factura, FacturaItem, Pago
+from .models import EnvioFactura, Proyecto, Factura, FacturaItem, Pago, ResumenCliente
+from . import cache_reportes
 
 # ---------------- Helpers ----------------
 def _to_null_number(v):
@@ -22,6 +25,9 @@ def _to_null_number(v):
 
 # ---------------- Items ----------------
 class FacturaItemSerializer(serializers.ModelSerializer):
+    # escribible: en el update permite identificar qué ítem se modifica
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = FacturaItem
         fields = ['id', 'descripcion', 'qty', 'precio_unit', 'impuesto']
@@ -59,12 +65,21 @@ class FacturaSerializer(serializers.ModelSerializer):
         model = Factura
         fields = [
             'id', 'nro', 'cliente', 'cliente_nombre', 'proyecto',
-            'fecha', 'vencimiento', 'estado', 'moneda', 'total', 'items'
+            'fecha', 'vencimiento', 'estado', 'moneda', 'total', 'total_pagado', 'saldo', 'items'
         ]
+        read_only_fields = ['total_pagado', 'saldo']
         extra_kwargs = {
             'proyecto': {'allow_null': True, 'required': False},  # proyecto opcional
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Recorte opcional de campos (?fields=... en el ViewSet); solo afecta la salida
+        campos = self.context.get('fields')
+        if campos is not None:
+            for name in set(self.fields) - set(campos):
+                self.fields.pop(name)
+
     # Coherencia: si hay proyecto, debe pertenecer al mismo cliente
     def validate(self, data):
         cliente = data.get('cliente') or getattr(self.instance, 'cliente', None)
@@ -77,26 +92,184 @@ class FacturaSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        items = validated_data.pop('items', [])
+        items = [FacturaItem(**{k: v for k, v in it.items() if k != 'id'})
+                 for it in validated_data.pop('items', [])]
+        # total calculado antes del INSERT: sin UPDATE posterior y el post_save ya lo ve
+        validated_data['total'] = Factura.calcular_total(items)
         factura = Factura.objects.create(**validated_data)
         for it in items:
-            # impuesto puede ser None
-            FacturaItem.objects.create(factura=factura, **it)
-        factura.recalc_total()
+            it.factura = factura
+        FacturaItem.objects.bulk_create(items)
         return factura
 
     def update(self, instance, validated_data):
         items = validated_data.pop('items', None)
-        for k, v in validated_data.items():
-            setattr(instance, k, v)
-        instance.save()
-        if items is not None:
-            instance.items.all().delete()
-            for it in items:
-                FacturaItem.objects.create(factura=instance, **it)
-        instance.recalc_total()
+        with transaction.atomic():
+            # total_pagado lo mantienen los pagos: se relee con la fila bloqueada (un pago
+            # confirmado durante el request no se pisa) y solo se escriben los campos recibidos
+            instance.total_pagado = (Factura.objects.select_for_update()
+                                     .values_list('total_pagado', flat=True).get(pk=instance.pk))
+            for k, v in validated_data.items():
+                setattr(instance, k, v)
+            campos = {Factura._meta.get_field(k).name for k in validated_data}
+            if items is not None:
+                instance.total = Factura.calcular_total(self._sync_items(instance, items))
+                campos.add('total')
+            if campos:
+                instance.save(update_fields=campos)  # único UPDATE de la factura (incluye total)
         return instance
 
+    _ITEM_CAMPOS = ('descripcion', 'qty', 'precio_unit', 'impuesto')
+
+    def _sync_items(self, factura, items):
+        """
+        Aplica sólo la diferencia entre los ítems actuales y los recibidos:
+          - con `id`: se actualizan los campos que cambiaron (bulk_update),
+          - sin `id`: si coincide exactamente con uno existente se conserva,
+            si no se inserta (bulk_create),
+          - los existentes que no aparecen se borran.
+        Devuelve la lista final de ítems (para calcular el total en memoria).
+        """
+        existentes = {it.id: it for it in factura.items.all()}
+        por_contenido = {}
+        for it in existentes.values():
+            por_contenido.setdefault(tuple(getattr(it, c) for c in self._ITEM_CAMPOS), []).append(it)
+
+        sin_id = []
+        finales, cambiados, campos, usados = [], [], set(), set()
+        for data in items:
+            iid = data.get('id')
+            if iid is None:
+                sin_id.append(data)
+                continue
+            it = existentes.get(iid)
+            if it is None or iid in usados:
+                raise serializers.ValidationError({'items': [f'El ítem {iid} no pertenece a la factura.']})
+            usados.add(iid)
+            diff = [c for c in self._ITEM_CAMPOS if c in data and getattr(it, c) != data[c]]
+            for c in diff:
+                setattr(it, c, data[c])
+            if diff:
+                cambiados.append(it)
+                campos.update(diff)
+            finales.append(it)
+
+        nuevos = []
+        for data in sin_id:
+            clave = tuple(data.get(c) for c in self._ITEM_CAMPOS)
+            candidatos = [it for it in por_contenido.get(clave, []) if it.id not in usados]
+            if candidatos:
+                usados.add(candidatos[0].id)
+                finales.append(candidatos[0])
+            else:
+                nuevos.append(FacturaItem(factura=factura, **{k: v for k, v in data.items() if k != 'id'}))
+
+        borrar = [iid for iid in existentes if iid not in usados]
+        if borrar:
+            FacturaItem.objects.filter(id__in=borrar).delete()
+        if cambiados:
+            FacturaItem.objects.bulk_update(cambiados, sorted(campos))
+        if nuevos:
+            FacturaItem.objects.bulk_create(nuevos)
+        return finales + nuevos
+
+
+class _PKPrecargado(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField que resuelve contra un dict precargado (una query para todo el lote)."""
+    def __init__(self, objetos: dict, **kwargs):
+        self.objetos = objetos
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.objetos[int(data)]
+        except (KeyError, TypeError, ValueError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+def validar_facturas_bulk(payloads: list, context=None):
+    """
+    Valida un lote con las mismas reglas que FacturaSerializer, pero:
+      - reutiliza UNA instancia del serializer (no reconstruye fields por factura),
+      - clientes/proyectos se cargan con un in_bulk cada uno,
+      - unicidad de `nro` en una sola query (y también dentro del lote).
+    Devuelve (validas: list[validated_data], errores: list[{index, nro, errores}]).
+    """
+    def _ids(key):
+        out = set()
+        for p in payloads:
+            try:
+                out.add(int(p.get(key)))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        return out
+
+    child = FacturaSerializer(context=context or {})
+    child.fields['cliente'] = _PKPrecargado(Cliente.objects.in_bulk(_ids('cliente')),
+                                            queryset=Cliente.objects.all())
+    child.fields['proyecto'] = _PKPrecargado(Proyecto.objects.in_bulk(_ids('proyecto')),
+                                             queryset=Proyecto.objects.all(), allow_null=True, required=False)
+    child.fields['nro'].validators = [v for v in child.fields['nro'].validators
+                                      if not isinstance(v, UniqueValidator)]
+
+    nros = [p.get('nro') for p in payloads if isinstance(p, dict)]
+    existentes = set(Factura.objects.filter(nro__in=nros).values_list('nro', flat=True))
+
+    validas, errores, vistos = [], [], set()
+    for i, payload in enumerate(payloads):
+        nro = payload.get('nro') if isinstance(payload, dict) else None
+        try:
+            data = child.run_validation(payload)
+        except serializers.ValidationError as e:
+            errores.append({'index': i, 'nro': nro, 'errores': e.detail})
+            continue
+        nro = data['nro']
+        if nro in existentes or nro in vistos:
+            msg = 'Ya existe una factura con este nro.' if nro in existentes else 'Repetido dentro del lote.'
+            errores.append({'index': i, 'nro': nro, 'errores': {'nro': [msg]}})
+            continue
+        vistos.add(nro)
+        validas.append(data)
+    return validas, errores
+
+
+def bulk_create_facturas(validated: list[dict]) -> list[Factura]:
+    """
+    Alta masiva a partir de `validated_data` ya validados por FacturaSerializer.
+    Totales calculados en memoria → INSERT de facturas, de ítems y de historial
+    con un bulk_create cada uno, más el ResumenCliente de cada cliente del lote
+    (sin post_save por fila).
+    Llamar dentro de transaction.atomic().
+    """
+    from clientes import historial
+
+    facturas, items_por_factura = [], []
+    for data in validated:
+        data = dict(data)
+        items = [FacturaItem(**{k: v for k, v in it.items() if k != 'id'}) for it in data.pop('items', [])]
+        f = Factura(**data)
+        f.total = Factura.calcular_total(items)
+        f.saldo = f.total  # bulk_create no pasa por Factura.save()
+        facturas.append(f)
+        items_por_factura.append(items)
+
+    Factura.objects.bulk_create(facturas)
+    ResumenCliente.aplicar_facturas([(None, f._valores()) for f in facturas])
+
+    todos = []
+    for f, items in zip(facturas, items_por_factura):
+        for it in items:
+            it.factura = f
+            todos.append(it)
+    FacturaItem.objects.bulk_create(todos)
+
+    cache_reportes.invalidar('facturas')  # bulk_create no emite post_save
+
+    # equivale a clientes.signals.log_factura (se escribe al commit, en un INSERT)
+    for f in facturas:
+        historial.registrar(f.cliente_id, 'FACTURA_CREADA', f'Factura {f.nro} por {f.total}', origen=f)
+    return facturas
+
 # ---------------- Proyecto ----------------
 class ProyectoSerializer(serializers.ModelSerializer):
     cliente = serializers.PrimaryKeyRelatedField(queryset=Cliente.objects.all())
@@ -105,6 +278,14 @@ class ProyectoSerializer(serializers.ModelSerializer):
         model = Proyecto
         fields = ['id', 'cliente', 'nombre', 'estado', 'fecha_inicio', 'fecha_fin_prev']
 
+# ---------------- Envíos (cola de email) ----------------
+class EnvioFacturaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EnvioFactura
+        fields = ['id', 'factura', 'clave', 'lote', 'destinatario', 'estado', 'intentos', 'max_intentos',
+                  'proximo_intento', 'ultimo_error', 'creado', 'enviado_en']
+        read_only_fields = fields
+
 # ---------------- Pago ----------------
 class PagoSerializer(serializers.ModelSerializer):
     class Meta:
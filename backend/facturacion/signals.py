@@ -0,0 +1,56 @@
+# facturacion/signals.py
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import pdf_cache
+from clientes.models import Cliente
+from .models import Factura, FacturaItem, IngresoMensual, Pago, Proyecto, ResumenCliente
+from . import cache_reportes
+
+
+@receiver(post_delete, sender=Pago)
+def descontar_pago(sender, instance, **kwargs):
+    # El borrado (también QuerySet.delete()) ya corre dentro de una transacción;
+    # la factura no puede haberse borrado antes (PROTECT).
+    f = Factura.aplicar_pago(instance.factura_id, -instance.monto)
+    IngresoMensual.sumar(f, instance.fecha, -instance.monto, -1)
+
+
+@receiver(pre_delete, sender=Factura)
+@receiver(pre_delete, sender=Proyecto)
+def leer_antes_de_borrar(sender, instance, origin=None, **kwargs):
+    # instance.delete(): la instancia puede estar vieja. En QuerySet.delete()
+    # las filas las acaba de leer el Collector.
+    if origin is instance:
+        instance._en_base = instance._valores_en_base()
+
+
+@receiver(post_delete, sender=Factura)
+@receiver(post_delete, sender=Proyecto)
+def descontar_del_resumen(sender, instance, origin=None, **kwargs):
+    # borrar el cliente borra sus proyectos (CASCADE) y también su ResumenCliente
+    if isinstance(origin, Cliente) or getattr(origin, 'model', None) is Cliente:
+        return
+    previo = instance.__dict__.pop('_en_base', None) or instance._valores()
+    if sender is Factura:
+        ResumenCliente.aplicar_facturas([(previo, None)])
+    else:
+        ResumenCliente.aplicar_proyectos([(previo, None)])
+
+
+@receiver([post_save, post_delete], sender=Factura)
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_reportes(sender, **kwargs):
+    cache_reportes.invalidar('facturas')
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+def invalidar_reportes_clientes(sender, **kwargs):
+    cache_reportes.invalidar('clientes')  # pagos-tiempo muestra la razón social
+
+
+@receiver([post_save, post_delete], sender=Factura)
+@receiver([post_save, post_delete], sender=FacturaItem)
+def invalidar_pdf(sender, instance, **kwargs):
+    # la clave ya cambia con el HTML; esto solo libera el disco enseguida
+    pdf_cache.invalidar(instance.pk if sender is Factura else instance.factura_id)
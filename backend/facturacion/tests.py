@@ -1,3 +1,1178 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.core import mail
+from django.conf import settings
+from django.core.cache import caches
+from django.core.mail import get_connection
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from . import cache_reportes
+from .envios import LimitePorDominio, _por_delante, encolar_envio, procesar_pendientes
+from . import pdf_cache
+from .pdf_render import (PdfRenderError, RendererPool, TextoBackend, WeasyPrintBackend, WkhtmltopdfBackend,
+                         crear_backend)
+from .serializers import FacturaSerializer
+from .models import AgingDiario, EnvioFactura, Factura, FacturaItem, IngresoMensual, Pago, Proyecto
+
+
+def _crear_facturas(cliente, n, items_por_factura=2, desde=0):
+    facturas = Factura.objects.bulk_create(
+        [Factura(cliente=cliente, nro=f'T-{i:05d}', total=Decimal('10.00'))
+         for i in range(desde, desde + n)]
+    )
+    FacturaItem.objects.bulk_create([
+        FacturaItem(factura=f, descripcion=f'item {j}', qty=Decimal('1'), precio_unit=Decimal('5'))
+        for f in facturas for j in range(items_por_factura)
+    ])
+    return facturas
+
+
+class FacturaListQueriesTest(TestCase):
+    """El listado de facturas no puede escalar en queries con la cantidad de filas (N+1)."""
+
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+
+    def _queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.api.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries), resp.json()
+
+    def test_query_count_constante(self):
+        _crear_facturas(self.cliente, 1)
+        q1, data = self._queries('/api/facturas/')
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]['cliente_nombre'], 'ACME')
+        self.assertEqual(len(data[0]['items']), 2)
+
+        _crear_facturas(self.cliente, 499, desde=1)
+        q500, data = self._queries('/api/facturas/')
+        self.assertEqual(len(data), 500)
+        self.assertEqual(q1, q500)
+        self.assertLessEqual(q500, 2)  # facturas+cliente (JOIN) y prefetch de items
+
+    def test_fields_sin_items_no_prefetchea(self):
+        _crear_facturas(self.cliente, 20)
+        q, data = self._queries('/api/facturas/?fields=id,nro,total')
+        self.assertEqual(q, 1)
+        self.assertEqual(set(data[0]), {'id', 'nro', 'total'})
+
+    def test_expand_items(self):
+        _crear_facturas(self.cliente, 3)
+        q, data = self._queries('/api/facturas/?fields=id,nro&expand=items')
+        self.assertEqual(q, 2)
+        self.assertEqual(set(data[0]), {'id', 'nro', 'items'})
+
+
+def recorrer_paginas(test, url):
+    """ids siguiendo `next` hasta el final y los mismos de vuelta siguiendo `previous`."""
+    ida, ultima = [], None
+    while url:
+        r = test.api.get(url)
+        test.assertEqual(r.status_code, 200, url)
+        ultima = r.json()
+        ida += [x['id'] for x in ultima['results']]
+        url = ultima['next']
+    vuelta = [x['id'] for x in ultima['results']]
+    url = ultima['previous']
+    while url:
+        pagina = test.api.get(url).json()
+        vuelta = [x['id'] for x in pagina['results']] + vuelta
+        url = pagina['previous']
+    return ida, vuelta
+
+
+def cursor_de(datos) -> str:
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alfa = Cliente.objects.create(razon_social='Alfa', cuit='20-11111111-1')
+        cls.beta = Cliente.objects.create(razon_social='Beta', cuit='20-22222222-2')
+        # 3 fechas y 5 vencimientos para 23 facturas: muchos empates; 1 de cada 4 sin vencimiento
+        Factura.objects.bulk_create([
+            Factura(cliente=cls.alfa if i % 2 else cls.beta, nro=f'K-{i:02d}', fecha=date(2025, 1, 1 + i % 3),
+                    vencimiento=None if i % 4 == 0 else date(2025, 2, 1 + i % 5), total=Decimal(i % 3 + 1),
+                    estado='PAGADA' if i % 5 == 0 else 'ABIERTA')
+            for i in range(23)
+        ])
+
+    def setUp(self):
+        self.api = APIClient()
+
+    def _verificar(self, query, esperados):
+        ida, vuelta = recorrer_paginas(self, f'/api/facturas/?page_size=4&{query}')
+        self.assertEqual(len(ida), len(set(ida)))
+        self.assertEqual(set(ida), set(esperados))
+        self.assertEqual(vuelta, ida)
+        por_id = Factura.objects.in_bulk(ida)
+        return [por_id[i] for i in ida]
+
+    def test_orden_default_con_empates(self):
+        facturas = self._verificar('', Factura.objects.values_list('id', flat=True))
+        claves = [(f.fecha, f.id) for f in facturas]
+        self.assertEqual(claves, sorted(claves, reverse=True))
+
+    def test_columna_nullable(self):
+        todas = Factura.objects.values_list('id', flat=True)
+        for orden in ('vencimiento', '-vencimiento'):
+            with self.subTest(orden=orden):
+                facturas = self._verificar(f'ordering={orden}', todas)
+                con = [f.vencimiento for f in facturas if f.vencimiento is not None]
+                self.assertEqual(con, sorted(con, reverse=orden.startswith('-')))
+                # los NULL van todos juntos al final
+                nulos = [f.vencimiento is None for f in facturas]
+                self.assertEqual(nulos, sorted(nulos))
+
+    def test_con_ordering_search_y_filtros(self):
+        esperados = Factura.objects.filter(cliente=self.alfa, estado='ABIERTA', fecha__gte=date(2025, 1, 2))
+        facturas = self._verificar(f'ordering=-total&search=Alfa&estado=abierta&cliente={self.alfa.pk}'
+                                   '&desde=2025-01-02', esperados.values_list('id', flat=True))
+        totales = [f.total for f in facturas]
+        self.assertEqual(totales, sorted(totales, reverse=True))
+
+    def test_filtros_invalidos(self):
+        for url, param, valor in (('facturas', 'desde', '2024-13-45'), ('facturas', 'hasta', 'ayer'),
+                                  ('facturas', 'cliente', 'abc'), ('pagos', 'desde', '2024-02-30'),
+                                  ('pagos', 'factura', '1.5'), ('pagos', 'cliente', 'abc')):
+            with self.subTest(url=url, param=param):
+                resp = self.api.get(f'/api/{url}/?{param}={valor}')
+                self.assertEqual(resp.status_code, 400)
+                self.assertIn(param, resp.json())
+
+    def test_cursor_adulterado(self):
+        for cursor in ('basura', cursor_de({'p': ['no-es-fecha', 1]}), cursor_de({'p': ['2025-01-01']}),
+                       cursor_de({'p': ['2025-01-01', None]}), cursor_de({'p': [{'a': 1}, 'x']}),
+                       cursor_de(['no', 'es', 'dict'])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.api.get(f'/api/facturas/?cursor={cursor}').status_code, 404)
+
+
+class FacturaBulkTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+
+    def _payload(self, nro, **extra):
+        return {'cliente': self.cliente.pk, 'nro': nro, 'fecha': '2025-01-01',
+                'items': [{'descripcion': 'a', 'qty': '2', 'precio_unit': '100', 'impuesto': '21'},
+                          {'descripcion': 'b', 'qty': '1', 'precio_unit': '50'}],
+                **extra}
+
+    def test_crea_lote_con_totales_e_historial(self):
+        with self.captureOnCommitCallbacks(execute=True):  # el historial se escribe al commit
+            resp = self.api.post('/api/facturas/bulk/', [self._payload('B-1'), self._payload('B-2')],
+                                 format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual(resp.json()['creadas'], 2)
+        f = Factura.objects.get(nro='B-1')
+        self.assertEqual(f.total, Decimal('292.00'))
+        self.assertEqual(f.items.count(), 2)
+        self.assertEqual(self.cliente.historial.filter(tipo='FACTURA_CREADA').count(), 2)
+        self.assertIn('292', self.cliente.historial.filter(tipo='FACTURA_CREADA').first().nota)
+
+    def test_errores_por_factura_todo_o_nada(self):
+        lote = [self._payload('B-1'), self._payload('B-1'), self._payload('B-3', cliente=99999)]
+        resp = self.api.post('/api/facturas/bulk/', lote, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual([e['index'] for e in resp.json()['errores']], [1, 2])
+        self.assertFalse(Factura.objects.exists())
+
+    def test_parcial_inserta_las_validas(self):
+        lote = [self._payload('B-1'), self._payload('B-2', items=[{'descripcion': 'x', 'qty': '0', 'precio_unit': '1'}])]
+        resp = self.api.post('/api/facturas/bulk/?parcial=1', lote, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['creadas'], 1)
+        self.assertEqual(resp.json()['errores'][0]['index'], 1)
+        self.assertEqual(list(Factura.objects.values_list('nro', flat=True)), ['B-1'])
+
+
+class FacturaTotalTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.items = [{'descripcion': 'a', 'qty': '3', 'precio_unit': '33.33', 'impuesto': '10.5'},
+                      {'descripcion': 'b', 'qty': '1', 'precio_unit': '0.01'}]
+
+    def test_calcular_total_igual_a_recalc(self):
+        items = [FacturaItem(qty=Decimal('3'), precio_unit=Decimal('33.33'), impuesto=Decimal('10.5')),
+                 FacturaItem(qty=Decimal('1'), precio_unit=Decimal('0.01'))]
+        dicts = [{'qty': Decimal('3'), 'precio_unit': Decimal('33.33'), 'impuesto': Decimal('10.5')},
+                 {'qty': Decimal('1'), 'precio_unit': Decimal('0.01'), 'impuesto': None}]
+        self.assertEqual(Factura.calcular_total(items), Factura.calcular_total(dicts))
+        f = Factura.objects.create(cliente=self.cliente, nro='X-1')
+        for it in items:
+            it.factura = f
+            it.save()
+        f.recalc_total()
+        f.refresh_from_db()
+        self.assertEqual(f.total, Factura.calcular_total(items))
+
+    def test_create_sin_update_de_total(self):
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            resp = self.api.post('/api/facturas/', {'cliente': self.cliente.pk, 'nro': 'X-1', 'items': self.items},
+                                 format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "facturacion_factura"')]
+        self.assertEqual(updates, [])
+        f = Factura.objects.get(nro='X-1')
+        self.assertEqual(f.total, Factura.calcular_total(f.items.all()))
+        self.assertIn(str(f.total), self.cliente.historial.get(tipo='FACTURA_CREADA').nota)
+
+    def test_update_solo_escribe_la_diferencia(self):
+        resp = self.api.post('/api/facturas/', {'cliente': self.cliente.pk, 'nro': 'X-1', 'items': self.items},
+                             format='json')
+        data = resp.json()
+        a, b = data['items']
+        a['qty'] = '4'
+        nuevo = {'descripcion': 'c', 'qty': '1', 'precio_unit': '10'}
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.api.patch(f'/api/facturas/{data["id"]}/', {'items': [a, nuevo]}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        sqls = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(sum(s.startswith('UPDATE "facturacion_factura"') for s in sqls), 1)
+        self.assertEqual(sum(s.startswith('DELETE') for s in sqls), 1)  # sólo b
+
+        f = Factura.objects.get(pk=data['id'])
+        ids = set(f.items.values_list('id', flat=True))
+        self.assertIn(a['id'], ids)
+        self.assertNotIn(b['id'], ids)
+        self.assertEqual(f.total, Decimal('157.32'))  # 4*33.33*1.105 + 10
+
+    def test_update_sin_ids_conserva_items_iguales(self):
+        resp = self.api.post('/api/facturas/', {'cliente': self.cliente.pk, 'nro': 'X-1', 'items': self.items},
+                             format='json')
+        ids = [it['id'] for it in resp.json()['items']]
+        resp = self.api.patch(f'/api/facturas/{resp.json()["id"]}/', {'items': self.items}, format='json')
+        self.assertEqual([it['id'] for it in resp.json()['items']], ids)
+
+
+class SaldoMaterializadoTest(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.f = Factura.objects.create(cliente=self.cliente, nro='S-1', total=Decimal('100.00'))
+        self.g = Factura.objects.create(cliente=self.cliente, nro='S-2', total=Decimal('50.00'))
+
+    def _f(self, f):
+        f.refresh_from_db()
+        return f.total_pagado, f.saldo, f.estado
+
+    def test_alta_edicion_y_borrado_de_pagos(self):
+        self.assertEqual(self._f(self.f), (Decimal('0.00'), Decimal('100.00'), Factura.ABIERTA))
+        p = Pago.objects.create(factura=self.f, monto=Decimal('40.00'))
+        self.assertEqual(self._f(self.f), (Decimal('40.00'), Decimal('60.00'), Factura.PARCIAL))
+        p.monto = Decimal('100.00')
+        p.save()
+        self.assertEqual(self._f(self.f), (Decimal('100.00'), Decimal('0.00'), Factura.PAGADA))
+        p.factura = self.g
+        p.save()
+        self.assertEqual(self._f(self.f), (Decimal('0.00'), Decimal('100.00'), Factura.ABIERTA))
+        self.assertEqual(self._f(self.g), (Decimal('100.00'), Decimal('-50.00'), Factura.PAGADA))
+        Pago.objects.filter(pk=p.pk).delete()
+        self.assertEqual(self._f(self.g), (Decimal('0.00'), Decimal('50.00'), Factura.ABIERTA))
+
+    def test_rebuild_saldos(self):
+        Pago.objects.create(factura=self.f, monto=Decimal('30.00'))
+        Factura.objects.filter(pk=self.f.pk).update(total_pagado=0, saldo=0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_saldos', '--verify', stdout=StringIO())
+        call_command('rebuild_saldos', stdout=StringIO())
+        self.assertEqual(self._f(self.f), (Decimal('30.00'), Decimal('70.00'), Factura.PARCIAL))
+        call_command('rebuild_saldos', '--verify', stdout=StringIO())
+
+    def test_editar_no_pisa_pagos_concurrentes(self):
+        Pago.objects.create(factura=self.f, monto=Decimal('100.00'))
+        cargada = Factura.objects.get(pk=self.f.pk)  # lo que leyó el request al empezar
+        Pago.objects.create(factura=self.f, monto=Decimal('50.00'))  # confirmado mientras tanto
+        ser = FacturaSerializer(cargada, data={'vencimiento': '2025-03-01'}, partial=True)
+        ser.is_valid(raise_exception=True)
+        ser.save()
+        self.assertEqual(self._f(self.f), (Decimal('150.00'), Decimal('-50.00'), Factura.PAGADA))
+        self.assertEqual(self.f.vencimiento, date(2025, 3, 1))
+
+    def test_cambio_de_total_recalcula_estado(self):
+        Pago.objects.create(factura=self.f, monto=Decimal('100.00'))
+        self.assertEqual(self._f(self.f)[2], Factura.PAGADA)
+        ser = FacturaSerializer(self.f, data={'items': [{'descripcion': 'más', 'qty': '2', 'precio_unit': '100'}]},
+                                partial=True)
+        ser.is_valid(raise_exception=True)
+        ser.save()
+        self.assertEqual(self._f(self.f), (Decimal('100.00'), Decimal('100.00'), Factura.PARCIAL))
+        self.assertEqual(self.cliente.resumen.importes['ARS']['saldo'], '150.00')  # 100 de S-1 + 50 de S-2
+
+        # una anulada no cambia de estado por el total
+        self.g.estado = Factura.ANULADA
+        self.g.save()
+        self.g.total = Decimal('80.00')
+        self.g.save(update_fields=['total'])
+        self.assertEqual(self._f(self.g)[2], Factura.ANULADA)
+
+
+def planes_con_full_scan(api, url):
+    """
+    Ejecuta GET `url`, captura sus queries y corre EXPLAIN QUERY PLAN (SQLite) sobre
+    cada una. Devuelve las líneas del plan que son un SCAN sin índice o un sort en
+    B-tree temporal (o sea, que no aprovechan ningún índice).
+    """
+    with CaptureQueriesContext(connection) as ctx:
+        resp = api.get(url)
+    assert resp.status_code == 200, (url, resp.status_code)
+    malos = []
+    with connection.cursor() as cur:
+        for q in ctx.captured_queries:
+            sql = q['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            cur.execute('EXPLAIN QUERY PLAN ' + sql)
+            for row in cur.fetchall():
+                detalle = row[-1]
+                sin_indice = detalle.startswith('SCAN ') and 'USING' not in detalle
+                if sin_indice or 'TEMP B-TREE' in detalle:
+                    malos.append(f'{detalle}  <=  {sql[:160]}')
+    return malos
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN es de SQLite')
+class QueryPlanTest(TestCase):
+    """Los endpoints de listado/reportes deben resolverse con índices, no con full scans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        Proyecto.objects.create(cliente=cls.cliente, nombre='P1')
+        f = Factura.objects.create(cliente=cls.cliente, nro='Q-1', total=Decimal('100.00'),
+                                   vencimiento=date(2025, 1, 31))
+        FacturaItem.objects.create(factura=f, descripcion='a', qty=1, precio_unit=100)
+        Pago.objects.create(factura=f, monto=Decimal('10.00'))
+
+    def setUp(self):
+        caches[settings.REPORTES_CACHE].clear()  # que los reportes lleguen a la base
+        self.api = APIClient()
+
+    def test_endpoints_usan_indices(self):
+        cid = self.cliente.pk
+        urls = [
+            '/api/facturas/',
+            '/api/facturas/?page_size=10',
+            '/api/pagos/',
+            '/api/clientes/',
+            f'/api/proyectos/?cliente={cid}',
+            f'/api/clientes/{cid}/proyectos/',
+            f'/api/clientes/{cid}/historial/',
+            f'/api/clientes/{cid}/resumen/',
+            '/api/clientes/historial-global/',
+            '/api/reportes/aging/',
+            '/api/reportes/aging/?as_of=2025-02-15',
+            '/api/reportes/aging/serie/?hasta=2025-02-15',
+            '/api/reportes/estado-cartera/',
+            '/api/reportes/ingresos-por-mes/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(planes_con_full_scan(self.api, url), [])
+
+
+class IngresoMensualTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.f = Factura.objects.create(cliente=self.cliente, nro='I-1', total=Decimal('1000.00'))
+        self.usd = Factura.objects.create(cliente=self.cliente, nro='I-2', total=Decimal('1000.00'), moneda='USD')
+
+    def _rollup(self):
+        return {(r.mes.isoformat(), r.moneda): (r.importe, r.pagos) for r in IngresoMensual.objects.all()}
+
+    def test_rollup_incremental(self):
+        p = Pago.objects.create(factura=self.f, fecha=date(2025, 3, 10), monto=Decimal('100.00'))
+        Pago.objects.create(factura=self.f, fecha=date(2025, 3, 20), monto=Decimal('50.00'))
+        Pago.objects.create(factura=self.usd, fecha=date(2025, 3, 20), monto=Decimal('7.00'))
+        self.assertEqual(self._rollup(), {('2025-03-01', 'ARS'): (Decimal('150.00'), 2),
+                                          ('2025-03-01', 'USD'): (Decimal('7.00'), 1)})
+        p.fecha = date(2025, 4, 1)
+        p.save()
+        self.assertEqual(self._rollup()[('2025-04-01', 'ARS')], (Decimal('100.00'), 1))
+        self.assertEqual(self._rollup()[('2025-03-01', 'ARS')], (Decimal('50.00'), 1))
+        p.delete()
+        self.assertNotIn(('2025-04-01', 'ARS'), self._rollup())
+        call_command('rebuild_ingresos_mensuales', '--verify', stdout=StringIO())
+
+    def test_factura_cambia_de_cliente_y_moneda(self):
+        otro = Cliente.objects.create(razon_social='Otro', cuit='20-99999999-9')
+        p = Pago.objects.create(factura=self.f, fecha=date(2025, 3, 10), monto=Decimal('100.00'))
+        self.f.refresh_from_db()
+        self.f.cliente, self.f.moneda = otro, 'USD'
+        self.f.save()
+        Pago.objects.create(factura=self.f, fecha=date(2025, 3, 20), monto=Decimal('50.00'))
+        p.delete()
+        filas = {(r.cliente_id, r.moneda): (r.importe, r.pagos) for r in IngresoMensual.objects.all()}
+        self.assertEqual(filas, {(otro.pk, 'USD'): (Decimal('50.00'), 1)})
+        call_command('rebuild_ingresos_mensuales', '--verify', stdout=StringIO())
+
+    def test_endpoint_ventana_y_moneda(self):
+        Pago.objects.create(factura=self.f, fecha=date(2025, 1, 5), monto=Decimal('10.00'))
+        Pago.objects.create(factura=self.usd, fecha=date(2025, 2, 5), monto=Decimal('3.00'))
+        data = self.api.get('/api/reportes/ingresos-por-mes/?desde=2024-12&hasta=2025-02').json()
+        self.assertEqual(data, [{'mes': '2024-12-01', 'importe': 0.0},
+                                {'mes': '2025-01-01', 'importe': 10.0},
+                                {'mes': '2025-02-01', 'importe': 3.0}])
+        data = self.api.get('/api/reportes/ingresos-por-mes/?desde=2025-01&hasta=2025-02&moneda=USD').json()
+        self.assertEqual([r['importe'] for r in data], [0.0, 3.0])
+        self.assertEqual(len(self.api.get('/api/reportes/ingresos-por-mes/').json()), 12)
+        self.assertEqual(self.api.get('/api/reportes/ingresos-por-mes/?desde=2025-13').status_code, 400)
+
+
+class AgingTest(TestCase):
+    def setUp(self):
+        caches[settings.REPORTES_CACHE].clear()
+        self.api = APIClient()
+        self.a = Cliente.objects.create(razon_social='A', cuit='20-11111111-1')
+        self.b = Cliente.objects.create(razon_social='B', cuit='20-22222222-2')
+        self.hoy = date.today()
+        crear = lambda cli, nro, total, dias, **kw: Factura.objects.create(
+            cliente=cli, nro=nro, total=Decimal(total), fecha=self.hoy - timedelta(days=120),
+            vencimiento=None if dias is None else self.hoy - timedelta(days=dias), **kw)
+        crear(self.a, 'AG-1', '0.10', 10)
+        crear(self.a, 'AG-2', '0.20', 30)
+        crear(self.a, 'AG-sin-venc', '5.00', None)  # antes rompía /aging/
+        crear(self.a, 'AG-3', '40.00', 31)
+        crear(self.b, 'AG-4', '100.00', 75, moneda='USD')
+        crear(self.b, 'AG-5', '7.00', 91)
+        self.pagada = crear(self.b, 'AG-6', '50.00', 100)
+        Pago.objects.create(factura=self.pagada, fecha=self.hoy - timedelta(days=5), monto=Decimal('50.00'))
+        crear(self.b, 'AG-anulada', '9.00', 100, estado='ANULADA')
+
+    def test_ambas_urls_mismo_resultado(self):
+        esperado = {'0-30': 5.3, '31-60': 40.0, '61-90': 100.0, '90+': 7.0}
+        self.assertEqual(self.api.get('/api/reportes/aging/').json(), esperado)
+        self.assertEqual(self.api.get('/api/reportes/estado-cartera/').json(), esperado)
+
+    def test_decimal(self):
+        from .aging import aging
+        self.assertEqual(aging()['0-30'], Decimal('5.30'))
+
+    def test_bandas_y_agrupado(self):
+        data = self.api.get('/api/reportes/aging/?bandas=15,90').json()
+        self.assertEqual(data, {'0-15': 5.1, '16-90': 140.2, '90+': 7.0})
+        data = self.api.get('/api/reportes/estado-cartera/?por=moneda').json()
+        self.assertEqual([(r['moneda'], r['total']) for r in data], [('USD', 100.0), ('ARS', 52.3)])
+        data = self.api.get('/api/reportes/aging/?por=cliente').json()
+        self.assertEqual(data[0], {'cliente_id': self.b.pk, 'cliente': 'B', '0-30': 0.0, '31-60': 0.0,
+                                   '61-90': 100.0, '90+': 7.0, 'total': 107.0, 'facturas': 2})
+
+    def test_por_cliente_ve_el_cambio_de_razon_social(self):
+        for url in ('/api/reportes/aging/?por=cliente', '/api/reportes/estado-cartera/?por=cliente'):
+            with self.subTest(url=url):
+                self.assertEqual(self.api.get(url).json()[0]['cliente'], self.b.razon_social)
+                self.b.razon_social = f'{self.b.razon_social} SRL'
+                self.b.save()
+                self.assertEqual(self.api.get(url).json()[0]['cliente'], self.b.razon_social)
+
+    def test_as_of_pasado(self):
+        # hace 10 días todo tenía 10 días menos de atraso y AG-6 estaba impaga (el pago es de hace 5)
+        as_of = (self.hoy - timedelta(days=10)).isoformat()
+        data = self.api.get(f'/api/reportes/aging/?as_of={as_of}').json()
+        self.assertEqual(data, {'0-30': 45.3, '31-60': 0.0, '61-90': 157.0, '90+': 0.0})
+
+    def test_params_invalidos(self):
+        for q in ('as_of=ayer', 'bandas=60,30', 'bandas=x', 'bandas=0,30', 'por=proyecto'):
+            with self.subTest(q=q):
+                self.assertEqual(self.api.get(f'/api/reportes/aging/?{q}').status_code, 400)
+
+
+class AgingDiarioTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.hoy = date.today()
+        dia = lambda n: self.hoy - timedelta(days=n)
+        cli = Cliente.objects.create(razon_social='A', cuit='20-11111111-1')
+        crear = lambda nro, total, emision, venc, **kw: Factura.objects.create(
+            cliente=cli, nro=nro, total=Decimal(total), fecha=dia(emision),
+            vencimiento=None if venc is None else dia(venc), **kw)
+        f1 = crear('D-1', '100.00', 200, 170)
+        Pago.objects.create(factura=f1, fecha=dia(150), monto=Decimal('30.00'))
+        Pago.objects.create(factura=f1, fecha=dia(40), monto=Decimal('70.00'))  # la cancela
+        f2 = crear('D-2', '50.00', 120, 90, moneda='USD')
+        Pago.objects.create(factura=f2, fecha=dia(130), monto=Decimal('10.00'))  # anterior a la emisión
+        crear('D-3', '20.00', 60, None)
+        f4 = crear('D-4', '80.00', 100, 70)
+        Pago.objects.create(factura=f4, fecha=dia(10), monto=Decimal('80.00'))
+        Pago.objects.create(factura=f4, fecha=dia(5), monto=Decimal('-30.00'))  # contrasiento: reabre
+        crear('D-anulada', '999.00', 100, 70, estado='ANULADA')
+
+    def _fotos(self, fecha):
+        return {a.moneda: ({e: getattr(a, c) for e, c in AgingDiario.BANDAS.items()}, a.saldo, a.abiertas)
+                for a in AgingDiario.objects.filter(fecha=fecha)}
+
+    def test_backfill_coincide_con_aging_de_cada_dia(self):
+        from .aging import aging
+        from .aging_diario import backfill
+        desde = self.hoy - timedelta(days=210)
+        with CaptureQueriesContext(connection) as ctx:
+            backfill(desde, self.hoy)
+        lecturas = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(lecturas), 2)  # una pasada por facturas y otra por pagos
+        for n in range(211):
+            d = desde + timedelta(days=n)
+            with self.subTest(dia=d):
+                esperado = {r['moneda']: ({e: r[e] for e in AgingDiario.BANDAS}, r['total'], r['facturas'])
+                            for r in aging(d, por='moneda')}
+                self.assertEqual(self._fotos(d), esperado)
+
+    def test_foto_de_hoy_igual_al_backfill(self):
+        from .aging_diario import backfill, foto
+        f = Factura.objects.get(nro='D-3')
+        Pago.objects.create(factura=f, fecha=self.hoy + timedelta(days=3), monto=Decimal('5.00'))  # adelantado
+        foto(self.hoy)
+        de_la_foto = self._fotos(self.hoy)
+        backfill(self.hoy, self.hoy)
+        self.assertEqual(self._fotos(self.hoy), de_la_foto)
+        self.assertEqual(de_la_foto['ARS'][1], Decimal('50.00'))  # el pago futuro no cuenta
+
+    def test_backfill_una_transaccion_por_lote_de_dias(self):
+        from . import aging_diario
+        with patch('facturacion.aging_diario.LOTE_DIAS', 30), \
+                patch('facturacion.aging_diario.transaction', wraps=transaction) as tx:
+            aging_diario.backfill(self.hoy - timedelta(days=89), self.hoy)
+        self.assertEqual(tx.atomic.call_count, 3)
+        self.assertEqual(AgingDiario.objects.values('fecha').distinct().count(), 90)
+
+    def test_comando_foto_y_backfill(self):
+        call_command('snapshot_aging', stdout=StringIO())
+        self.assertEqual(self._fotos(self.hoy), {
+            'ARS': ({'0-30': Decimal('20.00'), '31-60': 0, '61-90': Decimal('30.00'), '90+': 0},
+                    Decimal('50.00'), 2),
+            'USD': ({'0-30': 0, '31-60': 0, '61-90': Decimal('40.00'), '90+': 0}, Decimal('40.00'), 1),
+        })
+        desde = (self.hoy - timedelta(days=30)).isoformat()
+        call_command('snapshot_aging', f'--desde={desde}', stdout=StringIO())
+        self.assertEqual(AgingDiario.objects.filter(fecha=self.hoy).count(), 2)  # reemplaza, no duplica
+        self.assertEqual(AgingDiario.objects.values('fecha').distinct().count(), 31)
+        with self.assertRaises(CommandError):
+            call_command('snapshot_aging', '--hasta=2025-01-01', stdout=StringIO())
+
+    def test_serie(self):
+        from .aging_diario import backfill
+        backfill(self.hoy - timedelta(days=100), self.hoy)
+        with self.assertNumQueries(2):
+            data = self.api.get('/api/reportes/aging/serie/').json()
+        self.assertEqual([p['fecha'] for p in data],
+                         [(self.hoy - timedelta(weeks=w)).isoformat() for w in range(12, -1, -1)])
+        actual = self.api.get('/api/reportes/estado-cartera/').json()
+        self.assertEqual({k: data[-1][k] for k in actual}, actual)
+        self.assertEqual((data[-1]['saldo'], data[-1]['abiertas']), (90.0, 3))
+
+        data = self.api.get(f'/api/reportes/aging/serie/?cada=1&moneda=USD&desde={self.hoy - timedelta(days=3)}').json()
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data[0]['61-90'], 40.0)
+
+        for q in ('hasta=ayer', 'cada=0', 'cada=x', 'desde=2000-01-01&cada=1', f'desde={self.hoy + timedelta(days=1)}'):
+            with self.subTest(q=q):
+                self.assertEqual(self.api.get(f'/api/reportes/aging/serie/?{q}').status_code, 400)
+
+    def test_serie_sin_fotos(self):
+        self.assertEqual(self.api.get('/api/reportes/aging/serie/').json(), [])
+
+
+class PagosTiempoTest(TestCase):
+    def setUp(self):
+        caches[settings.REPORTES_CACHE].clear()
+        self.api = APIClient()
+        self.a = Cliente.objects.create(razon_social='A', cuit='20-11111111-1')
+        self.b = Cliente.objects.create(razon_social='B', cuit='20-22222222-2')
+        venc = date(2025, 1, 31)
+        for i, (cli, fecha_pago) in enumerate([(self.a, date(2025, 1, 10)), (self.a, date(2025, 2, 10)),
+                                               (self.b, date(2025, 1, 30))]):
+            f = Factura.objects.create(cliente=cli, nro=f'PT-{i}', total=Decimal('100.00'), vencimiento=venc)
+            Pago.objects.create(factura=f, fecha=fecha_pago, monto=Decimal('100.00'))
+        Factura.objects.create(cliente=self.b, nro='PT-impaga', total=Decimal('100.00'), vencimiento=venc)
+
+    def test_ranking(self):
+        data = self.api.get('/api/reportes/pagos-tiempo/resumen/').json()
+        self.assertEqual(data, [
+            {'cliente_id': self.b.pk, 'cliente': 'B', 'pagadas': 1, 'a_tiempo': 1, 'ratio': 1.0},
+            {'cliente_id': self.a.pk, 'cliente': 'A', 'pagadas': 2, 'a_tiempo': 1, 'ratio': 0.5},
+        ])
+        top = self.api.get('/api/reportes/pagos-tiempo/top/?n=1').json()
+        self.assertEqual([r['cliente_id'] for r in top], [self.b.pk])
+
+    def test_top_sale_del_cache_y_se_invalida(self):
+        self.api.get('/api/reportes/pagos-tiempo/resumen/')
+        with CaptureQueriesContext(connection) as ctx:
+            self.api.get('/api/reportes/pagos-tiempo/top/?n=1')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        f = Factura.objects.get(nro='PT-impaga')
+        Pago.objects.create(factura=f, fecha=date(2025, 1, 1), monto=Decimal('100.00'))
+        data = self.api.get('/api/reportes/pagos-tiempo/resumen/').json()
+        self.assertEqual({r['cliente_id']: r['pagadas'] for r in data}, {self.a.pk: 2, self.b.pk: 2})
+
+
+class ReportesCacheTest(TestCase):
+    def setUp(self):
+        caches[settings.REPORTES_CACHE].clear()
+        cache_reportes._metricas.clear()
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.f = Factura.objects.create(cliente=self.cliente, nro='C-1', total=Decimal('100.00'),
+                                        vencimiento=date.today())
+
+    def test_hit_miss_e_invalidacion_por_pago(self):
+        r = self.api.get('/api/reportes/estado-cartera/')
+        self.assertEqual((r['X-Cache'], r.json()['0-30']), ('MISS', 100.0))
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.api.get('/api/reportes/estado-cartera/')
+        self.assertEqual((r['X-Cache'], len(ctx.captured_queries)), ('HIT', 0))
+
+        Pago.objects.create(factura=self.f, fecha=date.today(), monto=Decimal('40.00'))
+        r = self.api.get('/api/reportes/estado-cartera/')
+        self.assertEqual((r['X-Cache'], r.json()['0-30']), ('MISS', 60.0))
+        self.assertEqual(self.api.get('/api/reportes/cache/').json()['estado_cartera'],
+                         {'aciertos': 1, 'fallos': 2, 'esperas': 0, 'ratio': 0.333})
+
+    def test_clave_con_params_normalizados(self):
+        self.assertEqual(self.api.get('/api/reportes/ingresos-por-mes/?desde=2025-01&hasta=2025-03')['X-Cache'], 'MISS')
+        r = self.api.get('/api/reportes/ingresos-por-mes/?hasta=2025-03&moneda=&desde=2025-01')
+        self.assertEqual(r['X-Cache'], 'HIT')
+        self.assertEqual(self.api.get('/api/reportes/ingresos-por-mes/?desde=2025-02&hasta=2025-03')['X-Cache'], 'MISS')
+
+    def test_errores_no_se_cachean(self):
+        for _ in range(2):
+            r = self.api.get('/api/reportes/ingresos-por-mes/?desde=2025-13')
+            self.assertEqual(r.status_code, 400)
+            self.assertFalse(r.has_header('X-Cache'))
+
+    def test_single_flight(self):
+        calculos = []
+        barrera = threading.Barrier(4)
+
+        def calcular():
+            calculos.append(1)
+            time.sleep(0.2)
+            return {'ok': True}
+
+        resultados = []
+
+        def pedir():
+            barrera.wait()
+            resultados.append(cache_reportes.obtener('prueba', ('facturas',), calcular, [('a', '1')]))
+
+        hilos = [threading.Thread(target=pedir) for _ in range(4)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertEqual(len(calculos), 1)
+        self.assertEqual(sorted(hit for _, hit in resultados), [False, True, True, True])
+        self.assertEqual(cache_reportes.metricas()['prueba']['esperas'], 3)
+
+    def test_no_espera_al_otro_proceso_si_no_cachea(self):
+        marca = cache_reportes._clave('prueba', ('facturas',), [('a', '1')]) + ':calculando'
+        c = caches[settings.REPORTES_CACHE]
+        c.add(marca, 1, 30)  # otro proceso está calculando...
+        threading.Timer(0.2, c.delete, (marca,)).start()  # ...y termina con un 400: no cachea
+        t0 = time.monotonic()
+        self.assertEqual(cache_reportes.obtener('prueba', ('facturas',), lambda: 7, [('a', '1')]), (7, False))
+        self.assertLess(time.monotonic() - t0, 5)
+
+    def test_error_al_calcular_libera_el_lock(self):
+        antes = len(cache_reportes._locks)
+
+        def falla():
+            raise RuntimeError('boom')
+
+        for i in range(3):
+            with self.assertRaises(RuntimeError):
+                cache_reportes.obtener('prueba', ('facturas',), falla, [('i', str(i))])
+        self.assertEqual(len(cache_reportes._locks), antes)
+        # ni la marca de "calculando" queda: el siguiente calcula sin esperar
+        self.assertEqual(cache_reportes.obtener('prueba', ('facturas',), lambda: 1, [('i', '0')]), (1, False))
+
+
+class ResumenClienteTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        venc = date(2025, 1, 31)
+        with self.captureOnCommitCallbacks(execute=True):  # historial
+            self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+            self.f1 = Factura.objects.create(cliente=self.cliente, nro='R-1', total=Decimal('100.00'),
+                                             vencimiento=venc)
+            self.f2 = Factura.objects.create(cliente=self.cliente, nro='R-2', total=Decimal('200.00'),
+                                             vencimiento=venc)
+            self.f3 = Factura.objects.create(cliente=self.cliente, nro='R-3', total=Decimal('50.00'),
+                                             vencimiento=date(2024, 12, 1))
+            Factura.objects.create(cliente=self.cliente, nro='R-USD', total=Decimal('10.00'), moneda='USD')
+            Pago.objects.create(factura=self.f1, fecha=date(2025, 1, 10), monto=Decimal('100.00'))  # a tiempo
+            Pago.objects.create(factura=self.f2, fecha=date(2025, 2, 10), monto=Decimal('200.00'))  # tarde
+            self.pago_parcial = Pago.objects.create(factura=self.f3, fecha=date(2025, 1, 1), monto=Decimal('20.00'))
+        Proyecto.objects.create(cliente=self.cliente, nombre='Web')
+        self.fin = Proyecto.objects.create(cliente=self.cliente, nombre='Viejo', estado='FINALIZADO')
+
+    def _verificar(self):
+        call_command('rebuild_resumen_clientes', '--verify', stdout=StringIO())
+
+    def test_resumen(self):
+        data = self.api.get(f'/api/clientes/{self.cliente.pk}/resumen/?eventos=3').json()
+        self.assertEqual(data['facturas'], {'ABIERTA': 1, 'PARCIAL': 1, 'PAGADA': 2, 'ANULADA': 0})
+        self.assertEqual(data['importes'], [
+            {'moneda': 'ARS', 'facturado': '350.00', 'cobrado': '320.00', 'saldo': '30.00'},
+            {'moneda': 'USD', 'facturado': '10.00', 'cobrado': '0.00', 'saldo': '10.00'},
+        ])
+        self.assertEqual(data['vencida_mas_antigua']['nro'], 'R-3')
+        self.assertEqual(data['pagos_a_tiempo'], {'pagadas': 2, 'a_tiempo': 1, 'ratio': 0.5})
+        self.assertEqual([p['nombre'] for p in data['proyectos_activos']], ['Web'])
+        self.assertEqual(len(data['historial']), 3)
+        self._verificar()
+
+    def test_incremental_en_cada_escritura(self):
+        self.f2.vencimiento = date(2025, 3, 1)  # ahora el pago del 10/2 queda a tiempo
+        self.f2.save()
+        self.f3.estado = Factura.ANULADA
+        self.f3.save()
+        self.pago_parcial.fecha = date(2025, 1, 2)
+        self.pago_parcial.save()
+        p = Pago.objects.get(factura=self.f1)
+        p.delete()
+        Factura.objects.get(nro='R-USD').delete()
+        self.fin.estado = 'EN_PROCESO'
+        self.fin.save(update_fields=['estado'])
+        self.api.post('/api/facturas/bulk/', [{'cliente': self.cliente.pk, 'nro': 'R-B', 'moneda': 'USD',
+                                               'items': [{'descripcion': 'a', 'qty': '1', 'precio_unit': '5'}]}],
+                      format='json')
+        data = self.api.get(f'/api/clientes/{self.cliente.pk}/resumen/').json()
+        self.assertEqual(data['facturas'], {'ABIERTA': 2, 'PARCIAL': 0, 'PAGADA': 1, 'ANULADA': 1})
+        self.assertEqual(data['pagos_a_tiempo'], {'pagadas': 1, 'a_tiempo': 1, 'ratio': 1.0})
+        self.assertEqual([i['moneda'] for i in data['importes']], ['ARS', 'USD'])
+        self.assertEqual(len(data['proyectos_activos']), 2)
+        self._verificar()
+
+    def test_queries_constantes(self):
+        url = f'/api/clientes/{self.cliente.pk}/resumen/'
+        with CaptureQueriesContext(connection) as antes:
+            self.api.get(url)
+        _crear_facturas(self.cliente, 50, desde=100)
+        for f in Factura.objects.filter(nro__startswith='X-')[:10]:
+            Pago.objects.create(factura=f, monto=Decimal('1.00'))
+        with CaptureQueriesContext(connection) as despues:
+            self.api.get(url)
+        self.assertEqual(len(despues.captured_queries), len(antes.captured_queries))
+
+    def test_borrar_cliente_con_proyectos(self):
+        otro = Cliente.objects.create(razon_social='Otro', cuit='20-99999999-9')
+        Proyecto.objects.create(cliente=otro, nombre='P')
+        otro.delete()
+        self._verificar()
+
+
+def _pdfs_falsos(facturas):
+    return ((f, b'%PDF-1.4 test') for f in facturas)
+
+
+@patch('facturacion.envios._render_pdfs', side_effect=_pdfs_falsos)
+class EnvioFacturaTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9', email='acme@example.com')
+        self.f = Factura.objects.create(cliente=self.cliente, nro='E-1', total=Decimal('10.00'))
+
+    def test_endpoint_encola_y_es_idempotente(self, _pdf):
+        url = f'/api/facturas/{self.f.pk}/enviar/'
+        r1 = self.api.post(url, HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(r1.status_code, 202)
+        self.assertEqual(r1.json()['estado'], EnvioFactura.PENDIENTE)
+        self.assertEqual(len(mail.outbox), 0)
+        _pdf.assert_not_called()
+
+        r2 = self.api.post(url, HTTP_IDEMPOTENCY_KEY='k-1')
+        self.assertEqual(r2.status_code, 200)
+        self.assertEqual(r2.json()['id'], r1.json()['id'])
+        self.assertEqual(EnvioFactura.objects.count(), 1)
+
+    def test_worker_entrega(self, _pdf):
+        self.api.post(f'/api/facturas/{self.f.pk}/enviar/')
+        res = procesar_pendientes()
+        self.assertEqual(res[EnvioFactura.ENVIADO], 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['acme@example.com'])
+        self.assertEqual(mail.outbox[0].attachments[0][0], 'factura_E-1.pdf')
+
+        data = self.api.get(f'/api/facturas/{self.f.pk}/envios/').json()
+        self.assertEqual([(e['estado'], e['intentos']) for e in data], [(EnvioFactura.ENVIADO, 1)])
+        self.assertEqual(procesar_pendientes()[EnvioFactura.ENVIADO], 0)  # no se reenvía
+
+    def test_render_por_delante_cierra_su_conexion(self, _pdf):
+        hilos = []
+
+        def gen():
+            hilos.append(threading.get_ident())
+            yield from (1, 2)
+
+        with patch('facturacion.envios.db_connection') as db:
+            self.assertEqual(list(_por_delante(gen())), [1, 2])
+        self.assertNotEqual(hilos, [threading.get_ident()])
+        db.close.assert_called_once_with()
+
+    def test_reintentos_con_backoff(self, _pdf):
+        _pdf.side_effect = lambda fs: ((f, RuntimeError('wkhtmltopdf caído')) for f in fs)
+        envio, _ = encolar_envio(self.f)
+        procesar_pendientes()
+        envio.refresh_from_db()
+        self.assertEqual((envio.estado, envio.intentos), (EnvioFactura.PENDIENTE, 1))
+        self.assertGreater(envio.proximo_intento, timezone.now())
+        self.assertIn('wkhtmltopdf', envio.ultimo_error)
+        self.assertEqual(sum(procesar_pendientes().values()), 0)  # todavía en backoff
+
+        EnvioFactura.objects.filter(pk=envio.pk).update(proximo_intento=timezone.now(), intentos=envio.max_intentos - 1)
+        procesar_pendientes()
+        envio.refresh_from_db()
+        self.assertEqual(envio.estado, EnvioFactura.FALLIDO)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_crear_con_enviar_mail_encola(self, _pdf):
+        payload = {'cliente': self.cliente.pk, 'nro': 'E-2', 'items': [{'descripcion': 'a', 'qty': '1', 'precio_unit': '1'}]}
+        resp = self.api.post('/api/facturas/?enviar_mail=1', payload, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(EnvioFactura.objects.filter(factura__nro='E-2').count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_cliente_sin_email(self, _pdf):
+        Cliente.objects.filter(pk=self.cliente.pk).update(email=None)
+        resp = self.api.post(f'/api/facturas/{self.f.pk}/enviar/')
+        self.assertEqual(resp.status_code, 400)
+
+
+@patch('facturacion.pdf_utils.html_to_pdf', side_effect=lambda html: b'%PDF-' + html[:20].encode())
+class PdfCacheTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ctx = override_settings(PDF_CACHE_DIR=tmp.name, PDF_CACHE_MAX_BYTES=10 ** 6)
+        ctx.enable()
+        self.addCleanup(ctx.disable)
+        self.dir = tmp.name
+        self.api = APIClient()
+        self.cliente = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        self.f = _crear_facturas(self.cliente, 1)[0]
+        self.url = f'/api/facturas/{self.f.pk}/pdf/'
+
+    def _pdfs(self):
+        return sorted(p.name for p in pdf_cache.get_cache().dir.glob('*.pdf'))
+
+    def test_hit_no_renderiza_y_etag(self, render):
+        r1 = self.api.get(self.url)
+        self.assertEqual(r1.status_code, 200)
+        self.assertTrue(b''.join(r1.streaming_content).startswith(b'%PDF-'))
+        r2 = self.api.get(self.url)
+        b''.join(r2.streaming_content)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(r1['ETag'], r2['ETag'])
+
+        r3 = self.api.get(self.url, HTTP_IF_NONE_MATCH=r1['ETag'])
+        self.assertEqual(r3.status_code, 304)
+        self.assertEqual(render.call_count, 1)
+
+    def test_otro_backend_cambia_la_clave(self, render):
+        etag = self.api.get(self.url)['ETag']
+        with patch('facturacion.pdf_utils.nombre_backend', return_value='wkhtmltopdf'):
+            r = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+        self.assertEqual(render.call_count, 2)
+
+    def test_304_sin_pdf_en_cache_no_renderiza(self, render):
+        etag = self.api.get(self.url)['ETag']
+        pdf_cache.invalidar(self.f.pk)  # desalojado (o generado en otro servidor)
+        r = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((r.status_code, r['ETag']), (304, etag))
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(self._pdfs(), [])
+
+    def test_cambio_en_items_invalida(self, render):
+        etag = self.api.get(self.url)['ETag']
+        self.assertEqual(len(self._pdfs()), 1)
+        item = self.f.items.first()
+        item.descripcion = 'otra cosa'
+        item.save()
+        self.assertEqual(self._pdfs(), [])
+
+        r = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+        self.assertEqual(render.call_count, 2)
+
+    def test_desalojo_lru(self, render):
+        cache = pdf_cache.PdfCache(self.dir, max_bytes=25)
+        cache.put(1, 'a', b'x' * 10)
+        cache.put(2, 'b', b'x' * 10)
+        cache.get(1, 'a')  # 1 pasa a ser el más reciente
+        os.utime(cache.ruta(2, 'b'), (time.time() - 60,) * 2)
+        cache.put(3, 'c', b'x' * 10)
+        self.assertIsNotNone(cache.get(1, 'a'))
+        self.assertIsNone(cache.get(2, 'b'))
+        self.assertIsNotNone(cache.get(3, 'c'))
+
+    def test_put_no_recorre_el_directorio_cada_vez(self, render):
+        cache = pdf_cache.PdfCache(self.dir, max_bytes=1000)
+        with patch.object(cache, '_desalojar', wraps=cache._desalojar) as recorrer:
+            for i in range(50):
+                cache.put(i, 'a', b'x' * 10)
+            cache.put(7, 'b', b'x' * 10)  # reemplaza la versión anterior: el total no crece
+            self.assertEqual(recorrer.call_count, 1)  # solo la primera, para conocer el total
+            self.assertEqual(cache._total, 500)
+            cache.invalidar(8)
+            self.assertEqual(cache._total, 490)
+            for i in range(50, 60):
+                cache.put(i, 'a', b'x' * 100)  # se pasa del tope: desaloja
+        self.assertLessEqual(sum(p.stat().st_size for p in Path(self.dir).glob('*.pdf')), 1000)
+        self.assertEqual(cache._total, sum(p.stat().st_size for p in Path(self.dir).glob('*.pdf')))
+
+
+class PdfRenderTest(TestCase):
+    HTML = '<html><head><style>p{}</style></head><body><h1>Factura A-1</h1><p>Señor (ACME) &amp; Cía</p></body></html>'
+
+    def test_backend_texto(self):
+        pdf = TextoBackend().render(self.HTML)
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'(Factura A-1)', pdf)
+        self.assertIn('(Señor \\(ACME\\) & Cía)'.encode('cp1252'), pdf)
+        self.assertNotIn(b'p{}', pdf)
+
+    def test_backend_desconocido(self):
+        with self.assertRaises(Exception):
+            crear_backend('nope')
+
+    def test_auto_sin_renderer_falla_y_no_usa_texto(self):
+        with patch.object(WkhtmltopdfBackend, '__init__', side_effect=OSError('sin wkhtmltopdf')), \
+                patch.object(WeasyPrintBackend, '__init__', side_effect=ImportError('sin weasyprint')), \
+                self.assertLogs('facturacion.pdf_render', 'ERROR') as logs:
+            with self.assertRaises(PdfRenderError):
+                crear_backend('auto')
+            with self.assertRaises(PdfRenderError):
+                RendererPool('auto', procesos=2).render(self.HTML)  # antes de crear el pool
+        self.assertIn('sin wkhtmltopdf', logs.output[0])
+
+    def test_pool_lotes_en_orden(self):
+        pool = RendererPool('texto', procesos=2, lote=3, timeout=60)
+        self.addCleanup(pool.close)
+        htmls = [f'<p>Factura {i}</p>' for i in range(10)]
+        pdfs = list(pool.render_muchos(iter(htmls)))
+        self.assertEqual(len(pdfs), 10)
+        for i, pdf in enumerate(pdfs):
+            self.assertIn(f'(Factura {i})'.encode(), pdf)
+        self.assertEqual(pool.render_lote(htmls[:2]), pdfs[:2])
+
+    def test_reinicio_falla_los_otros_lotes_en_el_acto(self):
+        pool = RendererPool('texto', procesos=1, timeout=60)
+        self.addCleanup(pool.close)
+        pool._get_pool().apply_async(time.sleep, (30,))  # el único worker queda ocupado
+        otro = pool._enviar(['<p>otro request</p>'])
+        t0 = time.monotonic()
+        pool._reiniciar()  # lo que hace el timeout de un render colgado
+        with self.assertRaisesRegex(PdfRenderError, 'reiniciado'):
+            otro.result(timeout=5)
+        self.assertLess(time.monotonic() - t0, 5)
+        self.assertEqual(len(pool.render_lote(['<p>a</p>'])), 1)  # el pool nuevo funciona
+
+    def test_en_proceso(self):
+        pool = RendererPool('texto', procesos=0)
+        self.assertEqual(pool.render(self.HTML), TextoBackend().render(self.HTML))
+
+
+class ExportPdfTest(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ctx = override_settings(PDF_CACHE_DIR=tmp.name)
+        ctx.enable()
+        self.addCleanup(ctx.disable)
+        self.renders = 0
+        backend = TextoBackend()
+
+        def render(html):
+            self.renders += 1
+            return backend.render(html)
+        pool = RendererPool('texto', procesos=0)
+        pool._local = Mock(render=render)
+        p = patch('facturacion.pdf_utils.get_renderer', return_value=pool)
+        p.start()
+        self.addCleanup(p.stop)
+
+        self.api = APIClient()
+        self.acme = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9')
+        otro = Cliente.objects.create(razon_social='Otro', cuit='20-99999999-9')
+        _crear_facturas(self.acme, 5)
+        _crear_facturas(otro, 3, desde=100)
+
+    def test_zip_con_filtros_y_cache(self):
+        resp = self.api.get(f'/api/facturas/export.zip?cliente={self.acme.pk}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'application/zip')
+        zf = zipfile.ZipFile(BytesIO(b''.join(resp.streaming_content)))
+        self.assertEqual(sorted(zf.namelist()), [f'factura_T-{i:05d}.pdf' for i in range(5)])
+        self.assertIn(b'(Factura T-00003)', zf.read('factura_T-00003.pdf'))
+        self.assertEqual(self.renders, 5)
+
+        # segunda vez (ruta del router, con barra): todo sale del cache
+        resp = self.api.get(f'/api/facturas/export.zip/?cliente={self.acme.pk}')
+        zf = zipfile.ZipFile(BytesIO(b''.join(resp.streaming_content)))
+        self.assertEqual(len(zf.namelist()), 5)
+        self.assertEqual(self.renders, 5)
+
+    def test_pdf_unido(self):
+        from pypdf import PdfReader
+        resp = self.api.get('/api/facturas/export.pdf', HTTP_ACCEPT='application/pdf')
+        self.assertEqual(resp.status_code, 200)
+        reader = PdfReader(BytesIO(b''.join(resp.streaming_content)))
+        self.assertEqual(len(reader.pages), 8)
+        textos = [p.extract_text() for p in reader.pages]
+        self.assertIn('Factura T-00102', textos[0])  # orden del listado: -fecha, -id
+        self.assertIn('Factura T-00000', textos[-1])
+
+    def test_fecha_invalida(self):
+        resp = self.api.get('/api/facturas/export.zip?desde=ayer')
+        self.assertEqual(resp.status_code, 400)
+
+
+@patch('facturacion.envios._render_pdfs', side_effect=_pdfs_falsos)
+class EnvioLoteTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.acme = Cliente.objects.create(razon_social='ACME', cuit='20-12345678-9', email='pagos@acme.com')
+        self.otro = Cliente.objects.create(razon_social='Otro', cuit='20-99999999-9', email='admin@otro.com')
+        self.sin_mail = Cliente.objects.create(razon_social='Sin mail', cuit='20-11111111-9')
+        self.facturas = (_crear_facturas(self.acme, 3) + _crear_facturas(self.otro, 2, desde=10)
+                         + _crear_facturas(self.sin_mail, 1, desde=20))
+
+    def test_endpoint_encola_y_reporta(self, _pdf):
+        ids = [f.pk for f in self.facturas]
+        resp = self.api.post('/api/facturas/enviar-lote/', {'ids': ids}, format='json', HTTP_IDEMPOTENCY_KEY='camp-1')
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.json()['lote'], 'camp-1')
+        self.assertEqual(resp.json()['encolados'], 5)
+        self.assertEqual(resp.json()['omitidas'], [{'factura': self.facturas[-1].pk, 'error': 'El cliente no tiene email cargado'}])
+
+        again = self.api.post('/api/facturas/enviar-lote/', {'ids': ids}, format='json', HTTP_IDEMPOTENCY_KEY='camp-1')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(EnvioFactura.objects.count(), 5)
+
+        procesar_pendientes(connection=get_connection('django.core.mail.backends.locmem.EmailBackend'),
+                            limite_dominio=LimitePorDominio(0))
+        rep = self.api.get('/api/facturas/enviar-lote/camp-1/').json()
+        self.assertEqual(rep['resumen'], {EnvioFactura.ENVIADO: 5})
+        self.assertEqual(len(rep['envios']), 5)
+        self.assertEqual(self.api.get('/api/facturas/enviar-lote/nada/').status_code, 404)
+
+    def test_filtros_y_sin_criterio(self, _pdf):
+        self.assertEqual(self.api.post('/api/facturas/enviar-lote/', {}, format='json').status_code, 400)
+        resp = self.api.post(f'/api/facturas/enviar-lote/?cliente={self.otro.pk}', {}, format='json')
+        self.assertEqual(resp.json()['encolados'], 2)
+
+    def test_una_conexion_por_pasada(self, _pdf):
+        self.api.post('/api/facturas/enviar-lote/', {'ids': [f.pk for f in self.facturas[:5]]}, format='json')
+        with patch('facturacion.envios.get_connection', wraps=get_connection) as gc:
+            res = procesar_pendientes(limite_dominio=LimitePorDominio(0))
+        self.assertEqual(gc.call_count, 1)
+        self.assertEqual(res[EnvioFactura.ENVIADO], 5)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_limite_por_dominio_difiere_sin_gastar_intento(self, _pdf):
+        self.api.post('/api/facturas/enviar-lote/', {'ids': [f.pk for f in self.facturas[:5]]}, format='json')
+        res = procesar_pendientes(limite_dominio=LimitePorDominio(2))
+        self.assertEqual(res, {EnvioFactura.ENVIADO: 4, EnvioFactura.PENDIENTE: 1, EnvioFactura.FALLIDO: 0})
+        diferido = EnvioFactura.objects.get(estado=EnvioFactura.PENDIENTE)
+        self.assertEqual((diferido.destinatario, diferido.intentos), ('pagos@acme.com', 0))
+        self.assertGreater(diferido.proximo_intento, timezone.now())
+
+    @skipUnless(find_spec('aiosmtpd'), 'aiosmtpd no instalado')
+    def test_smtp_real_una_sesion(self, _pdf):
+        from aiosmtpd.controller import Controller
+
+        class Handler:
+            def __init__(self):
+                self.mensajes, self.sesiones = 0, set()
+
+            async def handle_DATA(self, server, session, envelope):
+                self.mensajes += 1
+                self.sesiones.add(id(session))
+                return '250 OK'
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            puerto = s.getsockname()[1]
+        handler = Handler()
+        smtp = Controller(handler, hostname='127.0.0.1', port=puerto)
+        smtp.start()
+        self.addCleanup(smtp.stop)
+        self.api.post('/api/facturas/enviar-lote/', {'ids': [f.pk for f in self.facturas[:5]]}, format='json')
+        conn = get_connection('django.core.mail.backends.smtp.EmailBackend',
+                              host='127.0.0.1', port=puerto,
+                              use_tls=False, username='', password='')
+        res = procesar_pendientes(connection=conn, limite_dominio=LimitePorDominio(0))
+        self.assertEqual(res[EnvioFactura.ENVIADO], 5)
+        self.assertEqual((handler.mensajes, len(handler.sesiones)), (5, 1))
+
+
+class ExportStreamingTest(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.acme = Cliente.objects.create(razon_social='Ñandú SA', cuit='20-12345678-9')
+        otro = Cliente.objects.create(razon_social='Otro', cuit='20-99999999-9')
+        self.facturas = _crear_facturas(self.acme, 3)
+        _crear_facturas(otro, 2, desde=10)
+        Pago.objects.create(factura=self.facturas[0], fecha=date(2025, 1, 10), monto=Decimal('4.00'))
+
+    def _contenido(self, resp):
+        self.assertEqual(resp.status_code, 200)
+        return b''.join(resp.streaming_content).decode('utf-8')
+
+    def test_csv_con_filtros(self):
+        resp = self.api.get(f'/api/facturas/export/?format=csv&cliente={self.acme.pk}')
+        self.assertTrue(resp['Content-Type'].startswith('text/csv'))
+        filas = list(csv.reader(self._contenido(resp).lstrip('﻿').splitlines()))
+        self.assertEqual(filas[0][:4], ['id', 'nro', 'cliente', 'cliente_nombre'])
+        self.assertEqual(len(filas), 4)
+        self.assertEqual({f[3] for f in filas[1:]}, {'Ñandú SA'})
+
+    def test_ndjson_y_sin_n_mas_1(self):
+        with CaptureQueriesContext(connection) as ctx:
+            texto = self._contenido(self.api.get('/api/facturas/export/?format=ndjson&search=T-0001'))
+        filas = [json.loads(l) for l in texto.splitlines()]
+        self.assertEqual([f['nro'] for f in filas], ['T-00010', 'T-00011'][::-1])
+        self.assertEqual(filas[0]['total'], '10.00')
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_pagos_y_clientes(self):
+        filas = self._contenido(self.api.get('/api/pagos/export/?format=ndjson')).splitlines()
+        self.assertEqual(json.loads(filas[0])['factura_nro'], 'T-00000')
+        texto = self._contenido(self.api.get('/api/clientes/export/?search=Ñandú'))
+        self.assertEqual(len(texto.splitlines()), 2)  # header + 1
+
+    def test_error_de_filtro(self):
+        resp = self.api.get('/api/facturas/export/?format=csv&desde=ayer')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('desde', json.loads(resp.content))
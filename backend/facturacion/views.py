@@ -1,45 +1,71 @@
 # facturacion/views.py
-from datetime import date
 
 from django.db import transaction
-from django.http import Http404
+from django.db.models import Count
+from django.http import Http404, StreamingHttpResponse
 from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
 
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 
-from django.db.models import Sum, F, Value, DecimalField
-from django.db.models.functions import Coalesce
+from core.export import StreamingExportMixin
 
-from django.core.mail import EmailMessage
-from .pdf_utils import render_factura_pdf_bytes
-from .models import Factura, Pago, Proyecto
-from .serializers import FacturaSerializer, PagoSerializer, ProyectoSerializer
+from . import aging
+from .cache_reportes import reporte_cacheado
+from .envios import EnvioError, encolar_envio, encolar_lote
+from .exportar import nombre_pdf, zip_stream
+from .models import EnvioFactura, Factura, Pago, Proyecto
+from .serializers import (EnvioFacturaSerializer, FacturaSerializer, PagoSerializer, ProyectoSerializer,
+                          bulk_create_facturas, validar_facturas_bulk)
 
-def enviar_factura_email(factura):
-    if not factura.cliente.email:
-        return False, 'Cliente sin email'
 
-    # Generar PDF con wkhtmltopdf (pdfkit)
-    pdf = render_factura_pdf_bytes(factura)
+POR_FECHA = {'desde': 'fecha__gte', 'hasta': 'fecha__lte'}
+
+
+def filtrar_params(qs, params, ids: dict, fechas: dict = POR_FECHA):
+    """
+    Filtros por id y por fecha de los listados: {param: lookup}. Solo aplica los
+    params presentes; un id no numérico o una fecha inválida → ValidationError (400).
+    """
+    for param, lookup in ids.items():
+        if params.get(param):
+            try:
+                qs = qs.filter(**{lookup: int(params[param])})
+            except ValueError:
+                raise ValidationError({param: 'Debe ser un id numérico.'})
+    for param, lookup in fechas.items():
+        if params.get(param):
+            try:
+                d = parse_date(params[param])  # None si no tiene forma de fecha, ValueError si es imposible
+            except ValueError:
+                d = None
+            if d is None:
+                raise ValidationError({param: 'Fecha inválida (AAAA-MM-DD).'})
+            qs = qs.filter(**{lookup: d})
+    return qs
 
-    subject = f'Factura {factura.nro} - {factura.cliente.razon_social}'
-    body = 'Adjuntamos su factura. Muchas gracias.'
-    msg = EmailMessage(subject=subject, body=body, to=[factura.cliente.email])
-    msg.attach(filename=f'factura_{factura.nro}.pdf', content=pdf, mimetype='application/pdf')
-    msg.send()
-    return True, 'OK'
 
 class ProyectoViewSet(ModelViewSet):
-    queryset = Proyecto.objects.all().order_by("cliente__razon_social", "nombre")
+    queryset = Proyecto.objects.select_related("cliente").order_by("cliente__razon_social", "nombre")
     serializer_class = ProyectoSerializer
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ["nombre", "cliente__razon_social"]
     ordering_fields = ["nombre", "estado"]
 
+    @property
+    def ordering(self):
+        # default de OrderingFilter y clave del cursor. Con ?cliente= la razón social
+        # es constante: ordenar por nombre deja usar el índice (cliente, nombre)
+        if self.request is not None and self.request.query_params.get("cliente"):
+            return ["nombre", "id"]
+        return ["cliente__razon_social", "nombre", "id"]
+
     # permitir /api/proyectos/?cliente=ID
     def get_queryset(self):
         qs = super().get_queryset()
@@ -48,12 +74,62 @@ class ProyectoViewSet(ModelViewSet):
             qs = qs.filter(cliente_id=cid)
         return qs
 
-class FacturaViewSet(ModelViewSet):
-    queryset = Factura.objects.all().order_by('-fecha')  # ya existe 'fecha'
+class _DescargaRenderer(BaseRenderer):
+    # deja pasar Accept: application/pdf / application/zip a las descargas
+    media_type = '*/*'
+    format = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else JSONRenderer().render(data)
+
+class FacturaViewSet(StreamingExportMixin, ModelViewSet):
+    queryset = Factura.objects.all().order_by('-fecha', '-id')
     serializer_class = FacturaSerializer
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['nro', 'cliente__razon_social']
     ordering_fields = ['fecha', 'vencimiento', 'total', 'id']
+    ordering = ['-fecha', '-id']  # también es la clave del cursor
+    export_fields = ['id', 'nro', ('cliente', 'cliente_id'), ('cliente_nombre', 'cliente__razon_social'),
+                     ('proyecto', 'proyecto_id'), 'fecha', 'vencimiento', 'estado', 'moneda',
+                     'total', 'total_pagado', 'saldo']
+
+    def _campos_pedidos(self):
+        """
+        ?fields=id,nro,total   → solo esos campos
+        ?expand=items          → agrega los ítems aunque no estén en fields
+        Sin params → todos (None). Solo aplica a lecturas.
+        """
+        if self.request is None or self.request.method != 'GET':
+            return None
+        fields = self.request.query_params.get('fields', '')
+        if not fields:
+            return None
+        campos = {c.strip() for c in fields.split(',') if c.strip()}
+        expand = self.request.query_params.get('expand', '')
+        campos |= {c.strip() for c in expand.split(',') if c.strip() == 'items'}
+        return campos
+
+    def get_serializer_context(self):
+        ctx = super().get_serializer_context()
+        ctx['fields'] = self._campos_pedidos()
+        return ctx
+
+    def get_queryset(self):
+        # El plan de carga sale de lo que el serializer va a leer:
+        # cliente_nombre → JOIN cliente; items → 1 query de prefetch para toda la página
+        qs = super().get_queryset()
+        campos = self._campos_pedidos()
+        if campos is None or 'cliente_nombre' in campos:
+            qs = qs.select_related('cliente')
+        if campos is None or 'items' in campos:
+            qs = qs.prefetch_related('items')
+
+        # filtros: ?cliente=ID  ?estado=ABIERTA,PARCIAL  ?desde=AAAA-MM-DD  ?hasta=AAAA-MM-DD (fecha)
+        params = self.request.query_params if self.request is not None else {}
+        qs = filtrar_params(qs, params, ids={'cliente': 'cliente_id'})
+        if params.get('estado'):
+            qs = qs.filter(estado__in=[e.strip().upper() for e in params['estado'].split(',') if e.strip()])
+        return qs
 
     # Crear y (opcional) enviar por mail automáticamente
     def create(self, request, *args, **kwargs):
@@ -63,54 +139,137 @@ class FacturaViewSet(ModelViewSet):
         with transaction.atomic():
             factura: Factura = ser.save()  # tu serializer debe crear ítems y recalcular total
 
-        # activar con ?enviar_mail=1 (o true)
+        # activar con ?enviar_mail=1 (o true): solo se encola, lo entrega `procesar_envios`
         enviar = request.query_params.get("enviar_mail", "").lower() in ("1", "true", "yes")
         if enviar:
             try:
-                ok, msg = enviar_factura_email(factura)
-                if not ok:
-                    # no rompemos la creación si falla el mail
-                    print("WARN email factura:", msg)
-            except Exception as e:
-                print("WARN email factura EXC:", e)
+                encolar_envio(factura)
+            except EnvioError as e:
+                # no rompemos la creación si no se puede encolar el mail
+                print("WARN email factura:", e)
 
         headers = self.get_success_headers(ser.data)
         return Response(ser.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    # GET /api/facturas/<pk>/envios/  → estado de los envíos por email (cola)
+    @action(detail=True, methods=['get'])
+    def envios(self, request, pk=None):
+        qs = self.get_object().envios.order_by('-creado', '-id')
+        return Response(EnvioFacturaSerializer(qs, many=True).data)
 
-@api_view(["GET"])
-def aging_view(request):
-    dec0 = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
-    qs = (
-        Factura.objects.filter(estado__in=["ABIERTA", "PARCIAL"])
-        .annotate(
-            pagado=Coalesce(Sum("pagos__monto"), dec0),
-            saldo=F("total") - Coalesce(Sum("pagos__monto"), dec0),
-        )
-        .values("id", "vencimiento", "saldo")
-    )
-
-    out = {"0-30": 0.0, "31-60": 0.0, "61-90": 0.0, "90+": 0.0}
-    today = date.today()
-
-    for f in qs:
-        saldo = f["saldo"]
-        if saldo is None or float(saldo) <= 0:
-            continue
-        dias = (today - f["vencimiento"]).days
-        if dias <= 30:
-            band = "0-30"
-        elif dias <= 60:
-            band = "31-60"
-        elif dias <= 90:
-            band = "61-90"
+    # GET /api/facturas/export.pdf | export.zip  → PDFs de todas las facturas del filtro
+    # (mismos filtros que el listado). Se transmite a medida que se renderiza.
+    @action(detail=False, methods=['get'], url_path=r'export\.(?P<formato>pdf|zip)',
+            renderer_classes=[JSONRenderer, _DescargaRenderer])
+    def export_pdfs(self, request, formato=None):
+        from .pdf_cache import obtener_pdfs
+
+        qs = (self.filter_queryset(self.get_queryset())
+              .select_related('cliente', 'proyecto').prefetch_related('items'))
+        pdfs = obtener_pdfs(qs.iterator(chunk_size=200))
+
+        if formato == 'zip':
+            contenido = zip_stream((nombre_pdf(f), pdf) for f, pdf in pdfs)
+            tipo = 'application/zip'
         else:
-            band = "90+"
-        out[band] += float(saldo)
+            try:
+                from .pdf_merge import unir_pdfs
+                contenido = unir_pdfs(pdf for _, pdf in pdfs)
+            except ImportError:
+                return Response({'detail': 'export.pdf requiere pypdf instalado; usar export.zip.'},
+                                status=status.HTTP_501_NOT_IMPLEMENTED)
+            tipo = 'application/pdf'
+
+        resp = StreamingHttpResponse(contenido, content_type=tipo)
+        resp['Content-Disposition'] = f'attachment; filename=facturas.{formato}'
+        return resp
 
-    return Response(out)
+    LOTE_MAX = 5000
+    FILTROS = ('cliente', 'estado', 'desde', 'hasta', 'search')
 
+    # POST /api/facturas/enviar-lote/   body {"ids": [..]}  o filtros del listado en la URL
+    # Encola un envío por factura (un solo INSERT); los entrega `procesar_envios`.
+    # Header opcional Idempotency-Key: se usa como id del lote, repetirlo no duplica.
+    @action(detail=False, methods=['post'], url_path='enviar-lote')
+    def enviar_lote(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if ids is None and not any(request.query_params.get(p) for p in self.FILTROS):
+            return Response({'detail': 'Indicar "ids" o algún filtro (cliente, estado, desde, hasta, search).'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-class PagoViewSet(ModelViewSet):
+        clave = request.headers.get('Idempotency-Key')
+        if clave and EnvioFactura.objects.filter(lote=clave).exists():
+            return self.reporte_lote(request, lote=clave)
+
+        qs = self.filter_queryset(self.get_queryset()).select_related('cliente').prefetch_related(None)
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return Response({'ids': 'Se espera una lista de ids.'}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(pk__in=ids)
+        facturas = list(qs[:self.LOTE_MAX + 1])
+        if len(facturas) > self.LOTE_MAX:
+            return Response({'detail': f'Máximo {self.LOTE_MAX} facturas por lote.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lote, envios, omitidas = encolar_lote(facturas, lote=clave)
+        return Response({'lote': lote, 'encolados': len(envios), 'omitidas': omitidas},
+                        status=status.HTTP_202_ACCEPTED)
+
+    # GET /api/facturas/enviar-lote/<lote>/  → reporte de entrega por factura
+    @action(detail=False, methods=['get'], url_path=r'enviar-lote/(?P<lote>[\w-]+)')
+    def reporte_lote(self, request, lote=None):
+        qs = EnvioFactura.objects.filter(lote=lote).order_by('id')
+        resumen = dict(qs.order_by().values_list('estado').annotate(n=Count('id')))
+        if not resumen:
+            raise Http404('Lote no encontrado')
+        return Response({'lote': lote, 'resumen': resumen,
+                         'envios': EnvioFacturaSerializer(qs, many=True).data})
+
+    BULK_MAX = 5000
+
+    # POST /api/facturas/bulk/   body: [ {factura}, {factura}, ... ]
+    # Todo o nada por defecto; con ?parcial=1 inserta las válidas y reporta el resto.
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        data = request.data
+        if not isinstance(data, list) or not data:
+            return Response({'detail': 'Se espera una lista de facturas.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > self.BULK_MAX:
+            return Response({'detail': f'Máximo {self.BULK_MAX} facturas por lote.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        validas, errores = validar_facturas_bulk(data, context=self.get_serializer_context())
+
+        parcial = request.query_params.get('parcial', '').lower() in ('1', 'true', 'yes')
+        if errores and not parcial:
+            return Response({'creadas': 0, 'ids': [], 'errores': errores}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            facturas = bulk_create_facturas(validas)
+
+        return Response({'creadas': len(facturas), 'ids': [f.pk for f in facturas], 'errores': errores},
+                        status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET"])
+@reporte_cacheado("aging", depende=("facturas", "clientes"))  # ?por=cliente lleva la razón social
+def aging_view(request):
+    # mismo motor que /api/reportes/estado-cartera/ (facturacion/aging.py)
+    try:
+        return Response(aging.desde_params(request.query_params))
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+
+
+class PagoViewSet(StreamingExportMixin, ModelViewSet):
     queryset = Pago.objects.all().order_by('-fecha', '-id')
     serializer_class = PagoSerializer
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['fecha', 'monto', 'id']
+    ordering = ['-fecha', '-id']  # clave del cursor
+    export_fields = ['id', 'factura', ('factura_nro', 'factura__nro'), ('cliente', 'factura__cliente_id'),
+                     'fecha', 'monto', 'medio', 'referencia']
+
+    # filtros: ?factura=ID  ?cliente=ID  ?desde=AAAA-MM-DD  ?hasta=AAAA-MM-DD (fecha)
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params if self.request is not None else {}
+        return filtrar_params(qs, params, ids={'factura': 'factura_id', 'cliente': 'factura__cliente_id'})
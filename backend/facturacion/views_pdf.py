@@ -1,18 +1,38 @@
 # facturacion/views_pdf.py
-from django.http import HttpResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_cache_control
 from .models import Factura
-from .pdf_utils import render_factura_pdf_bytes
+from .pdf_cache import clave_pdf, obtener_pdf
 
 def factura_pdf(request, pk: int):
     try:
         f = (Factura.objects
-             .select_related('cliente')
+             .select_related('cliente', 'proyecto')
              .prefetch_related('items')
              .get(pk=pk))
     except Factura.DoesNotExist:
         raise Http404('Factura no encontrada')
 
-    pdf = render_factura_pdf_bytes(f, base_url=request.build_absolute_uri('/'))
-    resp = HttpResponse(pdf, content_type='application/pdf')
-    resp['Content-Disposition'] = f'inline; filename=factura_{f.nro}.pdf'
+    # el ETag es la clave del cache (hash del HTML), que sale sin generar el PDF:
+    # si no cambió nada, 304 sin renderizar ni tocar el disco aunque no esté en cache
+    html, clave = clave_pdf(f)
+    etag = f'"{clave}"'
+    if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+        resp = HttpResponse(status=304)
+    else:
+        for _ in range(2):
+            path, _clave = obtener_pdf(f, html)
+            try:
+                fh = open(path, 'rb')
+            except FileNotFoundError:  # desalojado entre medio: se regenera
+                continue
+            resp = FileResponse(fh, content_type='application/pdf',
+                                filename=f'factura_{f.nro}.pdf')
+            resp['Content-Disposition'] = f'inline; filename=factura_{f.nro}.pdf'
+            break
+        else:
+            raise Http404('No se pudo generar el PDF')
+
+    resp['ETag'] = etag
+    patch_cache_control(resp, private=True, no_cache=True)
     return resp
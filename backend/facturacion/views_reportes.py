@@ -1,93 +1,66 @@
 # facturacion/views_reportes.py
 from datetime import date, timedelta
-from collections import defaultdict
 
-from django.db.models import Sum, F, Q, Value, DecimalField
-from django.db.models.functions import TruncMonth, Coalesce
+from django.db.models import Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db.models import Min
-from .models import Factura, Pago
-# --- Helpers internos (no son endpoints) ---
-from typing import List, Dict
+from . import aging
+from .cache_reportes import metricas, reporte_cacheado
+from .models import AgingDiario, IngresoMensual, Pago
+from .reportes import pagos_tiempo_ranking
 
-def _calc_pagos_tiempo() -> List[Dict]:
-    """
-    Devuelve lista por cliente:
-      {cliente_id, cliente, pagadas, a_tiempo, ratio}
-    Considera SOLO facturas pagadas (total_pagado >= total > 0).
-    'A tiempo' si el acumulado de pagos con fecha <= vencimiento cubre el total,
-    o si la factura no tiene vencimiento.
-    """
-    dec = DecimalField(max_digits=14, decimal_places=2)
-    qs = (Factura.objects
-          .annotate(
-              total_pagado=Coalesce(Sum('pagos__monto'), Value(0, output_field=dec)),
-              pagado_hasta_venc=Coalesce(Sum('pagos__monto',
-                                             filter=Q(pagos__fecha__lte=F('vencimiento'))),
-                                         Value(0, output_field=dec)),
-          )
-          .values('id','cliente_id','cliente__razon_social','total','vencimiento','total_pagado','pagado_hasta_venc'))
-
-    rows = {}
-    for f in qs:
-        total = f['total'] or 0
-        tp    = f['total_pagado'] or 0
-        phv   = f['pagado_hasta_venc'] or 0
-        if total <= 0 or tp < total:
-            continue  # no está pagada
-
-        cid = f['cliente_id']
-        if cid not in rows:
-            rows[cid] = {'cliente_id': cid, 'cliente': f['cliente__razon_social'],
-                         'pagadas': 0, 'a_tiempo': 0}
-        rows[cid]['pagadas'] += 1
-
-        if (f['vencimiento'] is None) or (phv >= total):
-            rows[cid]['a_tiempo'] += 1
 
-    out = []
-    for v in rows.values():
-        ratio = (v['a_tiempo'] / v['pagadas']) if v['pagadas'] else 0
-        out.append({**v, 'ratio': round(ratio, 3)})
-    out.sort(key=lambda x: (x['ratio'], x['a_tiempo']), reverse=True)
-    return out
+def _sumar_meses(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def _parse_mes(valor: str) -> date:
+    """'YYYY-MM' o 'YYYY-MM-DD' → primer día de ese mes."""
+    valor = valor.strip()
+    if len(valor) == 7:
+        valor += '-01'
+    return date.fromisoformat(valor).replace(day=1)
+
 
+MAX_MESES_SERIE = 120
 
 # ────────────────────────────────────────────────────────────────────────────────
-# A) KPI: Ingresos por mes (últimos 12)
-#     Devuelve [{ mes: 'YYYY-MM-01', importe: Decimal }, ...]
-#     Se calcula por pagos (cash-in real) agrupados por mes.
+# A) KPI: Ingresos por mes (últimos 12 por defecto)
+#     Devuelve [{ mes: 'YYYY-MM-01', importe: float }, ...]
+#     Se calcula por pagos (cash-in real), leyendo el rollup IngresoMensual.
 @api_view(['GET'])
-def ingresos_por_mes(_request):
+@reporte_cacheado('ingresos_por_mes')
+def ingresos_por_mes(request):
     """
-    Pagos agrupados por mes (YYYY-MM-01) desde hace 12 meses hasta el mes actual.
+    Pagos agrupados por mes (YYYY-MM-01).
+    ?desde=YYYY-MM  ?hasta=YYYY-MM  (default: los últimos 12 meses, incluido el actual)
+    ?moneda=ARS     (default: todas)
     """
-    hoy = date.today()
-    inicio = date(hoy.year - (1 if hoy.month <= 12 else 0),
-                  (hoy.month - 11 - 1) % 12 + 1, 1)  # primer día de hace 11 meses
-
-    dec = DecimalField(max_digits=14, decimal_places=2)
-    qs = (Pago.objects
-          .filter(fecha__gte=inicio)
-          .annotate(mes=TruncMonth('fecha'))
-          .values('mes')
-          .annotate(importe=Coalesce(Sum('monto'), Value(0, output_field=dec)))
-          .order_by('mes'))
-
-    # TruncMonth nos da date/datetime ya "redondeado al mes": no usar .date()
-    series = { (r['mes'].replace(day=1) if hasattr(r['mes'], 'replace') else r['mes']): float(r['importe'])
-               for r in qs }
+    hoy = date.today().replace(day=1)
+    try:
+        hasta = _parse_mes(request.GET['hasta']) if request.GET.get('hasta') else hoy
+        desde = _parse_mes(request.GET['desde']) if request.GET.get('desde') else _sumar_meses(hasta, -11)
+    except ValueError:
+        return Response({'detail': 'desde/hasta deben ser YYYY-MM o YYYY-MM-DD.'}, status=400)
+    if desde > hasta:
+        return Response({'detail': 'desde no puede ser posterior a hasta.'}, status=400)
+    if (hasta.year - desde.year) * 12 + hasta.month - desde.month >= MAX_MESES_SERIE:
+        return Response({'detail': f'Máximo {MAX_MESES_SERIE} meses por consulta.'}, status=400)
+
+    qs = IngresoMensual.objects.filter(mes__gte=desde, mes__lte=hasta)
+    moneda = request.GET.get('moneda')
+    if moneda:
+        qs = qs.filter(moneda=moneda)
+    series = {r['mes']: float(r['importe'])
+              for r in qs.values('mes').annotate(importe=Sum('importe')).order_by()}
 
     out = []
-    cur = inicio
-    while cur <= date(hoy.year, hoy.month, 1):
+    cur = desde
+    while cur <= hasta:
         out.append({'mes': cur.isoformat(), 'importe': series.get(cur, 0.0)})
-        # avanzar un mes
-        if cur.month == 12:
-            cur = date(cur.year + 1, 1, 1)
-        else:
-            cur = date(cur.year, cur.month + 1, 1)
+        cur = _sumar_meses(cur, 1)
 
     return Response(out)
 
@@ -96,6 +69,7 @@ def ingresos_por_mes(_request):
 #     Devuelve [{ cliente: str, importe: Decimal }, ...]
 #     Usamos SUM(Factura.total) por cliente en el último año (ajustable).
 @api_view(['GET'])
+@reporte_cacheado('top_clientes_pagos')
 def top_clientes_pagos(_request):
     """
     Suma los PAGOS (cash-in) por cliente, pero SOLO de facturas marcadas como PAGADAS.
@@ -117,49 +91,75 @@ def top_clientes_pagos(_request):
 
 # ────────────────────────────────────────────────────────────────────────────────
 # C) KPI: Estado de cartera (aging por bandas)
-#     Devuelve {'0-30': float, '31-60': float, '61-90': float, '90+': float}
+#     Devuelve {'0-30': importe, '31-60': importe, '61-90': importe, '90+': importe}
+#     ?as_of= ?bandas= ?por=cliente|moneda: ver facturacion/aging.py
 @api_view(['GET'])
+@reporte_cacheado('estado_cartera', depende=('facturas', 'clientes'))  # ?por=cliente lleva la razón social
 def estado_cartera(request):
-    dec0 = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
-
-    qs = (Factura.objects
-          .filter(estado__in=['ABIERTA', 'PARCIAL'])
-          .annotate(
-              pagado=Coalesce(Sum('pagos__monto'), dec0),
-              saldo=(F('total') - Coalesce(Sum('pagos__monto'), dec0)),
-          )
-          .values('id', 'vencimiento', 'saldo'))
-
-    out = {'0-30': 0.0, '31-60': 0.0, '61-90': 0.0, '90+': 0.0}
-    hoy = date.today()
-    for f in qs:
-        saldo = f['saldo']
-        if saldo is None or float(saldo) <= 0:
-            continue
-        venc = f['vencimiento']
-        dias = (hoy - venc).days if venc else 0
-        if dias <= 30: band = '0-30'
-        elif dias <= 60: band = '31-60'
-        elif dias <= 90: band = '61-90'
-        else: band = '90+'
-        out[band] += float(saldo)
-
-    return Response(out)
+    try:
+        return Response(aging.desde_params(request.query_params))
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=400)
 
 # ────────────────────────────────────────────────────────────────────────────────
 # D) KPI: Pagos a tiempo (puntualidad)
 #     Resumen por cliente y Top N
 @api_view(['GET'])
+@reporte_cacheado('pagos_tiempo_resumen', depende=('facturas', 'clientes'))
 def pagos_tiempo_resumen(_request):
-    return Response(_calc_pagos_tiempo())
+    return Response(pagos_tiempo_ranking())
 
 @api_view(['GET'])
+@reporte_cacheado('pagos_tiempo_top', depende=('facturas', 'clientes'))
 def pagos_tiempo_top(request):
     try:
-        n = int(request.GET.get('n', 5))
+        n = max(0, int(request.GET.get('n', 5)))
     except Exception:
         n = 5
-    base = _calc_pagos_tiempo()
-    base = sorted(base, key=lambda x: (x['ratio'], x['a_tiempo']), reverse=True)[:n]
-    return Response(base)
+    # el ranking cacheado ya viene ordenado: el top es un slice, sin recalcular
+    return Response(pagos_tiempo_ranking()[:n])
+
+# ────────────────────────────────────────────────────────────────────────────────
+# E) Serie histórica del aging (solo lee las fotos diarias de AgingDiario)
+#     Devuelve [{ fecha, '0-30', '31-60', '61-90', '90+', saldo, abiertas }, ...]
+MAX_PUNTOS_SERIE = 400
+
+@api_view(['GET'])
+def aging_serie(request):
+    """
+    ?hasta=AAAA-MM-DD  (default: la última foto)   ?desde=AAAA-MM-DD (default: 12 semanas antes)
+    ?cada=7            días entre puntos, contados hacia atrás desde `hasta` (1 = diario)
+    ?moneda=ARS        (default: todas sumadas, como estado-cartera)
+    Fechas sin foto no aparecen (ver manage.py snapshot_aging).
+    """
+    try:
+        hasta = (date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta')
+                 else AgingDiario.objects.order_by('-fecha').values_list('fecha', flat=True).first())
+        desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else None
+        cada = int(request.GET.get('cada') or 7)
+    except ValueError:
+        return Response({'detail': 'desde/hasta deben ser AAAA-MM-DD y cada un entero.'}, status=400)
+    if hasta is None:
+        return Response([])
+    if cada < 1:
+        return Response({'detail': 'cada debe ser positivo.'}, status=400)
+    desde = desde or hasta - timedelta(weeks=12)
+    if desde > hasta:
+        return Response({'detail': 'desde no puede ser posterior a hasta.'}, status=400)
+    if (hasta - desde).days // cada >= MAX_PUNTOS_SERIE:
+        return Response({'detail': f'Máximo {MAX_PUNTOS_SERIE} puntos por consulta.'}, status=400)
+    fechas = [hasta - timedelta(days=d) for d in range(0, (hasta - desde).days + 1, cada)]
+
+    qs = AgingDiario.objects.filter(fecha__in=fechas)
+    if request.GET.get('moneda'):
+        qs = qs.filter(moneda=request.GET['moneda'])
+    campos = {**AgingDiario.BANDAS, 'saldo': 'saldo', 'abiertas': 'abiertas'}
+    filas = qs.values('fecha').annotate(**{f'_{c}': Sum(c) for c in campos.values()}).order_by('fecha')
+    return Response([{'fecha': r['fecha'].isoformat(), **{k: r[f'_{c}'] for k, c in campos.items()}}
+                     for r in filas])
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Métricas del cache de reportes (por proceso)
+@api_view(['GET'])
+def reportes_cache_metricas(_request):
+    return Response(metricas())
@@ -9,4 +9,25 @@ api.interceptors.response.use(r=>r, err=>{
 const msg = err?.response?.data?.detail || err?.message || 'Error inesperado'
 console.error('API error:', msg, err?.response?.data)
 return Promise.reject(err)
-})
\ No newline at end of file
+})
+
+// Paginación por cursor (opt-in con ?page_size=): { next, previous, results }
+export type Page<T> = { next: string | null; previous: string | null; results: T[] }
+
+export async function fetchPage<T>(urlOrPath: string, pageSize = 50): Promise<Page<T>> {
+// `next`/`previous` vienen como URL absoluta y ya traen page_size + cursor
+if (/^https?:\/\//.test(urlOrPath)) return (await api.get<Page<T>>(urlOrPath)).data
+const sep = urlOrPath.includes('?') ? '&' : '?'
+return (await api.get<Page<T>>(`${urlOrPath}${sep}page_size=${pageSize}`)).data
+}
+
+export async function fetchAll<T>(path: string, pageSize = 200): Promise<T[]> {
+const out: T[] = []
+let page = await fetchPage<T>(path, pageSize)
+out.push(...page.results)
+while (page.next) {
+page = await fetchPage<T>(page.next)
+out.push(...page.results)
+}
+return out
+}
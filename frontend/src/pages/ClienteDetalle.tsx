@@ -194,7 +194,7 @@ return (
   onClick={async ()=>{
     try {
       await api.post(`/facturas/${f.id}/enviar/`)
-      toast.success('Factura enviada por email ✅')
+      toast.success('Envío por email encolado ✅')
     } catch (e:any){
       const msg = e?.response?.data?.error ?? 'No se pudo enviar el email'
       toast.error(`Error: ${msg}`)
@@ -251,4 +251,4 @@ return (
 
 </div>
 )
-}
\ No newline at end of file
+}
\ No newline at end of file
@@ -6,9 +6,12 @@ import { Card, Toolbar } from '../components/UI'
 import { StatusPill } from '../components/StatusPill'
 import { Skeleton } from '../components/Skeleton'
 
+// el listado no muestra ítems: pedimos solo estas columnas (sin prefetch de items)
+const LIST_FIELDS = 'id,nro,cliente,cliente_nombre,fecha,vencimiento,estado,total,moneda'
+
 export default function Facturas(){
 const [search, setSearch] = useState('')
-const q = useQuery({ queryKey:['facturas', search], queryFn: async()=> (await api.get<Factura[]>(`/facturas/${search?`?search=${search}`:''}`)).data })
+const q = useQuery({ queryKey:['facturas', search], queryFn: async()=> (await api.get<Factura[]>(`/facturas/?fields=${LIST_FIELDS}${search?`&search=${search}`:''}`)).data })
 return (
 <Card title="Facturas" action={<Toolbar>
 <input placeholder="Buscar por Nro o Cliente" value={search} onChange={e=>setSearch(e.target.value)} />
@@ -35,4 +38,4 @@ return (
 )}
 </Card>
 )
-}
\ No newline at end of file
+}
\ No newline at end of file
@@ -31,6 +31,8 @@ fecha: string
 vencimiento: string
 estado: 'ABIERTA' | 'PARCIAL' | 'PAGADA' | 'ANULADA'
 total: number
+total_pagado?: number
+saldo?: number
 moneda: string
 items?: FacturaItem[]
 }
@@ -42,4 +44,4 @@ export type Pago = { id?: number; factura: number; fecha: string; monto: number;
 export type Historial = { id: number; cliente: number; fecha: string; tipo: string; nota?: string; usuario?: number | null }
 
 
-export type AgingDict = { '0-30': number; '31-60': number; '61-90': number; '90+': number }
\ No newline at end of file
+export type AgingDict = { '0-30': number; '31-60': number; '61-90': number; '90+': number }
\ No newline at end of file